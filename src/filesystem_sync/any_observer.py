@@ -1,22 +1,42 @@
+from __future__ import annotations
+
 from pathlib import Path
 from typing import Callable
 
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
 from watchdog.observers import Observer
+from watchdog.observers.api import BaseObserver, ObservedWatch
+
+from filesystem_sync.path_filter import PathFilter, filter_event
+from filesystem_sync.write_journal import WriteJournal
 
 
 class AnyObserver(FileSystemEventHandler):
 
-    def __init__(self, path: Path, callback: Callable[[FileSystemEvent], None]):
-        """path need to exist, otherwise the observer will throw an exception."""
+    def __init__(self, path: Path, callback: Callable[[FileSystemEvent], None], observer: BaseObserver | None = None,
+                 path_filter: PathFilter | None = None, journal: WriteJournal | None = None):
+        """path need to exist, otherwise the observer will throw an exception.
+        observer can be shared among many AnyObserver, see MultiRootWatcher.
+        The events of the paths excluded by path_filter are dropped,
+        and so are the echoes of the writes recorded in journal by sync_target."""
         self._path = path
+        self._root = str(path)
         self._callback = callback
-        self._observer = Observer()
+        self._observer = observer if observer is not None else Observer()
+        self._path_filter = path_filter
+        self._journal = journal
+        self._watch: ObservedWatch | None = None
         super().__init__()
 
     def watch_directory(self):
-        self._observer.schedule(self, str(self._path), recursive=True)
-        self._observer.start()
+        self._watch = self._observer.schedule(self, str(self._path), recursive=True)
+        if not self._observer.is_alive():
+            self._observer.start()
+
+    def unwatch_directory(self):
+        if self._watch is not None:
+            self._observer.unschedule(self._watch)
+            self._watch = None
 
     def stop(self):
         self._observer.stop()
@@ -28,4 +48,10 @@ class AnyObserver(FileSystemEventHandler):
             pass # catch if it was not started
 
     def on_any_event(self, event: FileSystemEvent) -> None:
+        if self._journal is not None and self._journal.is_echo(event):
+            return
+        if self._path_filter is not None:
+            event = filter_event(self._path_filter, self._root, event)
+            if event is None:
+                return
         self._callback(event)
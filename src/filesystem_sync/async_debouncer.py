@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, List
+
+from watchdog.events import FileSystemEvent
+from watchdog.observers.api import BaseObserver
+
+from filesystem_sync.any_observer import AnyObserver
+from filesystem_sync.coalescing_buffer import CoalescingBuffer
+from filesystem_sync.debouncer import Debouncer
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.write_journal import WriteJournal
+
+
+class AsyncDebouncer:
+    """The asyncio counterpart of DebouncerThread: the debounced batches are consumed with `async for`.
+    add_event can be called from any thread. It needs to be created inside the running event loop.
+    Without events the iteration waits for the first one, it does not wake up every window."""
+
+    def __init__(self, window: timedelta, max_wait: timedelta | None = None, leading: bool = False,
+                 events_buffer: List[Any] | None = None):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._debouncer = Debouncer(window, self._wakeup, max_wait=max_wait, leading=leading,
+                                    events_buffer=events_buffer)
+        self._continue = True
+
+    def add_event(self, event: Any) -> None:
+        self._debouncer.add_event(event)
+
+    def _wakeup(self, debouncer: Debouncer | None):
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> List[Any]:
+        while self._continue:
+            if not self._debouncer.has_events():
+                await self._event.wait()  # set by the first event, or by stop
+            else:
+                delta = self._debouncer.time_until_next_emission()
+                try:
+                    await asyncio.wait_for(self._event.wait(), max(delta.total_seconds(), 0))
+                except asyncio.TimeoutError:
+                    pass
+            self._event.clear()
+            events = self._debouncer.events()
+            if events:
+                return events
+        raise StopAsyncIteration
+
+    def stop(self):
+        """Ends the iteration; the events not yet emitted are discarded."""
+        self._continue = False
+        self._wakeup(None)
+
+
+class AsyncWatchdogDebouncer(AsyncDebouncer):
+    """The asyncio counterpart of WatchdogDebouncer.
+    The observer can be shared by many of them, e.g., one per watched root in the same event loop;
+    stop then unwatches the root only, and the owner of the observer stops it."""
+
+    def __init__(self, path: Path, window: timedelta, max_wait: timedelta | None = None, leading: bool = False,
+                 coalesce: bool = False, path_filter: PathFilter | None = None,
+                 journal: WriteJournal | None = None, observer: BaseObserver | None = None):
+        super().__init__(window, max_wait, leading, CoalescingBuffer() if coalesce else None)
+        self._shared = observer is not None
+
+        def skip_open(event: FileSystemEvent):
+            if event.event_type != 'opened':
+                self.add_event(event)
+
+        self._any_observer = AnyObserver(path, skip_open, observer, path_filter, journal)
+
+    def start(self):
+        self._any_observer.watch_directory()
+
+    def stop(self):
+        if self._shared:
+            self._any_observer.unwatch_directory()
+        else:
+            self._any_observer.stop()
+        super().stop()
+
+    async def join(self):
+        if self._shared:
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self._any_observer.join)
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import List, Any
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync.sync import Sync
+
+
+class AsyncSync:
+    """Adapts a Sync to asyncio; the blocking file I/O runs in the executor (the loop default one if None)."""
+
+    def __init__(self, sync: Sync, executor: Executor | None = None):
+        self.sync = sync
+        self._executor = executor
+
+    async def sync_source(self, source: Path, events: List[FileSystemEvent]) -> List[Any]:
+        return await self._run(self.sync.sync_source, source, events)
+
+    async def sync_target(self, target: Path, changes: List[Any]) -> None:
+        await self._run(self.sync.sync_target, target, changes)
+
+    async def sync_init(self, source: Path) -> List[Any]:
+        return await self._run(self.sync.sync_init, source)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
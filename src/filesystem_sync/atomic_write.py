@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import os
+import shutil
+import secrets
+from pathlib import Path
+from stat import S_ISDIR
+from typing import Set, Union
+
+from filesystem_sync.write_journal import WriteJournal
+
+FSYNC_NONE = 'none'
+"""Nothing is flushed to the disk, a crash may lose the last writes (but never tears a file)"""
+FSYNC_BATCH = 'batch'
+"""Every file is flushed before it replaces the old one; the directories are flushed once, at the end of the batch"""
+FSYNC_FILE = 'file'
+"""Every file and its directory are flushed before the next change is applied"""
+
+_policies = (FSYNC_NONE, FSYNC_BATCH, FSYNC_FILE)
+
+Content = Union[str, bytes, bytearray, memoryview]
+
+
+class AtomicWriter:
+    """Writes the files to a temporary file next to them and os.replace it into place,
+    so that the readers of the target see either the old or the new content, never a partial one.
+
+    Use it as a context manager, or call flush at the end of the batch for the directories to be fsynced.
+    When a journal is given, every change is recorded in it before it is made (see WriteJournal).
+    The mode and mtime_ns are set on the temporary file, so the journal records the stat of the final file."""
+
+    def __init__(self, fsync: str = FSYNC_NONE, journal: WriteJournal | None = None):
+        if fsync not in _policies:
+            raise ValueError(f'Unknown fsync policy `{fsync}`')
+        self.fsync = fsync
+        self.journal = journal
+        self._dirty: Set[Path] = set()
+
+    def write(self, target: Path, content: Content, mode: int | None = None, mtime_ns: int | None = None) -> None:
+        self.mkdir(target.parent)
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        temp = self.temporary(target)
+        # not mkstemp: it creates the file 0600, while the target gets the usual mode under the umask
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()  # before the utime, a later write would change the mtime
+                set_metadata(temp, mode, mtime_ns)
+                if self.fsync != FSYNC_NONE:
+                    os.fsync(f.fileno())
+            self.commit(temp, target, flushed=True)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+
+    def symlink(self, link_target: str, target: Path, mtime_ns: int | None = None) -> None:
+        """Make target a symlink to link_target, replacing what is there."""
+        self.mkdir(target.parent)
+        temp = self.temporary(target)
+        os.symlink(link_target, temp)
+        try:
+            set_metadata(temp, None, mtime_ns)
+            self.commit(temp, target, flushed=True)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+
+    def commit(self, temp: Path, target: Path, flushed: bool = False) -> None:
+        """Replace target with the file temp, written on the same filesystem."""
+        if not flushed and self.fsync != FSYNC_NONE:
+            fd = os.open(temp, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if target.is_dir() and not target.is_symlink():
+            self.remove(target)
+        if self.journal is not None:
+            self.journal.written(str(target), os.lstat(temp))
+        os.replace(temp, target)
+        self.changed(target.parent)
+
+    def metadata(self, target: Path, mode: int | None = None, mtime_ns: int | None = None) -> None:
+        """Set the mode and mtime_ns of the existing target in place."""
+        if mode is None and mtime_ns is None:
+            return
+        if self.journal is not None:
+            stat = os.lstat(target)
+            if S_ISDIR(stat.st_mode):
+                self.journal.directory(str(target))
+            else:
+                self.journal.written(str(target), stat, mtime_ns)
+        set_metadata(target, mode, mtime_ns)
+
+    def mkdir(self, directory: Path) -> None:
+        """Create directory and its missing parents."""
+        if self.journal is not None:
+            missing = directory
+            while not missing.exists() and missing.parent != missing:
+                self.journal.directory(str(missing))
+                missing = missing.parent
+            if missing != directory:
+                self.journal.directory(str(missing))  # the existing parent gets an entry
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def remove(self, target: Path) -> None:
+        """Remove the file, symlink or directory (with its content)."""
+        if self.journal is not None:
+            self.journal.deleted(str(target))
+            self.journal.directory(str(target.parent))
+        if target.is_dir() and not target.is_symlink():
+            shutil.rmtree(target)
+        else:
+            target.unlink(missing_ok=True)
+        self.changed(target.parent)
+
+    def move(self, origin: Path, target: Path) -> None:
+        """Rename origin to target, replacing it."""
+        if target.is_dir() and not target.is_symlink():
+            self.remove(target)
+        self.mkdir(target.parent)
+        if self.journal is not None:
+            self.journal.deleted(str(origin))
+            self.journal.written(str(target), os.lstat(origin))
+            self.journal.directory(str(origin.parent))
+        os.replace(origin, target)
+        self.changed(origin.parent)
+        self.changed(target.parent)
+
+    def temporary(self, target: Path) -> Path:
+        """A new name next to target, for a temporary file to commit; the parent directory must exist."""
+        temp = target.parent / f'.{target.name}.{secrets.token_hex(4)}.tmp'
+        if self.journal is not None:
+            self.journal.temporary(str(temp))
+            self.journal.directory(str(target.parent))
+        return temp
+
+    def changed(self, directory: Path) -> None:
+        """Record that an entry of directory was created, replaced or removed."""
+        if self.fsync == FSYNC_FILE:
+            fsync_directory(directory)
+        elif self.fsync == FSYNC_BATCH:
+            self._dirty.add(directory)
+
+    def flush(self) -> None:
+        for directory in self._dirty:
+            fsync_directory(directory)
+        self._dirty.clear()
+
+    def __enter__(self) -> AtomicWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+
+def set_metadata(path: Path, mode: int | None, mtime_ns: int | None) -> None:
+    """Set the mode and mtime_ns of path, those that are given; the mode of a symlink is left as it is,
+    and so is its mtime where the platform cannot set the time of the symlink itself."""
+    is_symlink = path.is_symlink()
+    if mode is not None and not is_symlink:
+        os.chmod(path, mode)
+    if mtime_ns is not None:
+        if is_symlink and os.utime not in os.supports_follow_symlinks:
+            return
+        os.utime(path, ns=(mtime_ns, mtime_ns), follow_symlinks=not is_symlink)
+
+
+def fsync_directory(directory: Path) -> None:
+    """Flush the entries of the directory (the names, not the content of the files)."""
+    if os.name == 'nt':
+        return  # directories cannot be opened; NTFS journals the renames
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except FileNotFoundError:
+        return  # removed by a later change of the batch
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_tree(root: Path) -> None:
+    """Flush the content of all the files and directories below root, and root itself."""
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            if os.path.islink(path):
+                continue
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        fsync_directory(Path(dir_path))
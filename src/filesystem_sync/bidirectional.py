@@ -0,0 +1,211 @@
+"""Two-way sync of two local roots, e.g., a dev container bind mount and the host copy.
+
+Both roots are watched; the changes of one side are applied to the other only when the other side still has
+the base content, i.e., the content both sides agreed upon after the last sync of that file.
+When both sides changed a file differently, a Conflict is reported and neither side is overwritten.
+The writes made on a side are recorded in a WriteJournal, so their events are dropped by the watcher;
+those that get through anyway (e.g., after the journal ttl) have the base content and are not transferred back.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import timedelta
+from pathlib import Path
+from stat import S_ISREG
+from threading import Lock
+from typing import Dict, List, NamedTuple, Callable, Tuple, Set
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync import sync_delta
+from filesystem_sync.atomic_write import AtomicWriter
+from filesystem_sync.hash_cache import HashCache, CacheEntry, file_hash
+from filesystem_sync.manifest import manifest
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.watchdog_debouncer import WatchdogDebouncer
+from filesystem_sync.write_journal import WriteJournal
+
+
+class Conflict(NamedTuple):
+    name: str
+    left_digest: str | None
+    """None when the file was deleted on the left"""
+    right_digest: str | None
+    """None when the file was deleted on the right"""
+
+
+class BidirectionalSync:
+    """Keeps left and right in sync in both directions; conflicts are appended to `conflicts`
+    and passed to on_conflict, and the two versions are left in place for the user to resolve.
+    A file is reported once until it is resolved, i.e., until both sides have the same content again."""
+
+    def __init__(self, left: Path, right: Path, window: timedelta = timedelta(milliseconds=100),
+                 on_conflict: Callable[[Conflict], None] | None = None, path_filter: PathFilter | None = None):
+        self.left = left
+        self.right = right
+        self.conflicts: List[Conflict] = []
+        self._on_conflict = on_conflict
+        self._path_filter = path_filter
+        self._base: Dict[str, str] = {}  # name -> the content hash both sides had after the last sync
+        self._conflicted: Set[str] = set()  # the names reported in conflicts and not resolved since
+        self._caches = {left: HashCache(), right: HashCache()}
+        self._lock = Lock()
+        self._journal = WriteJournal()
+        self._watchers = [WatchdogDebouncer(root, window, lambda events, root=root: self.apply_events(root, events),
+                                            path_filter=path_filter, journal=self._journal)
+                          for root in (left, right)]
+
+    def start(self):
+        """The watchers start first, so that the changes made during the reconcile are not missed;
+        their events are applied once the reconcile releases the lock."""
+        for watcher in self._watchers:
+            watcher.start()
+        self.reconcile()
+
+    def stop(self):
+        for watcher in self._watchers:
+            watcher.stop()
+
+    def join(self):
+        for watcher in self._watchers:
+            watcher.join()
+
+    def reconcile(self) -> None:
+        """Copy the files that are only on one side; the files that differ on the two sides are conflicts."""
+        with self._lock:
+            left = manifest(self.left, self._caches[self.left], self._path_filter)
+            right = manifest(self.right, self._caches[self.right], self._path_filter)
+            self._base.clear()
+            self._conflicted.intersection_update(left.keys() | right.keys())
+            for name in sorted(left.keys() | right.keys()):
+                digest_l, digest_r = left.get(name, None), right.get(name, None)
+                if digest_l == digest_r:
+                    self._synced(name, digest_l)
+                elif digest_r is None:
+                    self._copy(self.left, self.right, name, digest_l)
+                elif digest_l is None:
+                    self._copy(self.right, self.left, name, digest_r)
+                else:
+                    self._conflict(name, digest_l, digest_r)
+
+    def apply_events(self, origin: Path, events: List[FileSystemEvent]) -> None:
+        """Apply the changes of origin (one of the two roots) to the other root."""
+        other = self.right if origin == self.left else self.left
+        with self._lock:
+            for op in sync_delta.events_ops(origin, events):
+                status, name = op[0], op[1]
+                if status == 'deleted':
+                    self._deleted(origin, other, name)
+                elif status == 'moved':
+                    self._moved(origin, other, op[2], name)
+                elif status == 'modified':
+                    self._modified(origin, other, name)
+
+    def _modified(self, origin: Path, other: Path, name: str):
+        digest = self._digest(origin, name)
+        base = self._base.get(name, None)
+        if digest is None or digest == base:
+            return  # gone, or an echo of a write made by this sync
+        digest_o = self._digest(other, name)
+        if digest_o == digest:
+            self._synced(name, digest)
+        elif digest_o == base:
+            self._copy(origin, other, name, digest)
+        else:
+            self._conflict_of(origin, name, digest, digest_o)
+
+    def _deleted(self, origin: Path, other: Path, name: str):
+        for name_b in self._below(name):
+            if self._digest(origin, name_b) is not None:
+                continue  # recreated after the deletion, a modification follows
+            base = self._base.pop(name_b)
+            digest_o = self._digest(other, name_b)
+            if digest_o == base:
+                self._apply(other, {'name': name_b, 'content': None})
+            elif digest_o is None:
+                self._conflicted.discard(name_b)  # deleted on both sides
+            else:
+                self._conflict_of(origin, name_b, None, digest_o)
+
+    def _moved(self, origin: Path, other: Path, src: str, dst: str):
+        names = self._below(src)
+        if not names:
+            return  # an echo of a move made by this sync, or of files never synced
+        if all(self._digest(other, n) == self._base[n] for n in names) and \
+                all(self._digest(other, dst + n[len(src):]) is None for n in names):
+            self._apply(other, {'name': dst, 'moved_from': src})
+            for n in names:
+                self._base[dst + n[len(src):]] = self._base.pop(n)
+                self._caches[other].move(n, dst + n[len(src):])
+            return
+        self._deleted(origin, other, src)  # the other side changed, fall back to deletion and creation
+        for n in names:
+            self._modified(origin, other, dst + n[len(src):])
+
+    def _copy(self, origin: Path, other: Path, name: str, digest: str):
+        """Stream the file to a temporary file next to the other one, which replaces it if the content is digest."""
+        try:
+            source = (origin / name).open('rb')
+        except OSError:
+            return  # removed meanwhile, its deletion will follow
+        target = other / name
+        with source, AtomicWriter(journal=self._journal) as writer:
+            writer.mkdir(target.parent)
+            temp = writer.temporary(target)
+            try:
+                h = hashlib.blake2b(digest_size=16)  # as content_hash
+                with temp.open('wb') as f:
+                    while data := source.read(1024 * 1024):
+                        h.update(data)
+                        f.write(data)
+                if h.hexdigest() != digest:
+                    temp.unlink()
+                    return  # changed meanwhile, its modification will follow
+                writer.commit(temp, target)
+            except BaseException:
+                temp.unlink(missing_ok=True)
+                raise
+        self._synced(name, digest)
+        stat = (other / name).stat()
+        self._caches[other].put(name, CacheEntry(stat.st_size, stat.st_mtime_ns, digest))  # the echo is not hashed
+
+    def _apply(self, root: Path, change: Dict):
+        with AtomicWriter(journal=self._journal) as writer:
+            sync_delta.apply(root, change, writer)
+
+    def _digest(self, root: Path, name: str) -> str | None:
+        """The content hash of the file, None if it is not a regular file"""
+        path = root / name
+        try:
+            stat = path.stat()
+            if not S_ISREG(stat.st_mode):
+                return None
+            cache = self._caches[root]
+            entry = cache.get(name)
+            if entry is None or entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns:
+                entry = CacheEntry(stat.st_size, stat.st_mtime_ns, file_hash(path))
+                cache.put(name, entry)
+            return entry.digest
+        except OSError:
+            return None
+
+    def _synced(self, name: str, digest: str):
+        self._base[name] = digest
+        self._conflicted.discard(name)
+
+    def _below(self, name: str) -> List[str]:
+        prefix = name + '/'
+        return [n for n in self._base if n == name or n.startswith(prefix)]
+
+    def _conflict_of(self, origin: Path, name: str, digest: str | None, digest_other: str | None):
+        digests: Tuple = (digest, digest_other) if origin == self.left else (digest_other, digest)
+        self._conflict(name, *digests)
+
+    def _conflict(self, name: str, digest_l: str | None, digest_r: str | None):
+        if name in self._conflicted:
+            return  # already reported
+        self._conflicted.add(name)
+        conflict = Conflict(name, digest_l, digest_r)
+        self.conflicts.append(conflict)
+        if self._on_conflict is not None:
+            self._on_conflict(conflict)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Protocol, Iterable, Set, Iterator
+
+from filesystem_sync.hash_cache import content_hash
+
+
+class ChunkIndex(Protocol):
+    """What the source needs to know of the target store; on the same machine it is the ChunkStore itself."""
+
+    def missing(self, digests: Iterable[str]) -> List[str]:
+        """The digests of the chunks that the store does not have."""
+
+
+class ChunkStore:
+    """Content-addressed chunks on the target, kept in memory or, when root is given, in files below root.
+
+    When the chunks exceed max_bytes, the least recently used ones are evicted as new ones are put,
+    except the pinned ones: SyncDedup pins the chunks of the batch it applies, so they are not evicted meanwhile.
+    max_bytes is thus a bound only between the batches: while one is applied, the store also holds all its chunks.
+    In memory, the store is a cache of the recent content; give a root for a larger one."""
+
+    def __init__(self, root: Path | None = None, max_bytes: int = 64 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sizes: OrderedDict[str, int] = OrderedDict()  # least recently used first
+        self._memory: Dict[str, bytes] = {}
+        self._pinned: Set[str] = set()
+        if root is not None:
+            self._load()
+
+    def missing(self, digests: Iterable[str]) -> List[str]:
+        return [digest for digest in dict.fromkeys(digests) if digest not in self._sizes]
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._sizes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def get(self, digest: str) -> bytes:
+        """Raises KeyError when the chunk is not in the store."""
+        if digest not in self._sizes:
+            raise KeyError(digest)
+        self._sizes.move_to_end(digest)
+        if self.root is None:
+            return self._memory[digest]
+        return self._path(digest).read_bytes()
+
+    def put(self, data: bytes) -> str:
+        digest = content_hash(data)
+        if digest in self._sizes:
+            self._sizes.move_to_end(digest)
+            return digest
+        if self.root is None:
+            self._memory[digest] = bytes(data)
+        else:
+            path = self._path(digest)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp = path.with_suffix('.tmp')
+            temp.write_bytes(data)
+            os.replace(temp, path)
+        self._sizes[digest] = len(data)
+        self.size += len(data)
+        self.evict()
+        return digest
+
+    @contextmanager
+    def pinned(self, digests: Iterable[str]) -> Iterator[None]:
+        """The chunks are not evicted within the with block; the store may exceed max_bytes meanwhile."""
+        pinned = set(digests) - self._pinned
+        self._pinned.update(pinned)
+        try:
+            yield
+        finally:
+            self._pinned.difference_update(pinned)
+            self.evict()
+
+    def evict(self) -> None:
+        """Evict the least recently used chunks that are not pinned, until the store is within max_bytes."""
+        excess = self.size - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for digest, size in self._sizes.items():
+            if excess <= 0:
+                break
+            if digest not in self._pinned:
+                evicted.append(digest)
+                excess -= size
+        for digest in evicted:
+            self.size -= self._sizes.pop(digest)
+            if self.root is None:
+                del self._memory[digest]
+            else:
+                self._path(digest).unlink(missing_ok=True)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _load(self):
+        """The chunks already in root, the least recently modified first"""
+        entries = []
+        for path in self.root.glob('??/*'):
+            if path.suffix == '.tmp':
+                path.unlink(missing_ok=True)  # interrupted put
+                continue
+            stat = path.stat()
+            entries.append((stat.st_mtime_ns, path.name, stat.st_size))
+        for _, digest, size in sorted(entries):
+            self._sizes[digest] = size
+            self.size += size
@@ -0,0 +1,211 @@
+"""Transfer of the large files in chunks, so that an interrupted transfer resumes from the last received chunk.
+
+The source splits a file in chunk entries {'name', 'offset', 'size', 'digest', 'chunk_digest', 'chunk_b64'}
+where size and digest are of the whole file. The target writes them, in order, to a partial file next to
+the target file; the last chunk is verified against the digest and the partial file replaces the target one.
+After an interruption, the target lists its partial files with `partials` and hands them to the source
+(as `resume` of sync_delta.sync_init/sync_source), which skips the chunks already received.
+sync_delta.iter_init/iter_source generate the chunks as they are consumed, so a large file is never whole in memory.
+
+cdc_boundaries and cdc_chunks split content at content-defined boundaries instead, for the deduplication of SyncDedup;
+the rolling hash is computed with numpy when it is installed, byte by byte otherwise, with the same boundaries.
+"""
+from __future__ import annotations
+
+import base64
+import glob
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, Tuple, Any, Iterator, List, BinaryIO
+
+from filesystem_sync.atomic_write import AtomicWriter
+from filesystem_sync.hash_cache import content_hash, file_hash
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+PARTIAL_SUFFIX = '.partial'
+
+_partial_re = re.compile(r'\.(.+)\.([0-9a-f]{32})\.partial')
+
+Resume = Dict[str, Tuple[str, int]]
+"""name -> (digest of the whole file, bytes already received)"""
+
+
+def chunk_entries(name: str, path: Path, digest: str, chunk_size: int = CHUNK_SIZE,
+                  resume: Resume | None = None, size: int | None = None) -> Iterator[Dict[str, Any]]:
+    """The chunk entries of the file; with resume, the chunks the target already has are skipped.
+    size is the number of bytes digest was computed on (see file_hash), the current size by default:
+    the bytes appended since are not sent, their modification follows."""
+    if size is None:
+        size = path.stat().st_size
+    received = 0
+    if resume is not None and resume.get(name, ('', 0))[0] == digest:
+        received = resume[name][1]
+    offset = received // chunk_size * chunk_size
+    with path.open('rb') as f:
+        f.seek(offset)
+        while offset < size:
+            data = f.read(min(chunk_size, size - offset))
+            if not data:
+                break  # the file was truncated after the stat; its modification will follow
+            yield {'name': name, 'offset': offset, 'size': size, 'digest': digest,
+                   'chunk_digest': content_hash(data), 'chunk_b64': base64.b64encode(data).decode('utf-8')}
+            offset += len(data)
+
+
+def apply_chunk(target_root: Path, change: Dict[str, Any], writer: AtomicWriter) -> None:
+    """Write the chunk to the partial file; the last one moves the partial file into place.
+    A chunk may repeat the ones already received, but cannot leave a gap.
+    When the assembled content differs from the digest (the file changed while it was read), the partial file
+    is removed and the target is left as it is: the modification of the source file follows."""
+    target = target_root / change['name']
+    data = change['chunk'] if 'chunk' in change else base64.b64decode(change['chunk_b64'])
+    if content_hash(data) != change['chunk_digest']:
+        raise ValueError(f'Corrupted chunk at {change["offset"]} of {target}')
+    partial = partial_path(target, change['digest'])
+    offset = change['offset']
+    if offset == 0:
+        _remove_stale(target, partial)
+    received = partial.stat().st_size if partial.exists() else 0
+    if offset > received:
+        raise ValueError(f'Missing chunks of {target}: received {received} bytes, got the chunk at {offset}')
+    writer.mkdir(partial.parent)
+    if writer.journal is not None:
+        writer.journal.temporary(str(partial))
+    with partial.open('r+b' if received else 'wb') as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+    if offset + len(data) < change['size']:
+        return
+    if file_hash(partial) != change['digest']:
+        partial.unlink()
+        return
+    writer.commit(partial, target)
+
+
+def partial_path(target: Path, digest: str) -> Path:
+    return target.parent / f'.{target.name}.{digest}{PARTIAL_SUFFIX}'
+
+
+def _remove_stale(target: Path, partial: Path):
+    """Remove the partial files of the previous versions of target"""
+    for path in target.parent.glob(f'.{glob.escape(target.name)}.*{PARTIAL_SUFFIX}'):
+        if path != partial and _partial_re.fullmatch(path.name):
+            path.unlink(missing_ok=True)
+
+
+def is_partial(name: str) -> bool:
+    return _partial_re.fullmatch(name.rsplit('/', 1)[-1]) is not None
+
+
+def partials(target_root: Path) -> Resume:
+    """The files being received below target_root, to resume their transfer."""
+    result = {}
+    for dir_path, _, file_names in os.walk(target_root):
+        for file_name in file_names:
+            match = _partial_re.fullmatch(file_name)
+            if match is None:
+                continue
+            name = os.path.relpath(os.path.join(dir_path, match.group(1)), target_root).replace(os.sep, '/')
+            result[name] = (match.group(2), os.path.getsize(os.path.join(dir_path, file_name)))
+    return result
+
+
+def _gear_table() -> List[int]:
+    """256 pseudo-random 64-bit values, the same on every machine"""
+    return [int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), 'big') for i in range(256)]
+
+
+_gear = _gear_table()
+_mask64 = (1 << 64) - 1
+_gear_array = numpy.array(_gear, dtype=numpy.uint64) if numpy is not None else None
+
+
+def cdc_boundaries(data: bytes, min_size: int = 2048, avg_size: int = 8192,
+                   max_size: int = 65536) -> Iterator[Tuple[int, int]]:
+    """Content-defined chunks of data as (offset, length), with a gear rolling hash.
+
+    A chunk ends where the top bits of the hash of the last 64 bytes are zero, so an insertion
+    changes the chunks around it only, and identical content in different files gives identical chunks."""
+    start = 0
+    for cut in _cuts(data, 0, min_size, avg_size, max_size, True):
+        yield start, cut - start
+        start = cut
+
+
+def cdc_chunks(stream: BinaryIO, min_size: int = 2048, avg_size: int = 8192, max_size: int = 65536,
+               block_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """The chunks of cdc_boundaries, reading the stream a block at a time instead of holding the whole content."""
+    buffer = b''
+    start = 0  # of the next chunk in buffer
+    while True:
+        block = stream.read(max(block_size, max_size))
+        final = not block
+        drop = max(start - _WINDOW, 0)  # the bytes before start are kept for the hash of the first positions
+        buffer = buffer[drop:] + block
+        start -= drop
+        for cut in _cuts(buffer, start, min_size, avg_size, max_size, final):
+            yield buffer[start:cut]
+            start = cut
+        if final:
+            return
+
+
+_WINDOW = 64
+
+
+def _cuts(data: bytes, start: int, min_size: int, avg_size: int, max_size: int, final: bool) -> Iterator[int]:
+    """The ends of the chunks of data from start; unless final, the last chunk, which may continue in the data
+    that follows, is not cut."""
+    bits = max(avg_size.bit_length() - 1, 1)
+    limit = 1 << (64 - bits)  # the top bits are zero
+    size = len(data)
+    candidates = numpy.flatnonzero(_gear_hashes(data) < limit) if numpy is not None and size > start else None
+    gear = _gear
+    while start < size:
+        end = min(start + max_size, size)
+        cut = start + min(min_size, end - start)
+        if candidates is not None:
+            i = numpy.searchsorted(candidates, cut)
+            found = i < len(candidates) and candidates[i] < end
+            if found:
+                cut = int(candidates[i]) + 1
+        else:
+            h = 0
+            for b in data[max(cut - _WINDOW + 1, 0):cut]:
+                h = ((h << 1) + gear[b]) & _mask64
+            found = False
+            for b in data[cut:end]:
+                cut += 1
+                h = ((h << 1) + gear[b]) & _mask64
+                if h < limit:
+                    found = True
+                    break
+        if not found:
+            if end - start < max_size and not final:
+                return  # the data that follows decides where the chunk ends
+            cut = end
+        yield cut
+        start = cut
+
+
+def _gear_hashes(data: bytes):
+    """The hash after each byte, i.e., the sum of gear[data[j - k]] << k for k below 64 (modulo 2 ** 64),
+    by doubling the number of bytes summed at each step"""
+    h = numpy.take(_gear_array, numpy.frombuffer(data, dtype=numpy.uint8))
+    shifted = numpy.empty_like(h)
+    n = len(h)
+    shift = 1
+    while shift < min(_WINDOW, n):
+        numpy.left_shift(h[:n - shift], numpy.uint64(shift), out=shifted[:n - shift])
+        numpy.add(h[shift:], shifted[:n - shift], out=h[shift:])
+        shift *= 2
+    return h
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from itertools import count
+from typing import List, Dict, Iterator
+
+from watchdog.events import FileSystemEvent
+
+_ignored = {'opened', 'closed', 'closed_no_write'}
+
+
+class CoalescingBuffer:
+    """A list-like buffer of FileSystemEvent for the Debouncer that keeps at most one
+    consolidated entry per path, so memory grows with the number of distinct paths, not of events.
+
+    Per path, only the events that matter to sync_delta are kept: at most a deletion followed by
+    a creation or modification; the modifications of the directories are kept for their metadata. Moves are kept as they are and seal the entries of the paths they involve,
+    so that later events are not merged before them."""
+
+    def __init__(self):
+        self._entries: Dict[int, List[FileSystemEvent]] = {}
+        self._open: Dict[str, int] = {}  # path -> key of the entry that can still be merged
+        self._keys = count()
+
+    def append(self, event: FileSystemEvent) -> None:
+        if event.event_type in _ignored:
+            return
+        if event.event_type == 'moved':
+            self._seal(event.src_path, event.is_directory)
+            self._seal(event.dest_path, event.is_directory)
+            self._entries[next(self._keys)] = [event]
+            return
+
+        path = event.src_path
+        key = self._open.pop(path, None)
+        entry = self._entries.pop(key) if key is not None else []
+        if event.event_type == 'deleted':
+            if event.is_directory:
+                self._discard_below(path)
+            entry = self._deleted(entry, event)
+        elif entry and entry[-1].event_type != 'deleted':
+            entry[-1] = entry[-1] if entry[-1].event_type == 'created' else event
+        else:
+            entry.append(event)
+
+        if entry:
+            key = next(self._keys)  # re-appended at the end, after the events it was merged with
+            self._entries[key] = entry
+            self._open[path] = key
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._open.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[FileSystemEvent]:
+        for entry in self._entries.values():
+            yield from entry
+
+    @staticmethod
+    def _deleted(entry: List[FileSystemEvent], event: FileSystemEvent) -> List[FileSystemEvent]:
+        if entry and entry[0].event_type == 'deleted':
+            return [entry[0]]
+        if entry and entry[0].event_type == 'created' and not event.is_directory:
+            return []  # created and deleted in the same window
+        return [event]
+
+    def _seal(self, path: str, is_directory: bool):
+        self._open.pop(path, None)
+        if is_directory:
+            prefix = path + '/'
+            for path_p in [p for p in self._open if p.startswith(prefix)]:
+                del self._open[path_p]
+
+    def _discard_below(self, path: str):
+        prefix = path + '/'
+        for path_p in [p for p in self._open if p.startswith(prefix)]:
+            del self._entries[self._open.pop(path_p)]
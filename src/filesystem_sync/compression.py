@@ -0,0 +1,209 @@
+"""Per-file compression of the content sent by sync_delta and of the entries of the zip archives.
+
+The codec is chosen per file: already compressed formats (by extension) and high-entropy samples are stored,
+dictionary compression is used for the small files when a dictionary is registered,
+the other files use the default codec (or the one configured for their extension).
+zlib, bz2 and lzma are always available; zstd and lz4 are used when the zstandard and lz4 packages are installed.
+"""
+from __future__ import annotations
+
+import base64
+import bz2
+import lzma
+import math
+import zipfile
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Iterable, Any
+
+from filesystem_sync.hash_cache import content_hash
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional dependency
+    lz4_frame = None
+
+
+class Codec(NamedTuple):
+    name: str
+    compress: Callable[[bytes, bytes | None], bytes]
+    decompress: Callable[[bytes, bytes | None], bytes]
+    supports_dictionary: bool = False
+
+
+def _zlib_compress(data: bytes, dictionary: bytes | None) -> bytes:
+    c = zlib.compressobj(6, zdict=dictionary) if dictionary else zlib.compressobj(6)
+    return c.compress(data) + c.flush()
+
+
+def _zlib_decompress(data: bytes, dictionary: bytes | None) -> bytes:
+    d = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return d.decompress(data) + d.flush()
+
+
+CODECS: Dict[str, Codec] = {
+    'zlib': Codec('zlib', _zlib_compress, _zlib_decompress, True),
+    'bz2': Codec('bz2', lambda data, _: bz2.compress(data), lambda data, _: bz2.decompress(data)),
+    'lzma': Codec('lzma', lambda data, _: lzma.compress(data), lambda data, _: lzma.decompress(data)),
+}
+
+if zstandard is not None:
+    def _zstd_dict(dictionary: bytes | None):
+        if not dictionary:
+            return None
+        return zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+
+    def _zstd_compress(data: bytes, dictionary: bytes | None) -> bytes:
+        return zstandard.ZstdCompressor(dict_data=_zstd_dict(dictionary)).compress(data)
+
+
+    def _zstd_decompress(data: bytes, dictionary: bytes | None) -> bytes:
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dict(dictionary)).decompress(data)
+
+
+    CODECS['zstd'] = Codec('zstd', _zstd_compress, _zstd_decompress, True)
+
+if lz4_frame is not None:
+    CODECS['lz4'] = Codec('lz4', lambda data, _: lz4_frame.compress(data),
+                          lambda data, _: lz4_frame.decompress(data))
+
+DEFAULT_CODEC = 'zstd' if 'zstd' in CODECS else 'zlib'
+
+INCOMPRESSIBLE = frozenset((
+    '.7z', '.apk', '.avi', '.br', '.bz2', '.docx', '.flac', '.gif', '.gz', '.heic', '.jar', '.jpeg', '.jpg',
+    '.lz4', '.mkv', '.mov', '.mp3', '.mp4', '.ogg', '.png', '.pptx', '.rar', '.tgz', '.webm', '.webp', '.whl',
+    '.woff', '.woff2', '.xlsx', '.xz', '.zip', '.zst',
+))
+"""Extensions of the formats that are already compressed"""
+
+SAMPLE_SIZE = 4096
+
+_dictionaries: Dict[str, bytes] = {}
+
+
+def register_dictionary(dictionary: bytes) -> str:
+    """Make the dictionary available to decompress; both ends must register it. Returns its id."""
+    dictionary_id = content_hash(dictionary)
+    _dictionaries[dictionary_id] = dictionary
+    return dictionary_id
+
+
+def build_dictionary(samples: Iterable[bytes], size: int = 32 * 1024) -> bytes:
+    """A raw dictionary made of the lines shared by most samples (e.g., the headers of similar files).
+    The most common lines are placed at the end, where the compressors find them with the shortest distance."""
+    counts: Counter = Counter()
+    for sample in samples:
+        counts.update(set(line for line in sample.splitlines(keepends=True) if len(line) > 3))
+    result = b''
+    for line, count in counts.most_common():
+        if count < 2 or len(result) + len(line) > size:
+            break
+        result = line + result
+    return result
+
+
+def entropy(sample: bytes) -> float:
+    """Shannon entropy of the sample, in bits per byte: 8 is random data."""
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return -sum(c / total * math.log2(c / total) for c in Counter(sample).values())
+
+
+class Compressor:
+    """Chooses the codec per file and builds the change entries of sync_delta.
+
+    Files smaller than min_size are stored, unless a dictionary is given and they are below dictionary_max_size.
+    A compressed entry is kept only when it saves at least min_saving (a fraction of the size)."""
+
+    def __init__(self, codec: str = DEFAULT_CODEC, by_extension: Dict[str, str] | None = None,
+                 min_size: int = 256, max_entropy: float = 7.5, min_saving: float = 0.1,
+                 dictionary: bytes | None = None, dictionary_max_size: int = 64 * 1024):
+        for name in [codec, *(by_extension or {}).values()]:
+            if name not in CODECS:
+                raise ValueError(f'Unknown or not installed codec `{name}`')
+        self.codec = codec
+        self.by_extension = {ext.lower(): name for ext, name in (by_extension or {}).items()}
+        self.min_size = min_size
+        self.max_entropy = max_entropy
+        self.min_saving = min_saving
+        self.dictionary = dictionary
+        self.dictionary_id = register_dictionary(dictionary) if dictionary else None
+        self.dictionary_max_size = dictionary_max_size
+
+    def choose(self, name: str, data: bytes) -> str | None:
+        """The codec name for the file, None to store it uncompressed."""
+        extension = _extension(name)
+        if extension in INCOMPRESSIBLE:
+            return None
+        use_dictionary = self.dictionary_id is not None and len(data) <= self.dictionary_max_size
+        if len(data) < self.min_size and not use_dictionary:
+            return None
+        if entropy(_sample(data)) > self.max_entropy:
+            return None
+        if use_dictionary:
+            return 'zstd' if 'zstd' in CODECS else 'zlib'
+        return self.by_extension.get(extension, self.codec)
+
+    def compressed_entry(self, name: str, data: bytes) -> Dict[str, Any] | None:
+        """The sync_delta change with the compressed content of the file name, None if it is not worth it."""
+        codec = self.choose(name, data)
+        if codec is not None:
+            use_dictionary = CODECS[codec].supports_dictionary and self.dictionary_id is not None \
+                             and len(data) <= self.dictionary_max_size
+            compressed = CODECS[codec].compress(data, self.dictionary if use_dictionary else None)
+            if len(compressed) <= len(data) * (1 - self.min_saving):
+                change = {'name': name, 'codec': codec, 'compressed_b64': base64.b64encode(compressed).decode('utf-8')}
+                if use_dictionary:
+                    change['dictionary'] = self.dictionary_id
+                return change
+        return None
+
+
+def zip_compress_type(path: Path, max_entropy: float = 7.5, sample: bytes | None = None) -> int:
+    """The zipfile compression for the file at path: already compressed files are stored.
+    sample is the first SAMPLE_SIZE bytes of the file when the caller already read them, else they are read here."""
+    if _extension(path.name) in INCOMPRESSIBLE:
+        return zipfile.ZIP_STORED
+    if sample is None:
+        try:
+            with path.open('rb') as f:
+                sample = f.read(SAMPLE_SIZE)
+        except OSError:
+            return zipfile.ZIP_DEFLATED
+    return zipfile.ZIP_STORED if entropy(sample) > max_entropy else zipfile.ZIP_DEFLATED
+
+
+def decompress(change: Dict[str, Any]) -> bytes:
+    """The content of a change built by Compressor.compressed_entry; compressed_b64 may also be raw bytes in `compressed`."""
+    data = change['compressed'] if 'compressed' in change else base64.b64decode(change['compressed_b64'])
+    codec = CODECS.get(change['codec'], None)
+    if codec is None:
+        raise ValueError(f'Unknown or not installed codec `{change["codec"]}` for `{change["name"]}`')
+    dictionary = None
+    if 'dictionary' in change:
+        dictionary = _dictionaries.get(change['dictionary'], None)
+        if dictionary is None:
+            raise ValueError(f'Unknown dictionary `{change["dictionary"]}` for `{change["name"]}`')
+    return codec.decompress(bytes(data), dictionary)
+
+
+def _extension(name: str) -> str:
+    dot = name.rfind('.')
+    return name[dot:].lower() if dot > name.rfind('/') else ''
+
+
+def _sample(data: bytes) -> bytes:
+    """The head and the middle of the data, enough to estimate the entropy"""
+    if len(data) <= SAMPLE_SIZE:
+        return data
+    half = SAMPLE_SIZE // 2
+    middle = len(data) // 2
+    return data[:half] + data[middle:middle + half]
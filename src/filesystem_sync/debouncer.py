@@ -1,18 +1,35 @@
 from __future__ import annotations
 
+import time
 from threading import Lock
-from typing import Any, Callable, List
+from typing import Any, Callable, List, Union
 from datetime import datetime, timedelta
 
 
+def monotonic() -> timedelta:
+    """The time elapsed since an arbitrary point, not affected by changes of the system clock."""
+    return timedelta(seconds=time.monotonic())
+
+
 class Debouncer:
     def __init__(self, window: timedelta, wakeup: Callable[['Debouncer'], None] = None,
-                 time_func: Callable[[], datetime] = datetime.utcnow):
+                 time_func: Callable[[], Union[datetime, timedelta]] = monotonic,
+                 max_wait: timedelta | None = None, leading: bool = False, events_buffer: List[Any] | None = None):
+        """time_func: the current time, as a datetime or as a timedelta from an arbitrary point (see monotonic).
+        max_wait: the events are emitted at most max_wait after the first one, even if they keep coming.
+        leading: the first event after a quiet window is emitted immediately, the following ones are debounced.
+        events_buffer: where the events are kept until emission, it needs append, len, iteration and clear;
+        e.g., a CoalescingBuffer. Defaults to a list."""
         self.window = window
         self.wakeup = wakeup
+        self.max_wait = max_wait
+        self.leading = leading
         self._time_func = time_func
-        self._events: List[Any] = []
-        self._last_event_time: datetime | None = None
+        self._events: List[Any] = events_buffer if events_buffer is not None else []
+        self._first_event_time: datetime | timedelta | None = None
+        self._last_event_time: datetime | timedelta | None = None
+        self._last_activity_time: datetime | timedelta | None = None
+        self._leading_due = False
         self._lock = Lock()
 
     def add_event(self, event: Any) -> None:
@@ -21,9 +38,20 @@ class Debouncer:
         """
         with self._lock:
             current_time = self._time_func()
+            was_empty = not self._events
+            if was_empty:
+                self._first_event_time = current_time
+                self._leading_due = self.leading and (self._last_activity_time is None or
+                                                      current_time - self._last_activity_time >= self.window)
             self._events.append(event)
+            self._last_activity_time = current_time
+            if not self._events:  # a coalescing buffer merged the event away, e.g., a creation and its deletion
+                self._first_event_time = None
+                self._last_event_time = None
+                self._leading_due = False
+                return
             self._last_event_time = current_time
-            if len(self._events) == 1:
+            if was_empty:
                 self.wakeup(self)
 
     def events(self) -> List[Any]:
@@ -32,12 +60,18 @@ class Debouncer:
             if emission is None or emission > timedelta(0):
                 return []
 
-            events_to_emit = self._events.copy()
+            events_to_emit = list(self._events)
             self._events.clear()
+            self._first_event_time = None
             self._last_event_time = None
+            self._leading_due = False
 
             return events_to_emit
 
+    def has_events(self) -> bool:
+        with self._lock:
+            return len(self._events) > 0
+
     def time_until_next_emission(self) -> timedelta:
         with self._lock:
             return self._time_until_next_emission()
@@ -46,8 +80,14 @@ class Debouncer:
         if not self._events or self._last_event_time is None:
             return self.window
 
+        if self._leading_due:
+            return timedelta(0)
+
         current_time = self._time_func()
         time_since_last_event = current_time - self._last_event_time
         time_remaining = self.window - time_since_last_event
 
+        if self.max_wait is not None:
+            time_remaining = min(time_remaining, self.max_wait - (current_time - self._first_event_time))
+
         return time_remaining
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import time
+from datetime import timedelta
+from itertools import count
+from threading import Thread, Condition
+from typing import Callable, Any, List, Dict, Tuple
+
+from filesystem_sync.debouncer import Debouncer
+
+_logger = logging.getLogger(__name__)
+
+
+class DebouncerScheduler:
+    """Drives many debouncers from a single thread.
+    A heap keeps the next emission deadline of each debouncer with events, so the thread sleeps until the
+    earliest one and does not wake up for the debouncers without events.
+    There is at most one deadline per debouncer in the heap, the earliest one.
+    An exception raised by an emit is logged, and does not stop the emissions of the other debouncers."""
+
+    def __init__(self, time_func: Callable[[], float] = time.monotonic, name: str = 'DebouncerScheduler'):
+        self._time_func = time_func
+        self._name = name
+        self._condition = Condition()
+        self._heap: List[Tuple[float, int, Debouncer]] = []
+        self._emits: Dict[Debouncer, Callable[[List[Any]], None]] = {}
+        self._deadlines: Dict[Debouncer, float] = {}  # the deadline of each debouncer in the heap
+        self._sequence = count()  # ties in the heap are broken by insertion order, debouncers are not comparable
+        self._continue = True
+        self._thread: Thread | None = None
+
+    def add(self, debouncer: Debouncer, emit: Callable[[List[Any]], None]) -> None:
+        with self._condition:
+            self._emits[debouncer] = emit
+        debouncer.wakeup = self._wakeup
+        if debouncer.has_events():
+            self._wakeup(debouncer)
+
+    def remove(self, debouncer: Debouncer) -> None:
+        """The debouncer is not driven anymore; its pending deadlines are discarded when they expire."""
+        with self._condition:
+            self._emits.pop(debouncer, None)
+
+    def _wakeup(self, debouncer: Debouncer):
+        # called by Debouncer.add_event on the first event, holding the debouncer lock: the debouncer cannot be
+        # queried here, but its first deadline is known unless the leading edge makes it due now
+        delay = timedelta(0) if debouncer.leading else debouncer.window
+        if debouncer.max_wait is not None:
+            delay = min(delay, debouncer.max_wait)
+        with self._condition:
+            self._push(self._time_func() + delay.total_seconds(), debouncer)
+            self._condition.notify()
+
+    def _push(self, deadline: float, debouncer: Debouncer):
+        pending = self._deadlines.get(debouncer, None)
+        if pending is not None:
+            if pending <= deadline:
+                return  # the earlier deadline finds out how long to wait from there
+            self._heap = [entry for entry in self._heap if entry[2] is not debouncer]
+            heapq.heapify(self._heap)
+        self._deadlines[debouncer] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._sequence), debouncer))
+
+    def _thread_loop(self):
+        while True:
+            with self._condition:
+                while self._continue:
+                    timeout = self._heap[0][0] - self._time_func() if self._heap else None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if not self._continue:
+                    break
+                _, _, debouncer = heapq.heappop(self._heap)
+                del self._deadlines[debouncer]
+                emit = self._emits.get(debouncer, None)
+            if emit is None:
+                continue
+            events = debouncer.events()
+            if events:
+                try:
+                    emit(events)
+                except Exception:
+                    _logger.exception('Emit of %d events failed', len(events))
+            elif debouncer.has_events():
+                delta = debouncer.time_until_next_emission()
+                with self._condition:
+                    self._push(self._time_func() + delta.total_seconds(), debouncer)
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError('Thread already started')
+        self._continue = True
+        self._thread = Thread(daemon=True, target=self._thread_loop, name=self._name)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._continue = False
+            self._condition.notify()
+
+    def join(self):
+        t = self._thread
+        if t is not None:
+            t.join()
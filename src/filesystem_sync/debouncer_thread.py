@@ -2,52 +2,41 @@ from __future__ import annotations
 
 import threading
 from datetime import timedelta
-from threading import Thread, Event
 from time import sleep
 from typing import Callable, Any, List
 
 from filesystem_sync.debouncer import Debouncer
+from filesystem_sync.debouncer_scheduler import DebouncerScheduler
+from filesystem_sync.emit_pipeline import EmitPipeline, BLOCK
 
 
 class DebouncerThread:
 
-    def __init__(self, debouncer: Debouncer, emit: Callable[[List[Any]], None]):
+    def __init__(self, debouncer: Debouncer, emit: Callable[[List[Any]], None],
+                 max_pending: int = 0, backpressure: str = BLOCK, resync: Callable[[], None] | None = None):
+        """When max_pending > 0, emit is called by a worker thread through an EmitPipeline of that size,
+        so that the debouncing of new events overlaps with the processing of the emitted ones."""
         self._debouncer = debouncer
-        self._emit = emit
-        self._event = Event()
-        debouncer.wakeup = self._wakeup
-        self._continue = True
-        self._thread: Thread | None = None
-
-    def _wakeup(self, debouncer: Debouncer | None):
-        self._event.set()
-
-    def _thread_loop(self):
-        while self._continue:
-            delta = self._debouncer.time_until_next_emission()
-            timeout_millis = 1 if delta is None else delta.total_seconds()
-            self._event.wait(timeout_millis)
-            self._event.clear()
-            events = self._debouncer.events()
-            if events:
-                self._emit(events)
-        self._thread = None
+        self._pipeline = EmitPipeline(emit, max_pending, backpressure, resync) if max_pending > 0 else None
+        self._emit = self._pipeline or emit
+        self._scheduler = DebouncerScheduler(name='DebouncerThread')
+        self._scheduler.add(debouncer, self._emit)
 
     def start(self):
-        if self._thread is not None:
-            raise RuntimeError('Thread already started')
-        self._continue = True
-        self._thread = Thread(daemon=True, target=self._thread_loop, name='DebouncerThread')
-        self._thread.start()
+        self._scheduler.start()
+        if self._pipeline is not None:
+            self._pipeline.start()
 
     def stop(self):
-        self._continue = False
-        self._wakeup(None)
+        self._scheduler.stop()
+        if self._pipeline is not None:
+            self._pipeline.stop()
 
     def join(self):
-        t = self._thread
-        if t is not None:
-            t.join()
+        self._scheduler.join()
+        if self._pipeline is not None:
+            self._pipeline.join()
+
 
 def main():
     debouncer = Debouncer(timedelta(milliseconds=100))
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+from collections import deque
+from threading import Thread, Condition
+from typing import Callable, Any, List, Deque
+
+BLOCK = 'block'
+"""When the queue is full, the producer waits; meanwhile the events keep accumulating in the Debouncer"""
+MERGE = 'merge'
+"""When the queue is full, the batch is appended to the last pending batch"""
+DROP = 'drop'
+"""When the queue is full, all the pending batches are dropped and replaced by a single call to resync"""
+
+_RESYNC: Any = object()
+
+_logger = logging.getLogger(__name__)
+
+
+class EmitPipeline:
+    """Decouples the emission of the batches from their processing.
+    Calling the pipeline enqueues the batch and returns; worker threads call emit with the batches in order.
+    With more than one worker the batches are processed concurrently, so their order is not guaranteed.
+    An exception raised by emit or resync is logged, and the worker goes on with the next batch."""
+
+    def __init__(self, emit: Callable[[List[Any]], None], max_pending: int = 1, backpressure: str = BLOCK,
+                 resync: Callable[[], None] | None = None, workers: int = 1):
+        if backpressure not in (BLOCK, MERGE, DROP):
+            raise ValueError(f'Unknown backpressure policy `{backpressure}`')
+        if backpressure == DROP and resync is None:
+            raise ValueError('The drop policy needs a resync callable')
+        self._emit = emit
+        self.max_pending = max_pending
+        self.backpressure = backpressure
+        self._resync = resync
+        self._workers = workers
+        self._pending: Deque[List[Any]] = deque()
+        self._condition = Condition()
+        self._continue = True
+        self._threads: List[Thread] = []
+
+    def __call__(self, events: List[Any]) -> None:
+        with self._condition:
+            while len(self._pending) >= self.max_pending and self._continue:
+                if self.backpressure == MERGE:
+                    if self._pending[-1] is not _RESYNC:
+                        self._pending[-1].extend(events)
+                    return
+                if self.backpressure == DROP:
+                    self._pending.clear()
+                    self._pending.append(_RESYNC)
+                    self._condition.notify_all()
+                    return
+                self._condition.wait()
+            self._pending.append(list(events))
+            self._condition.notify_all()
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def start(self):
+        if self._threads:
+            raise RuntimeError('Pipeline already started')
+        self._continue = True
+        self._threads = [Thread(daemon=True, target=self._thread_loop, name=f'EmitPipeline-{i}')
+                         for i in range(self._workers)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        """The workers terminate once the pending batches are processed."""
+        with self._condition:
+            self._continue = False
+            self._condition.notify_all()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _thread_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending and self._continue:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                events = self._pending.popleft()
+                self._condition.notify_all()
+            try:
+                if events is _RESYNC:
+                    self._resync()
+                else:
+                    self._emit(events)
+            except Exception:
+                _logger.exception('Emit failed')
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+
+class CacheEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+class HashCache:
+    """Remembers (size, mtime_ns, content hash) of the files sent by the source,
+    so that a file rewritten with the same content is not sent again.
+    The least recently used entries are evicted when there are more than max_entries."""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    def get(self, name: str) -> CacheEntry | None:
+        entry = self._entries.get(name, None)
+        if entry is not None:
+            self._entries.move_to_end(name)
+        return entry
+
+    def put(self, name: str, entry: CacheEntry) -> None:
+        self._entries[name] = entry
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def forget(self, name: str) -> None:
+        """Forget the entry and, if name is a directory, all the entries below it."""
+        self._entries.pop(name, None)
+        prefix = name + '/'
+        for name_p in [n for n in self._entries if n.startswith(prefix)]:
+            del self._entries[name_p]
+
+    def move(self, src: str, dst: str) -> None:
+        """Move the entry and, if src is a directory, all the entries below it."""
+        for name_p in [n for n in self._entries if n == src or n.startswith(src + '/')]:
+            self.put(dst + name_p[len(src):], self._entries.pop(name_p))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(list(self._entries.items())))
+
+    @staticmethod
+    def load(path: Path, max_entries: int = 100_000) -> HashCache:
+        cache = HashCache(max_entries)
+        if path.exists():
+            for name, entry in json.loads(path.read_text()):
+                cache.put(name, CacheEntry(*entry))
+        return cache
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_hash(path: Path, chunk_size: int = 1024 * 1024, size: int | None = None) -> str:
+    """The content_hash of the file, read chunk_size bytes at a time; of its first size bytes when given."""
+    h = hashlib.blake2b(digest_size=16)
+    remaining = size
+    with path.open('rb') as f:
+        while chunk := f.read(chunk_size if remaining is None else min(chunk_size, remaining)):
+            h.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return h.hexdigest()
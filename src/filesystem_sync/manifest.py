@@ -0,0 +1,47 @@
+"""A manifest is the name -> content hash of all the files below a root.
+
+It is used to resume a sync without a full transfer: the target computes its manifest and hands it to
+sync_init of the source, which sends only the files that are missing or different on the target
+and the deletion of those that are only on the target.
+Both ends can keep a HashCache (saved between restarts) so that only the files whose size or mtime
+changed are hashed again.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from filesystem_sync.chunking import is_partial
+from filesystem_sync.hash_cache import HashCache, CacheEntry, file_hash
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.scan import Inventory, scan
+
+
+def manifest(root: Path, cache: HashCache | None = None, path_filter: PathFilter | None = None,
+             inventory: Inventory | None = None) -> Dict[str, str]:
+    """inventory is the scan of root, when the caller already has it; path_filter is then ignored."""
+    result = {}
+    if inventory is None:
+        inventory = scan(root, path_filter)
+    for scanned in inventory.entries():
+        name = scanned.name
+        stat = scanned.followed(root)
+        if stat is None or not stat.is_file() or is_partial(name):
+            continue
+        entry = cache.get(name) if cache is not None else None
+        if entry is None or entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns:
+            try:
+                entry = CacheEntry(stat.st_size, stat.st_mtime_ns, file_hash(root / name))
+            except OSError:
+                continue
+            if cache is not None:
+                cache.put(name, entry)
+        result[name] = entry.digest
+    return result
+
+
+def diff(source: Dict[str, str], target: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """Returns the names to send (missing or different on the target) and the names to delete from the target."""
+    to_send = [name for name, digest in source.items() if target.get(name, None) != digest]
+    to_delete = [name for name in target if name not in source]
+    return to_send, to_delete
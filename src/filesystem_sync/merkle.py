@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Set, Protocol
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync import sync_delta
+from filesystem_sync.hash_cache import HashCache, file_hash
+from filesystem_sync.manifest import manifest
+
+
+class Tree(Protocol):
+    """What is needed of the other end to compare two trees; on the same machine it is another MerkleTree."""
+
+    def hash(self, name: str = '') -> str:
+        """The hash of the file or directory `name`, '' is the root."""
+
+    def children(self, name: str = '') -> Dict[str, str]:
+        """The hashes of the entries of the directory `name`; directory keys end with '/'."""
+
+
+class MerkleTree:
+    """Hashes of the files below root, rolled up per directory.
+    It is kept up to date with update(events) so that comparing two trees costs O(changes * depth)."""
+
+    def __init__(self, root: Path, cache: HashCache | None = None):
+        self.root = root
+        self._files: Dict[str, str] = {}
+        self._dirs: Dict[str, Set[str]] = {'': set()}
+        self._dir_hashes: Dict[str, str] = {}
+        for name, digest in manifest(root, cache).items():
+            self._add(name, digest)
+
+    def update(self, events: List[FileSystemEvent]) -> None:
+        for op in sync_delta.events_ops(self.root, events):
+            status, name = op[0], op[1]
+            if status == 'deleted':
+                self._remove(name)
+            elif status == 'moved':
+                moved = self._remove(op[2])
+                self._remove(name)
+                for name_m, digest in moved.items():
+                    self._add(name + name_m[len(op[2]):], digest)
+            elif status == 'modified':
+                self._remove(name)
+                path = self.root / name
+                try:
+                    if path.is_file():
+                        self._add(name, file_hash(path))
+                except OSError:
+                    pass  # the file was removed after the event
+
+    def hash(self, name: str = '') -> str:
+        if name in self._files:
+            return self._files[name]
+        if name not in self._dirs:
+            return ''
+        digest = self._dir_hashes.get(name, None)
+        if digest is None:
+            h = hashlib.blake2b(digest_size=16)
+            for key, child in sorted(self.children(name).items()):
+                h.update(f'{key}\0{child}\n'.encode('utf-8'))
+            digest = self._dir_hashes[name] = h.hexdigest()
+        return digest
+
+    def children(self, name: str = '') -> Dict[str, str]:
+        prefix = name + '/' if name else ''
+        return {key: self.hash(prefix + key.rstrip('/')) for key in self._dirs.get(name, ())}
+
+    def differences(self, other: Tree) -> List[str]:
+        """The names of the files and directories that differ between this tree and the other one.
+        Only the subtrees whose hashes differ are visited. Each name is returned once, e.g., a file on one side
+        that is a directory on the other one."""
+        if self.hash() == other.hash():
+            return []
+        result: Dict[str, None] = {}  # dicts are used as ordered sets
+        pending = ['']
+        while pending:
+            name = pending.pop()
+            prefix = name + '/' if name else ''
+            local = self.children(name)
+            remote = other.children(name)
+            for key in sorted(local.keys() | remote.keys()):
+                if local.get(key, None) == remote.get(key, None):
+                    continue
+                if key.endswith('/') and key in local and key in remote:
+                    pending.append(prefix + key[:-1])
+                else:
+                    result[prefix + key.rstrip('/')] = None
+        return list(result)
+
+    def _add(self, name: str, digest: str):
+        self._files[name] = digest
+        parts = name.split('/')
+        for i in range(len(parts)):
+            parent = '/'.join(parts[:i])
+            key = parts[i] if i == len(parts) - 1 else parts[i] + '/'
+            self._dirs.setdefault(parent, set()).add(key)
+            self._dir_hashes.pop(parent, None)
+
+    def _remove(self, name: str) -> Dict[str, str]:
+        """Remove the file or directory name, returns the removed files."""
+        removed = {}
+        if name in self._files:
+            removed[name] = self._files.pop(name)
+            self._detach(name, name.rsplit('/', 1)[-1])
+        elif name in self._dirs and name:
+            pending = [name]
+            while pending:
+                dir_name = pending.pop()
+                for key in self._dirs.pop(dir_name):
+                    child = dir_name + '/' + key.rstrip('/')
+                    if key.endswith('/'):
+                        pending.append(child)
+                    else:
+                        removed[child] = self._files.pop(child)
+                self._dir_hashes.pop(dir_name, None)
+            self._detach(name, name.rsplit('/', 1)[-1] + '/')
+        return removed
+
+    def _detach(self, name: str, key: str):
+        """Remove key from the parent of name, pruning the directories left empty."""
+        while True:
+            parent = name.rsplit('/', 1)[0] if '/' in name else ''
+            self._dirs[parent].discard(key)
+            self._dir_hashes.pop(parent, None)
+            if self._dirs[parent] or not parent:
+                break
+            del self._dirs[parent]
+            name, key = parent, parent.rsplit('/', 1)[-1] + '/'
+        while parent:  # the ancestors hashes are stale too
+            parent = parent.rsplit('/', 1)[0] if '/' in parent else ''
+            self._dir_hashes.pop(parent, None)
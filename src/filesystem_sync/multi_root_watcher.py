@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from pathlib import Path
+from threading import Lock
+from typing import Callable, List, Dict, Tuple
+
+from watchdog.events import FileSystemEvent
+from watchdog.observers import Observer
+
+from filesystem_sync.any_observer import AnyObserver
+from filesystem_sync.coalescing_buffer import CoalescingBuffer
+from filesystem_sync.debouncer import Debouncer
+from filesystem_sync.debouncer_scheduler import DebouncerScheduler
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.write_journal import WriteJournal
+
+
+class MultiRootWatcher:
+    """Like many WatchdogDebouncer, one per root, but sharing a single watchdog Observer
+    and a single DebouncerScheduler thread. Each root has its own Debouncer and callback."""
+
+    def __init__(self, window: timedelta, max_wait: timedelta | None = None, leading: bool = False,
+                 coalesce: bool = False):
+        self.window = window
+        self.max_wait = max_wait
+        self.leading = leading
+        self.coalesce = coalesce
+        self._observer = Observer()
+        self._scheduler = DebouncerScheduler()
+        self._roots: Dict[Path, Tuple[AnyObserver, Debouncer]] = {}
+        self._lock = Lock()
+        self._started = False
+
+    def add_root(self, path: Path, callback: Callable[[List[FileSystemEvent]], None],
+                 path_filter: PathFilter | None = None, journal: WriteJournal | None = None) -> None:
+        """path need to exist; roots can be added before or after start."""
+        events_buffer = CoalescingBuffer() if self.coalesce else None
+        debouncer = Debouncer(self.window, max_wait=self.max_wait, leading=self.leading, events_buffer=events_buffer)
+
+        def skip_open(event: FileSystemEvent):
+            if event.event_type != 'opened':
+                debouncer.add_event(event)
+
+        any_observer = AnyObserver(path, skip_open, self._observer, path_filter, journal)
+        with self._lock:
+            if path in self._roots:
+                raise ValueError(f'Root already watched: {path}')
+            self._roots[path] = any_observer, debouncer
+            self._scheduler.add(debouncer, callback)
+            if self._started:
+                any_observer.watch_directory()
+
+    def remove_root(self, path: Path) -> None:
+        with self._lock:
+            any_observer, debouncer = self._roots.pop(path)
+            any_observer.unwatch_directory()
+            self._scheduler.remove(debouncer)
+
+    def roots(self) -> List[Path]:
+        with self._lock:
+            return list(self._roots)
+
+    def start(self):
+        with self._lock:
+            self._started = True
+            self._scheduler.start()
+            for any_observer, _ in self._roots.values():
+                any_observer.watch_directory()
+            if not self._observer.is_alive():
+                self._observer.start()
+
+    def stop(self):
+        self._observer.stop()
+        self._scheduler.stop()
+
+    def join(self):
+        try:
+            self._observer.join()
+        except RuntimeError:
+            pass  # catch if it was not started
+        self._scheduler.join()
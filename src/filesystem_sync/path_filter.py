@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, Tuple, Iterator, Dict, Pattern
+
+from watchdog.events import FileSystemEvent, DirCreatedEvent, FileCreatedEvent, DirDeletedEvent, FileDeletedEvent
+
+from filesystem_sync.scan import scan
+
+
+class PathFilter:
+    """Exclude paths with gitignore-style patterns, relative to the watched root.
+
+    Supported: blank lines and # comments, ! to re-include, a trailing / to match only directories,
+    a leading or middle / to anchor the pattern to the root, *, ?, [...] and **.
+    As in git, a file cannot be re-included if one of its parent directories is excluded.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._rules: List[Tuple[Pattern, bool, bool]] = []  # regex, negated, only directories
+        self._dirs: Dict[str, bool] = {}  # directory name -> excluded
+        for pattern in patterns:
+            self.add(pattern)
+
+    @staticmethod
+    def from_file(path: Path) -> PathFilter:
+        return PathFilter(path.read_text().splitlines())
+
+    def add(self, pattern: str) -> None:
+        pattern = pattern.rstrip('\n').rstrip(' ')
+        if not pattern or pattern.startswith('#'):
+            return
+        negated = pattern.startswith('!')
+        if negated:
+            pattern = pattern[1:]
+        only_directories = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        regex = _translate(pattern.lstrip('/'))
+        self._rules.append((re.compile(regex if anchored else '(?:.*/)?' + regex), negated, only_directories))
+        self._dirs.clear()
+
+    def excluded(self, name: str, is_directory: bool) -> bool:
+        """name is relative to the root and uses / as separator."""
+        if '/' in name and self._excluded_dir(name.rsplit('/', 1)[0]):
+            return True
+        return self._match(name, is_directory)
+
+    def walk(self, root: Path) -> Iterator[str]:
+        """The relative names of the files and directories below root that are not excluded;
+        excluded directories are not visited. See scan for an inventory with the stat of the entries."""
+        return iter(scan(root, self))
+
+    def _excluded_dir(self, name: str) -> bool:
+        excluded = self._dirs.get(name, None)
+        if excluded is None:
+            excluded = self.excluded(name, True)
+            if len(self._dirs) > 10_000:
+                self._dirs.clear()
+            self._dirs[name] = excluded
+        return excluded
+
+    def _match(self, name: str, is_directory: bool) -> bool:
+        excluded = False
+        for regex, negated, only_directories in self._rules:
+            if only_directories and not is_directory:
+                continue
+            if regex.fullmatch(name):
+                excluded = not negated
+        return excluded
+
+
+def walk(root: Path, path_filter: PathFilter | None = None) -> Iterator[str]:
+    """The relative names below root, as with Path.rglob('*'), skipping what path_filter excludes."""
+    return iter(scan(root, path_filter))
+
+
+def filter_events(path_filter: PathFilter | None, root: Path, events: List[FileSystemEvent]) -> List[FileSystemEvent]:
+    """The events as the sync sees them when the paths excluded by path_filter are ignored, see filter_event."""
+    if path_filter is None:
+        return events
+    return [e for e in (filter_event(path_filter, str(root), e) for e in events) if e is not None]
+
+
+def filter_event(path_filter: PathFilter, root: str, event: FileSystemEvent) -> FileSystemEvent | None:
+    """The event as the sync sees it when the paths excluded by path_filter are ignored: None when it involves
+    only excluded paths, a creation or a deletion when it is a move in from, or out to, an excluded path."""
+    src_excluded = _excluded(path_filter, root, event.src_path, event.is_directory)
+    if event.event_type != 'moved':
+        return None if src_excluded else event
+    dest_excluded = _excluded(path_filter, root, event.dest_path, event.is_directory)
+    if src_excluded and dest_excluded:
+        return None
+    if src_excluded:  # moved in from an excluded path, for the sync it is new
+        return (DirCreatedEvent if event.is_directory else FileCreatedEvent)(event.dest_path)
+    if dest_excluded:  # moved out to an excluded path, for the sync it is gone
+        return (DirDeletedEvent if event.is_directory else FileDeletedEvent)(event.src_path)
+    return event
+
+
+def _excluded(path_filter: PathFilter, root: str, path: str, is_directory: bool) -> bool:
+    name = os.path.relpath(path, root)
+    if name == '.' or name.startswith('..'):
+        return False
+    return path_filter.excluded(name.replace(os.sep, '/'), is_directory)
+
+
+def _translate(pattern: str) -> str:
+    result = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            result += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            result += '/.*'
+            i += 3
+        elif pattern.startswith('**', i):
+            result += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            result += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            result += '[^/]'
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                result += re.escape(pattern[i])
+                i += 1
+            else:
+                content = pattern[i + 1:end]
+                if content.startswith('!'):
+                    content = '^' + content[1:]
+                result += '[' + content.replace('\\', '\\\\') + ']'
+                i = end + 1
+        elif pattern[i] == '\\' and i + 1 < len(pattern):
+            result += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            result += re.escape(pattern[i])
+            i += 1
+    return result
@@ -0,0 +1,132 @@
+"""A single pass over a tree with os.scandir, keeping the stat of every entry.
+
+The scandir entries carry the file type, and their lstat is cached, so every entry costs at most one stat
+(none for the directories skipped by a PathFilter). The result is an Inventory: the names and, in parallel
+arrays, the mode, size and mtime_ns of the entries, which sync_init, manifest and the zip of sync_zip use
+instead of calling stat again for each name.
+"""
+from __future__ import annotations
+
+import os
+from array import array
+from concurrent.futures import Executor
+from pathlib import Path
+from stat import S_ISREG, S_ISDIR, S_ISLNK
+from typing import Dict, Iterator, List, NamedTuple, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from filesystem_sync.path_filter import PathFilter
+
+
+class Entry(NamedTuple):
+    """The fields have the names of os.stat_result, so an Entry can be used where only these are read."""
+    name: str
+    st_mode: int
+    st_size: int
+    st_mtime_ns: int
+
+    def is_file(self) -> bool:
+        return S_ISREG(self.st_mode)
+
+    def is_dir(self) -> bool:
+        return S_ISDIR(self.st_mode)
+
+    def is_symlink(self) -> bool:
+        return S_ISLNK(self.st_mode)
+
+    def followed(self, root: Path) -> Entry | None:
+        """The entry of the file a symlink points to (as Path.stat), None when it is broken"""
+        if not self.is_symlink():
+            return self
+        try:
+            stat = (root / self.name).stat()
+        except OSError:
+            return None
+        return Entry(self.name, stat.st_mode, stat.st_size, stat.st_mtime_ns)
+
+
+class Inventory:
+    """The entries below a root, in the order of the scan: a directory comes before its entries.
+    Iterating an Inventory gives the relative names, with / as separator."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.modes = array('L')
+        self.sizes = array('q')
+        self.mtimes_ns = array('q')
+        self._index: Dict[str, int] | None = None
+
+    def append(self, name: str, stat: os.stat_result) -> None:
+        self.names.append(name)
+        self.modes.append(stat.st_mode)
+        self.sizes.append(stat.st_size)
+        self.mtimes_ns.append(stat.st_mtime_ns)
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._name_index()
+
+    def __getitem__(self, i: int) -> Entry:
+        return Entry(self.names[i], self.modes[i], self.sizes[i], self.mtimes_ns[i])
+
+    def get(self, name: str) -> Entry | None:
+        i = self._name_index().get(name, None)
+        return self[i] if i is not None else None
+
+    def entries(self) -> Iterator[Entry]:
+        return map(Entry, self.names, self.modes, self.sizes, self.mtimes_ns)
+
+    def files(self) -> Iterator[Entry]:
+        """The regular files, symlinks excluded"""
+        return (entry for entry in self.entries() if S_ISREG(entry.st_mode))
+
+    def _name_index(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.names)}
+        return self._index
+
+
+def scan(root: Path, path_filter: PathFilter | None = None, executor: Executor | None = None) -> Inventory:
+    """The entries below root, without following the symlinks; the directories excluded by path_filter
+    are not visited. When an executor is given (e.g., a ThreadPoolExecutor), the directories of the same
+    depth are listed concurrently; the order of the inventory is the same as without it."""
+    inventory = Inventory()
+    level = ['']
+    while level:
+        listings = executor.map(_list, [root] * len(level), level, [path_filter] * len(level)) \
+            if executor is not None and len(level) > 1 else (_list(root, prefix, path_filter) for prefix in level)
+        level = []
+        for entries, directories in listings:
+            for name, stat in entries:
+                inventory.append(name, stat)
+            level.extend(directories)
+    return inventory
+
+
+def _list(root: Path, prefix: str, path_filter: PathFilter | None) -> Tuple[List[tuple], List[str]]:
+    """The (name, stat) of the entries of the directory root/prefix, and the prefixes of its subdirectories"""
+    entries = []
+    directories = []
+    try:
+        iterator = os.scandir(os.path.join(root, prefix))
+    except OSError:
+        return entries, directories  # removed meanwhile, or not readable
+    with iterator:
+        for e in iterator:
+            name = prefix + e.name
+            try:
+                is_directory = e.is_dir(follow_symlinks=False)
+                if path_filter is not None and path_filter.excluded(name, is_directory):
+                    continue
+                entries.append((name, e.stat(follow_symlinks=False)))
+            except OSError:
+                continue  # removed meanwhile
+            if is_directory:
+                directories.append(name + '/')
+    return entries, directories
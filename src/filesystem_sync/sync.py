@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List, Any, Protocol
+from typing import List, Any, Protocol, Iterator, Iterable
 
 from watchdog.events import FileSystemEvent
 
@@ -37,3 +37,20 @@ The output is:
 The output is:
 - a list of filesystem aggregated change events that reflect the current state of the source filesystem
 """
+
+
+class StreamSync(Protocol):
+    """Like Sync, but the changes are produced and consumed one frame at a time,
+so that the memory needed does not depend on the size of the files."""
+
+    @staticmethod
+    def sync_source(source: Path, events: List[FileSystemEvent]) -> Iterator[Any]:
+        """Like Sync.sync_source but the changes are lazily generated frames"""
+
+    @staticmethod
+    def sync_target(target: Path, changes: Iterable[Any]) -> None:
+        """Like Sync.sync_target but the frames are consumed incrementally"""
+
+    @staticmethod
+    def sync_init(source: Path) -> Iterator[Any]:
+        """Like Sync.sync_init but the changes are lazily generated frames"""
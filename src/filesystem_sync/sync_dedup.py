@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+from pathlib import Path
+from typing import List, Any, Dict, Iterator, Tuple
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync import sync_delta
+from filesystem_sync.atomic_write import AtomicWriter, FSYNC_NONE
+from filesystem_sync.chunk_store import ChunkStore, ChunkIndex
+from filesystem_sync.chunking import cdc_chunks
+from filesystem_sync.hash_cache import content_hash
+from filesystem_sync.path_filter import PathFilter, walk, filter_events
+from filesystem_sync.write_journal import WriteJournal
+
+
+class SyncDedup:
+    """A Sync that sends the files as recipes of content-defined chunks, shipping only the chunks
+    that the target store does not have; duplicated content (copied files, vendored libraries)
+    is sent once.
+
+    A modified file is {'name', 'digest', 'recipe': [chunk digests], 'chunks': {digest: b64}} where chunks holds
+    the missing chunks first referenced by this file. The source asks the target which chunks are missing
+    through remote; by default it is the store, i.e., source and target are in the same process.
+    The files are read as streams, twice for those with missing chunks: first for the recipe, then for the chunks.
+    The target writes them chunk by chunk from the store. It pins all the chunks of a batch in the store until the
+    batch is applied (a chunk is shipped once, with the first file of the batch that needs it), so the store exceeds
+    its max_bytes by up to the distinct content of the batch: bound the batches (e.g., the debouncer ones) accordingly.
+    The paths excluded by path_filter are ignored.
+    """
+
+    def __init__(self, store: ChunkStore | None = None, remote: ChunkIndex | None = None,
+                 min_size: int = 2048, avg_size: int = 8192, max_size: int = 65536,
+                 path_filter: PathFilter | None = None):
+        self.store = store if store is not None else ChunkStore()
+        self.remote = remote if remote is not None else self.store
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        self.path_filter = path_filter
+
+    def sync_source(self, source: Path, events: List[FileSystemEvent]) -> List[Any]:
+        result = []
+        for op in sync_delta.events_ops(source, filter_events(self.path_filter, source, events)):
+            status, name = op[0], op[1]
+            if status == 'deleted':
+                result.append({'name': name, 'content': None})
+            elif status == 'moved':
+                result.append({'name': name, 'moved_from': op[2]})
+            elif status == 'modified':
+                result.append(name)
+        return self._with_chunks(source, result)
+
+    def sync_target(self, target_root: Path, changes: List[Any], fsync: str = FSYNC_NONE,
+                    journal: WriteJournal | None = None) -> None:
+        recipes = [digest for change in changes if 'recipe' in change for digest in change['recipe']]
+        with self.store.pinned(recipes), AtomicWriter(fsync, journal) as writer:
+            for change in changes:
+                if 'recipe' in change:
+                    for digest, b64 in change.get('chunks', {}).items():
+                        if self.store.put(base64.b64decode(b64)) != digest:
+                            raise ValueError(f'Corrupted chunk {digest} of {change["name"]}')
+                    self._assemble(target_root / change['name'], change, writer)
+                else:
+                    sync_delta.apply(target_root, change, writer)
+
+    def sync_init(self, source: Path, path_filter: PathFilter | None = None) -> List[Any]:
+        """path_filter defaults to the one of this SyncDedup."""
+        if path_filter is None:
+            path_filter = self.path_filter
+        return self._with_chunks(source, list(walk(source, path_filter)))
+
+    def _with_chunks(self, source: Path, changes: List[Any]) -> List[Any]:
+        """Replace the names in changes with the recipes of the files, adding the chunks the target misses."""
+        result = []
+        for change in changes:
+            if not isinstance(change, str):
+                result.append(change)
+                continue
+            try:
+                if not (source / change).is_file():
+                    continue
+                digest, recipe = self._recipe(source / change)
+            except OSError:
+                continue  # the file was removed after the event
+            result.append({'name': change, 'digest': digest, 'recipe': recipe})
+        missing = set(self.remote.missing(d for change in result if 'recipe' in change for d in change['recipe']))
+        kept = []
+        for change in result:
+            first = [d for d in dict.fromkeys(change.get('recipe', ())) if d in missing]
+            if first:
+                chunks = self._chunks(source / change['name'], change['recipe'], first)
+                if chunks is None:
+                    continue  # changed since its recipe was made, its modification will follow
+                missing.difference_update(first)
+                change['chunks'] = chunks
+            kept.append(change)
+        return kept
+
+    def _split(self, path: Path) -> Iterator[Tuple[str, bytes]]:
+        with path.open('rb') as f:
+            for chunk in cdc_chunks(f, self.min_size, self.avg_size, self.max_size):
+                yield content_hash(chunk), chunk
+
+    def _recipe(self, path: Path) -> Tuple[str, List[str]]:
+        """The content hash of the file and the digests of its chunks"""
+        h = hashlib.blake2b(digest_size=16)  # as content_hash
+        recipe = []
+        for digest, chunk in self._split(path):
+            h.update(chunk)
+            recipe.append(digest)
+        return h.hexdigest(), recipe
+
+    def _chunks(self, path: Path, recipe: List[str], wanted: List[str]) -> Dict[str, str] | None:
+        """The wanted chunks of the file, b64 encoded; None when the file no longer matches recipe"""
+        wanted_set = set(wanted)
+        chunks = {}
+        i = 0
+        try:
+            for digest, chunk in self._split(path):
+                if i >= len(recipe) or recipe[i] != digest:
+                    return None
+                i += 1
+                if digest in wanted_set and digest not in chunks:
+                    chunks[digest] = base64.b64encode(chunk).decode('utf-8')
+        except OSError:
+            return None
+        if i != len(recipe):
+            return None
+        return {digest: chunks[digest] for digest in wanted}
+
+    def _assemble(self, target: Path, change: Dict[str, Any], writer: AtomicWriter) -> None:
+        """Write the chunks of the recipe to a temporary file, which replaces target once verified."""
+        writer.mkdir(target.parent)
+        temp = writer.temporary(target)
+        h = hashlib.blake2b(digest_size=16)  # as content_hash
+        try:
+            with temp.open('wb') as f:
+                for digest in change['recipe']:
+                    try:
+                        chunk = self.store.get(digest)
+                    except KeyError:
+                        raise ValueError(f'Chunk {digest} of {change["name"]} is not in the store, a resync is needed')
+                    h.update(chunk)
+                    f.write(chunk)
+            if h.hexdigest() != change['digest']:
+                raise ValueError(f'The assembled content of {change["name"]} differs from the source one')
+            writer.commit(temp, target)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
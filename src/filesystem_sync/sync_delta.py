@@ -1,86 +1,376 @@
+from __future__ import annotations
+
 import base64
-import shutil
+import os
+from collections import deque
+from concurrent.futures import Executor, Future
 from pathlib import Path
-from typing import List, Any
+from stat import S_ISREG, S_ISLNK, S_ISDIR, S_IMODE
+from typing import List, Any, Dict, Tuple, Iterable, Deque, Iterator
 
 from watchdog.events import FileSystemEvent
 
+from filesystem_sync.atomic_write import AtomicWriter, FSYNC_NONE
+from filesystem_sync.chunking import Resume, chunk_entries, apply_chunk
+from filesystem_sync.compression import Compressor, decompress
+from filesystem_sync.hash_cache import HashCache, CacheEntry, content_hash, file_hash
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.scan import Inventory, scan
+from filesystem_sync.write_journal import WriteJournal
+
+MAX_IN_FLIGHT = 64 * 1024 * 1024
+
+
+def sync_source(source: Path, events: List[FileSystemEvent], cache: HashCache | None = None,
+                executor: Executor | None = None, max_in_flight: int = MAX_IN_FLIGHT,
+                compressor: Compressor | None = None, chunk_size: int | None = None,
+                resume: Resume | None = None, metadata: bool = False) -> List[Any]:
+    """When a cache is given, the files whose content did not change since they were last sent are skipped.
+    When an executor is given (e.g., a ThreadPoolExecutor), the files are read and hashed concurrently.
+    When a compressor is given, the content is compressed with the codec it chooses for each file.
+    When chunk_size is given, the larger files are sent in chunks (see the chunking module),
+    skipping the ones the target already received according to resume.
+    When metadata is true, the changes carry mode and mtime_ns, symlinks are sent as such
+    and directories are sent too (see _files)."""
+    return list(iter_source(source, events, cache, executor, max_in_flight, compressor, chunk_size, resume, metadata))
+
+
+def iter_source(source: Path, events: List[FileSystemEvent], cache: HashCache | None = None,
+                executor: Executor | None = None, max_in_flight: int = MAX_IN_FLIGHT,
+                compressor: Compressor | None = None, chunk_size: int | None = None,
+                resume: Resume | None = None, metadata: bool = False) -> Iterator[Any]:
+    """Like sync_source, but the changes are generated as they are consumed: with chunk_size, only one chunk
+    of a large file is in memory at a time, e.g., when each change is sent as it comes."""
+    modified = []
+    if metadata:
+        modified.extend(_directories(source, events))
+    for op in events_ops(source, events):
+        status, name = op[0], op[1]
+        if status == 'deleted':
+            if cache is not None:
+                cache.forget(name)
+            yield {'name': name, 'content': None}
+        elif status == 'moved':
+            if cache is not None:
+                cache.forget(name)
+                cache.move(op[2], name)
+            yield {'name': name, 'moved_from': op[2]}
+        elif status == 'modified':
+            modified.append(name)
+    yield from _files(source, modified, cache, executor, max_in_flight, None, compressor, chunk_size, resume,
+                      metadata)
+
+
+def events_ops(source: Path, events: List[FileSystemEvent]) -> List[Tuple[str, ...]]:
+    """Aggregate the events into the operations to apply, in order:
+- ('deleted', name) and ('moved', name, moved_from_name) as they happened, chains of moves are collapsed;
+  the intermediate names of a chain are deleted, as the moves may have replaced what was there;
+  the moves into a directory created by these events follow the later renames of that directory
+- followed by ('modified', name) for every file whose content needs to be sent
+"""
+    ops: List[Tuple[str, ...]] = []
+    modified: Dict[str, None] = {}  # dicts are used as ordered sets
+    created: Dict[str, None] = {}  # names that did not exist before these events
+
+    def relative(path) -> str:
+        return str(Path(path).relative_to(source))
+
+    def below(names: Dict[str, None], name: str, is_directory: bool) -> List[str]:
+        if is_directory:
+            return [n for n in names if _is_same_or_below(n, name)]
+        return [name] if name in names else []
+
+    def discard(name: str, is_directory: bool):
+        for names in (modified, created):
+            for name_p in below(names, name, is_directory):
+                del names[name_p]
+
+    def rename(src: str, dst: str, is_directory: bool):
+        for names in (modified, created):
+            for name_p in below(names, src, is_directory):
+                del names[name_p]
+                names[dst + name_p[len(src):]] = None
 
-def sync_source(source: Path, events: List[FileSystemEvent]) -> List[Any]:
-    state = {}
-    moved = {}
     for e in events:
-        src = Path(e.src_path)
-        name = str(src.relative_to(source))
-        prev = state.get(name, None)
-        if e.is_directory:
-            if e.event_type == 'deleted':
-                for name_p in list(state.keys()):
-                    if name_p.startswith(name):
-                        del state[name_p]
-                state[name] = 'deleted'
-
-        else:  # is file
-            if e.event_type == 'moved':
-                dst = Path(e.dest_path)
-                dst_name = str(dst.relative_to(source))
-                moved[dst_name] = name
-            if e.event_type == 'created':
-                state[name] = 'modified'
-            if e.event_type == 'modified':
-                state[name] = state.get(name, 'modified')  # if it was created, it stays created
-            elif e.event_type == 'deleted':
-                if prev == 'modified':
-                    del state[name]
+        name = relative(e.src_path)
+        if e.event_type == 'created':
+            created[name] = None
+            if not e.is_directory:
+                modified[name] = None
+        elif e.event_type == 'modified':
+            if not e.is_directory:
+                modified[name] = None
+        elif e.event_type == 'deleted':
+            was_created = name in created
+            discard(name, e.is_directory)
+            if not was_created or e.is_directory:  # something may have been moved into the created directory
+                while ops and ops[-1][0] == 'deleted' and _is_same_or_below(ops[-1][1], name):
+                    ops.pop()
+                ops.append(('deleted', name))
+        elif e.event_type == 'moved' and not e.is_synthetic:  # synthetic are the moves of a moved directory content
+            try:
+                dst = relative(e.dest_path)
+            except ValueError:  # moved outside the source
+                discard(name, e.is_directory)
+                ops.append(('deleted', name))
+                continue
+            discard(dst, e.is_directory)
+            if name not in created:
+                if ops and ops[-1][0] == 'moved' and ops[-1][1] == name:
+                    name_o = ops.pop()[2]
+                    ops.append(('deleted', name))  # the first move may have overwritten it
+                    if name_o != dst:
+                        ops.append(('moved', dst, name_o))
                 else:
-                    state[name] = 'deleted'
+                    ops.append(('moved', dst, name))
+            else:  # the target does not have it, but the earlier moves into it must follow it
+                ops[:] = [(op[0], dst + op[1][len(name):]) + op[2:] if _is_same_or_below(op[1], name) else op
+                          for op in ops]
+            rename(name, dst, e.is_directory)
+
+    return ops + [('modified', name) for name in modified]
+
+
+def events_state(source: Path, events: List[FileSystemEvent]) -> Dict[str, str]:
+    """Aggregate the events into a dict of relative name -> 'modified' | 'deleted'.
+Moves are expanded to the deletion of the origin and the modification of all the files at the destination."""
+    state = {}
+    for op in events_ops(source, events):
+        status, name = op[0], op[1]
+        if status == 'moved':
+            state[op[2]] = 'deleted'
+            path = source / name
+            for p in [path] + (list(path.rglob('*')) if path.is_dir() else []):
+                if p.is_file():
+                    state[str(p.relative_to(source))] = 'modified'
+        else:
+            state[name] = status
+    return state
+
+
+def _directories(source: Path, events: List[FileSystemEvent]) -> List[str]:
+    """The directories created or modified (i.e., an entry changed) by the events, except the source itself"""
+    result = {}
+    for e in events:
+        if e.is_directory and e.event_type in ('created', 'modified', 'moved'):
+            path = Path(e.dest_path if e.event_type == 'moved' else e.src_path)
+            if path != source and source in path.parents:
+                result[str(path.relative_to(source))] = None
+    return list(result)
+
+
+def _is_same_or_below(name: str, parent: str) -> bool:
+    return name == parent or name.startswith(parent + '/')
+
 
-    result = []
-    for name, status in state.items():
+def _files(source: Path, names: Iterable[str], cache: HashCache | None = None,
+           executor: Executor | None = None, max_in_flight: int = MAX_IN_FLIGHT,
+           target_manifest: Dict[str, str] | None = None, compressor: Compressor | None = None,
+           chunk_size: int | None = None, resume: Resume | None = None, metadata: bool = False,
+           inventory: Inventory | None = None) -> Iterator[Dict[str, Any]]:
+    """The changes of the files; they are read, concurrently when an executor is given, keeping the order of names.
+    The files being read at the same time are kept under max_in_flight bytes (but at least one is read).
+    When target_manifest is given, the files already on the target are skipped instead of the cached ones.
+    When inventory is given (see the scan module), the names are not stat again.
+
+    With metadata, every change carries the mode and mtime_ns of the file; a file whose content is skipped
+    is sent as a metadata-only change {'name', 'mode', 'mtime_ns'}, so the target needs no content transfer.
+    Symlinks are sent as {'name', 'symlink'} and directories as {'name', 'directory': True}, after the files
+    and the deepest first, so that their mtime is not changed by the entries written inside them."""
+    pending: Deque[tuple] = deque()
+    in_flight = 0
+    directories = []
+
+    def with_metadata(change: Dict[str, Any], stat: os.stat_result) -> Dict[str, Any]:
+        if metadata:
+            if not S_ISLNK(stat.st_mode):
+                change['mode'] = S_IMODE(stat.st_mode)
+            change['mtime_ns'] = stat.st_mtime_ns
+        return change
+
+    def skip(name: str, entry: CacheEntry | None, digest: str) -> bool:
+        if target_manifest is not None:
+            return target_manifest.get(name, None) == digest
+        return entry is not None and entry.digest == digest
+
+    def complete() -> Dict[str, Any] | None:
+        nonlocal in_flight
+        name, stat, entry, future, size = pending.popleft()
+        in_flight -= size
+        try:
+            data, digest = future.result()
+        except Exception:
+            return None  # e.g., the file was deleted after the event
+        if data is None:  # the content is unchanged
+            return with_metadata({'name': name}, stat)
+        if cache is not None and digest is not None:
+            cache.put(name, CacheEntry(stat.st_size, stat.st_mtime_ns, digest))
+        if digest is not None and skip(name, entry, digest):
+            return with_metadata({'name': name}, stat) if metadata else None
+        return with_metadata(data if isinstance(data, dict) else content_entry(name, data), stat)
+
+    def drain(until_in_flight: int = -1) -> Iterator[Dict[str, Any]]:
+        """Complete the pending reads, the oldest first, while more than until_in_flight bytes are being read"""
+        while pending and in_flight > until_in_flight:
+            change = complete()
+            if change is not None:
+                yield change
+
+    def completed(name: str, stat: os.stat_result, entry: CacheEntry | None, value: tuple):
+        pending.append((name, stat, entry, _inline.submit(lambda: value), 0))
+
+    for name in names:
         path = source / name
-        if status == 'deleted':
-            result.append({'name': str(name), 'content': None})
-        elif status == 'modified':
-            _append_file(result, name, path)
-    return result
+        try:
+            stat = inventory.get(name) if inventory is not None else None
+            if stat is None:
+                stat = path.lstat() if metadata else path.stat()
+            elif not metadata:
+                stat = stat.followed(source)
+                if stat is None:
+                    continue
+            if metadata and S_ISLNK(stat.st_mode):
+                completed(name, stat, None, ({'name': name, 'symlink': os.readlink(path)}, None))
+                continue
+        except OSError:
+            continue
+        if metadata and S_ISDIR(stat.st_mode):
+            directories.append((name, stat))
+            continue
+        if not S_ISREG(stat.st_mode):
+            continue
+        entry = cache.get(name) if cache is not None else None
+        if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            if target_manifest is None or target_manifest.get(name, None) == entry.digest:
+                if metadata:
+                    completed(name, stat, entry, (None, entry.digest))
+                continue
+        if chunk_size is not None and stat.st_size > chunk_size:
+            yield from drain()
+            try:
+                digest = file_hash(path, size=stat.st_size)  # the chunks are read up to that size too
+                if cache is not None:
+                    cache.put(name, CacheEntry(stat.st_size, stat.st_mtime_ns, digest))
+                if not skip(name, entry, digest):
+                    yield from chunk_entries(name, path, digest, chunk_size, resume, stat.st_size)  # read lazily
+                if metadata:
+                    yield with_metadata({'name': name}, stat)
+            except OSError:
+                pass  # the file was removed after the event
+            continue
+        with_hash = cache is not None or target_manifest is not None
+        yield from drain(max_in_flight - stat.st_size)
+        future = (executor or _inline).submit(_read, path, with_hash, name, compressor)
+        pending.append((name, stat, entry, future, stat.st_size))
+        in_flight += stat.st_size
+        if executor is None:
+            yield from drain()
+    yield from drain()
+    for name, stat in sorted(directories, key=lambda d: -d[0].count('/')):  # a mkdir changes the parent mtime
+        yield with_metadata({'name': name, 'directory': True}, stat)
+
+
+def _read(path: Path, with_hash: bool, name: str = '',
+          compressor: Compressor | None = None) -> Tuple[bytes | Dict[str, Any], str | None]:
+    """The content, or its compressed change when it is worth compressing, and the hash of the content."""
+    data = path.read_bytes()
+    digest = content_hash(data) if with_hash else None
+    if compressor is not None:
+        change = compressor.compressed_entry(name, data)
+        if change is not None:
+            return change, digest
+    return data, digest
 
 
-def _append_file(result, name, path):
-    if path.is_file() and path.exists():
+class _InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
         try:
-            result.append({'name': str(name), 'content': path.read_text()})
-        except UnicodeDecodeError:
-            b64 = base64.b64encode(path.read_bytes()).decode('utf-8')
-            result.append({'name': str(name), 'content_b64': b64})
-        except Exception as e:
-            pass
-            # import traceback
-            # msg = f'Error reading {path}: {e}\n{traceback.format_exc()}'
-            # print(msg)
-
-
-def sync_target(target_root: Path, changes: List[Any]) -> None:
-    for change in changes:
-        target = target_root / change['name']
-        content = change.get('content', None)
-        if content is None and 'content_b64' in change:
-            content = base64.b64decode(change['content_b64'])
-        if content is not None:
-            target.parent.mkdir(parents=True, exist_ok=True)
-            if isinstance(content, bytes):
-                target.write_bytes(content)
-            else:
-                target.write_text(content)
-        else:
-            if target.exists():
-                if target.is_dir():
-                    shutil.rmtree(target)
-                else:
-                    target.unlink(missing_ok=True)
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+_inline = _InlineExecutor()
+
+
+def content_entry(name: str, data: bytes) -> Dict[str, Any]:
+    try:
+        return {'name': name, 'content': data.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'name': name, 'content_b64': base64.b64encode(data).decode('utf-8')}
+
+
+def sync_target(target_root: Path, changes: List[Any], fsync: str = FSYNC_NONE,
+                journal: WriteJournal | None = None) -> None:
+    """The files are written atomically (see AtomicWriter); fsync is one of the policies of the atomic_write module.
+    When the target is watched, the journal given to its AnyObserver drops the events caused by these writes."""
+    with AtomicWriter(fsync, journal) as writer:
+        for change in changes:
+            apply(target_root, change, writer)
+
+
+def apply(target_root: Path, change: Dict[str, Any], writer: AtomicWriter) -> None:
+    if 'chunk_digest' in change:
+        apply_chunk(target_root, change, writer)
+        return
+    target = target_root / change['name']
+    if 'moved_from' in change:
+        origin = target_root / change['moved_from']
+        if os.path.lexists(origin):
+            writer.move(origin, target)
+        return
+    content = change.get('content', None)
+    if 'codec' in change:
+        content = decompress(change)
+    elif content is None and 'content_b64' in change:
+        content = base64.b64decode(change['content_b64'])
+    if content is not None:
+        writer.write(target, content, change.get('mode', None), change.get('mtime_ns', None))
+    elif 'symlink' in change:
+        writer.symlink(change['symlink'], target, change.get('mtime_ns', None))
+    elif change.get('directory', False):
+        if not target.is_dir() or target.is_symlink():
+            if os.path.lexists(target):
+                writer.remove(target)
+            writer.mkdir(target)
+            writer.changed(target.parent)
+        writer.metadata(target, change.get('mode', None), change.get('mtime_ns', None))
+    elif 'content' in change:
+        if os.path.lexists(target):
+            writer.remove(target)
+    else:  # the changes without mode and mtime_ns (e.g., sync_delta without metadata) leave them as they are
+        writer.metadata(target, change.get('mode', None), change.get('mtime_ns', None))
+
+
+def sync_init(source: Path, cache: HashCache | None = None, executor: Executor | None = None,
+              max_in_flight: int = MAX_IN_FLIGHT, target_manifest: Dict[str, str] | None = None,
+              path_filter: PathFilter | None = None, compressor: Compressor | None = None,
+              chunk_size: int | None = None, resume: Resume | None = None, metadata: bool = False) -> List[Any]:
+    """When the target_manifest is given (see the manifest module), only the differences with the target are sent.
+    The paths excluded by path_filter are not visited; the tree is scanned once (see the scan module),
+    with the executor, when given, listing the directories concurrently. See sync_source for the other arguments."""
+    return list(iter_init(source, cache, executor, max_in_flight, target_manifest, path_filter, compressor,
+                          chunk_size, resume, metadata))
 
 
-def sync_init(source: Path) -> List[Any]:
-    result = []
-    for path in source.rglob('*'):
-        _append_file(result, path.relative_to(source), path)
-    return result
+def iter_init(source: Path, cache: HashCache | None = None, executor: Executor | None = None,
+              max_in_flight: int = MAX_IN_FLIGHT, target_manifest: Dict[str, str] | None = None,
+              path_filter: PathFilter | None = None, compressor: Compressor | None = None,
+              chunk_size: int | None = None, resume: Resume | None = None, metadata: bool = False) -> Iterator[Any]:
+    """Like sync_init, but the changes are generated as they are consumed (see iter_source)."""
+    inventory = scan(source, path_filter, executor)
+    if target_manifest is None:
+        if cache is not None:
+            cache.clear()
+    else:
+        for name in target_manifest:
+            entry = inventory.get(name)
+            entry = entry.followed(source) if entry is not None else None
+            if entry is None or not entry.is_file():
+                if cache is not None:
+                    cache.forget(name)
+                yield {'name': name, 'content': None}
+    yield from _files(source, inventory, cache, executor, max_in_flight, target_manifest, compressor,
+                      chunk_size, resume, metadata, inventory)
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Any, Dict, NamedTuple, Iterator, Tuple
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync import sync_delta
+from filesystem_sync.atomic_write import AtomicWriter, FSYNC_NONE
+from filesystem_sync.hash_cache import content_hash
+from filesystem_sync.path_filter import PathFilter, walk, filter_events
+from filesystem_sync.write_journal import WriteJournal
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+_MOD_ADLER = 65521
+
+_WINDOW = 1024 * 1024  # offsets whose weak checksums numpy computes at once
+
+
+class Signature(NamedTuple):
+    digest: str
+    blocks: Dict[int, Dict[bytes, int]]  # weak checksum -> strong hash -> block index
+
+
+class SyncRsync:
+    """A Sync that sends modified files as rsync-style copy/literal instructions.
+
+    The source keeps the block signatures of the content it last sent for every file;
+    because the target applied that content, the signatures describe the target copy too.
+    Files without a signature (e.g., never sent) are sent in full like sync_delta does, and so are the files
+    whose delta would have more than max_literal (a share of the file size) of literal content.
+    The signatures of the least recently sent files are dropped when they have more than max_blocks blocks in total.
+    The paths excluded by path_filter are ignored.
+    """
+
+    def __init__(self, block_size: int = 4096, path_filter: PathFilter | None = None,
+                 max_literal: float = 0.5, max_blocks: int = 256 * 1024):
+        self.block_size = block_size
+        self.path_filter = path_filter
+        self.max_literal = max_literal
+        self.max_blocks = max_blocks
+        self._signatures: OrderedDict[str, Signature] = OrderedDict()  # least recently sent first
+        self._blocks = 0
+
+    def sync_source(self, source: Path, events: List[FileSystemEvent]) -> List[Any]:
+        result = []
+        for op in sync_delta.events_ops(source, filter_events(self.path_filter, source, events)):
+            status, name = op[0], op[1]
+            if status == 'deleted':
+                self._forget(name)
+                result.append({'name': name, 'content': None})
+            elif status == 'moved':
+                self._forget(name)
+                self._move(op[2], name)
+                result.append({'name': name, 'moved_from': op[2]})
+            elif status == 'modified':
+                self._append_file(result, name, source / name)
+        return result
+
+    def sync_target(self, target_root: Path, changes: List[Any], fsync: str = FSYNC_NONE,
+                    journal: WriteJournal | None = None) -> None:
+        with AtomicWriter(fsync, journal) as writer:
+            for change in changes:
+                if 'delta' not in change:
+                    sync_delta.apply(target_root, change, writer)
+                    continue
+                target = target_root / change['name']
+                base = target.read_bytes()
+                if content_hash(base) != change['base']:
+                    raise ValueError(f'Cannot apply delta, base content of {target} differs from the source one')
+                writer.write(target, patch(base, change['delta'], change['block_size']))
+
+    def sync_init(self, source: Path) -> List[Any]:
+        self._signatures.clear()
+        self._blocks = 0
+        result = []
+        for name in walk(source, self.path_filter):
+            self._append_file(result, name, source / name)
+        return result
+
+    def _forget(self, name: str):
+        prefix = name + '/'
+        for name_p in [n for n in self._signatures if n == name or n.startswith(prefix)]:
+            self._blocks -= _count(self._signatures.pop(name_p))
+
+    def _move(self, src: str, dst: str):
+        prefix = src + '/'
+        for name_p in [n for n in self._signatures if n == src or n.startswith(prefix)]:
+            self._signatures[dst + name_p[len(src):]] = self._signatures.pop(name_p)
+
+    def _append_file(self, result, name: str, path: Path):
+        if not path.is_file():
+            return
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return
+        previous = self._signatures.pop(name, None)
+        if previous is not None:
+            self._blocks -= _count(previous)
+        self._remember(name, signature(data, self.block_size))
+        if previous is not None:
+            instructions = delta(data, previous.blocks, self.block_size, int(len(data) * self.max_literal))
+            if instructions is not None and any(isinstance(i, list) for i in instructions):
+                result.append({'name': name, 'delta': instructions, 'base': previous.digest,
+                               'block_size': self.block_size})
+                return
+        result.append(sync_delta.content_entry(name, data))
+
+    def _remember(self, name: str, sig: Signature):
+        self._signatures[name] = sig
+        self._blocks += _count(sig)
+        while self._blocks > self.max_blocks and len(self._signatures) > 1:
+            self._blocks -= _count(self._signatures.popitem(last=False)[1])
+
+
+def signature(data: bytes, block_size: int) -> Signature:
+    blocks = {}
+    for index in range(len(data) // block_size):
+        block = data[index * block_size:(index + 1) * block_size]
+        blocks.setdefault(zlib.adler32(block), {}).setdefault(_strong(block), index)
+    return Signature(content_hash(data), blocks)
+
+
+def delta(data: bytes, blocks: Dict[int, Dict[bytes, int]], block_size: int,
+          max_literal: int | None = None) -> List[Any] | None:
+    """Compute the instructions to rebuild `data` from a base described by `blocks`.
+    An instruction is either [block index, block count] to copy from the base or a base64 literal string.
+    Returns None as soon as the literal content exceeds max_literal bytes.
+    The weak checksums are computed with numpy when it is installed, rolled byte by byte otherwise."""
+    if numpy is not None:
+        matches = _numpy_matches(data, blocks, block_size, max_literal)
+    else:
+        matches = _rolling_matches(data, blocks, block_size, max_literal)
+    instructions = []
+    literal = 0
+    literal_start = 0
+    for offset, index in matches:
+        literal += offset - literal_start
+        if max_literal is not None and literal > max_literal:
+            return None
+        _append_literal(instructions, data[literal_start:offset])
+        _append_copy(instructions, index)
+        literal_start = offset + block_size
+    literal += len(data) - literal_start
+    if max_literal is not None and literal > max_literal:
+        return None
+    _append_literal(instructions, data[literal_start:])
+    return instructions
+
+
+def _rolling_matches(data: bytes, blocks: Dict[int, Dict[bytes, int]], block_size: int,
+                     max_literal: int | None) -> Iterator[Tuple[int, int]]:
+    """The (offset, block index) of the blocks of data found in the base, without overlap;
+    stops early once the literal content between them exceeds max_literal bytes"""
+    offset = 0
+    literal = 0
+    literal_start = 0
+    weak = None
+    size = len(data)
+    while offset + block_size <= size:
+        if max_literal is not None and literal + offset - literal_start > max_literal:
+            return
+        if weak is None:
+            weak = zlib.adler32(data[offset:offset + block_size])
+        candidates = blocks.get(weak, None)
+        if candidates is not None:
+            index = candidates.get(_strong(data[offset:offset + block_size]), None)
+            if index is not None:
+                yield offset, index
+                literal += offset - literal_start
+                offset += block_size
+                literal_start = offset
+                weak = None
+                continue
+        if offset + block_size < size:
+            weak = _roll(weak, data[offset], data[offset + block_size], block_size)
+        offset += 1
+
+
+def _numpy_matches(data: bytes, blocks: Dict[int, Dict[bytes, int]], block_size: int,
+                   max_literal: int | None) -> Iterator[Tuple[int, int]]:
+    """Same as _rolling_matches, only the offsets whose weak checksum passes a bit table of the ones in blocks
+    are visited in Python"""
+    table = numpy.zeros(1 << 20, dtype=bool)
+    table[_table_index(numpy.fromiter(blocks.keys(), dtype=numpy.int64, count=len(blocks)))] = True
+    offset = 0
+    literal = 0
+    last = len(data) - block_size  # the last offset of a block
+    for start in range(0, last + 1, _WINDOW):
+        if max_literal is not None and literal + start - offset > max_literal:
+            return
+        end = min(start + _WINDOW, last + 1)
+        weak = _weak_checksums(data, start, end, block_size)
+        for candidate in (numpy.flatnonzero(table[_table_index(weak)]) + start).tolist():
+            if candidate < offset:
+                continue
+            candidates = blocks.get(int(weak[candidate - start]), None)
+            index = candidates.get(_strong(data[candidate:candidate + block_size]), None) if candidates else None
+            if index is not None:
+                yield candidate, index
+                literal += candidate - offset
+                offset = candidate + block_size
+
+
+def _table_index(weak):
+    return (weak ^ (weak >> 12)) & 0xfffff
+
+
+def _weak_checksums(data: bytes, start: int, end: int, block_size: int):
+    """The adler32 of the blocks of data at the offsets start..end-1, from prefix sums:
+    a = 1 + sum(x[i]) and b = block_size + sum((block_size - i) * x[i]) for i in the block"""
+    x = numpy.frombuffer(data, dtype=numpy.uint8, count=end - start + block_size - 1, offset=start).astype(numpy.int64)
+    sum_x = numpy.concatenate(([0], numpy.cumsum(x)))
+    sum_ix = numpy.concatenate(([0], numpy.cumsum(numpy.arange(len(x), dtype=numpy.int64) * x)))
+    i = numpy.arange(end - start, dtype=numpy.int64)
+    block_sum = sum_x[i + block_size] - sum_x[i]
+    a = (1 + block_sum) % _MOD_ADLER
+    b = (block_size + (block_size + i) * block_sum - (sum_ix[i + block_size] - sum_ix[i])) % _MOD_ADLER
+    return (b << 16) | a
+
+
+def patch(base: bytes, instructions: List[Any], block_size: int) -> bytes:
+    result = bytearray()
+    for instruction in instructions:
+        if isinstance(instruction, str):
+            result += base64.b64decode(instruction)
+        else:
+            index, count = instruction
+            result += base[index * block_size:(index + count) * block_size]
+    return bytes(result)
+
+
+def _roll(weak: int, out_byte: int, in_byte: int, block_size: int) -> int:
+    """Slide the adler32 window by one byte, see https://en.wikipedia.org/wiki/Adler-32"""
+    a = weak & 0xffff
+    b = weak >> 16
+    a = (a - out_byte + in_byte) % _MOD_ADLER
+    b = (b - block_size * out_byte + a - 1) % _MOD_ADLER
+    return (b << 16) | a
+
+
+def _append_literal(instructions: List[Any], literal: bytes):
+    if literal:
+        instructions.append(base64.b64encode(literal).decode('utf-8'))
+
+
+def _append_copy(instructions: List[Any], index: int):
+    if instructions and isinstance(instructions[-1], list):
+        last = instructions[-1]
+        if last[0] + last[1] == index:
+            last[1] += 1
+            return
+    instructions.append([index, 1])
+
+
+def _count(sig: Signature) -> int:
+    return sum(len(strong) for strong in sig.blocks.values())
+
+
+def _strong(block: bytes) -> bytes:
+    return hashlib.blake2b(block, digest_size=16).digest()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import base64
+import shutil
+from pathlib import Path
+from typing import List, Any, Iterator, Iterable, BinaryIO
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync import sync_delta
+from filesystem_sync.atomic_write import AtomicWriter, FSYNC_NONE
+from filesystem_sync.path_filter import PathFilter, walk, filter_events
+from filesystem_sync.write_journal import WriteJournal
+
+CHUNK_SIZE = 1024 * 1024
+"""The maximum number of file bytes carried by a single frame"""
+
+
+def sync_source(source: Path, events: List[FileSystemEvent], chunk_size: int = CHUNK_SIZE,
+                path_filter: PathFilter | None = None) -> Iterator[Any]:
+    """The events of the paths excluded by path_filter are ignored."""
+    state = sync_delta.events_state(source, filter_events(path_filter, source, events))
+    for name, status in state.items():
+        if status == 'deleted':
+            yield {'name': name, 'deleted': True}
+        elif status == 'modified':
+            yield from _file_frames(name, source / name, chunk_size)
+
+
+def sync_target(target_root: Path, changes: Iterable[Any], fsync: str = FSYNC_NONE,
+                journal: WriteJournal | None = None) -> None:
+    """The frames of a file are written to a temporary file, which replaces the target file after the last one
+    (see AtomicWriter); fsync is one of the policies of the atomic_write module, journal is as in sync_delta."""
+    file: BinaryIO | None = None
+    temp: Path | None = None
+    target: Path | None = None
+    with AtomicWriter(fsync, journal) as writer:
+
+        def close(commit: bool):
+            nonlocal file
+            file.close()
+            file = None
+            if commit:
+                writer.commit(temp, target)
+            else:
+                temp.unlink(missing_ok=True)
+
+        try:
+            for change in changes:
+                name = change['name']
+                if file is not None and (target != target_root / name or change.get('offset', 0) == 0):
+                    close(commit=True)
+                target = target_root / name
+                if change.get('deleted', False):
+                    writer.remove(target)
+                    continue
+                if file is None:
+                    writer.mkdir(target.parent)
+                    temp = writer.temporary(target)
+                    if change['offset'] != 0:  # the file continues from a previous batch
+                        shutil.copyfile(target, temp)
+                    file = temp.open('r+b' if change['offset'] != 0 else 'wb')
+                file.seek(change['offset'])
+                file.write(base64.b64decode(change['b64']))
+            if file is not None:
+                close(commit=True)
+        except BaseException:
+            if file is not None:
+                close(commit=False)
+            raise
+
+
+def sync_init(source: Path, chunk_size: int = CHUNK_SIZE, path_filter: PathFilter | None = None) -> Iterator[Any]:
+    """The paths excluded by path_filter are not visited."""
+    for name in walk(source, path_filter):
+        yield from _file_frames(name, source / name, chunk_size)
+
+
+def _file_frames(name: str, path: Path, chunk_size: int) -> Iterator[Any]:
+    if not path.is_file():
+        return
+    try:
+        reader = path.open('rb')
+    except OSError:
+        return
+    with reader:
+        offset = 0
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk and offset > 0:
+                return
+            yield {'name': name, 'offset': offset, 'b64': base64.b64encode(chunk).decode('utf-8')}
+            offset += len(chunk)
+            if len(chunk) < chunk_size:
+                return
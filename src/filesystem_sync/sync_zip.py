@@ -7,54 +7,158 @@ from io import BytesIO
 from pathlib import Path
 
 import shutil
-from pathlib import Path
-from typing import List, Any
+import tempfile
+import time
+from stat import S_IMODE, S_ISDIR
+from typing import List, Any, Set
 
 from watchdog.events import FileSystemEvent
 
+from filesystem_sync.atomic_write import FSYNC_NONE, fsync_tree, fsync_directory
+from filesystem_sync.compression import zip_compress_type, SAMPLE_SIZE
+from filesystem_sync.path_filter import PathFilter, filter_events
+from filesystem_sync.scan import Entry, scan
+from filesystem_sync.write_journal import WriteJournal
+
 
-def sync_source(source: Path, events: List[FileSystemEvent]) -> List[Any]:
-    if not events:
+def sync_source(source: Path, events: List[FileSystemEvent], path_filter: PathFilter | None = None) -> List[Any]:
+    """The whole tree is sent, unless all the events are of paths excluded by path_filter."""
+    if not filter_events(path_filter, source, events):
         return []
-    return sync_init(source)
+    return sync_init(source, path_filter)
 
 
-def sync_target(target_root: Path, changes: List[Any]) -> None:
+def sync_target(target_root: Path, changes: List[Any], fsync: str = FSYNC_NONE,
+                journal: WriteJournal | None = None) -> None:
+    """The archive is extracted into a staging directory next to target_root, then swapped in
+    one top-level entry at a time with os.replace; so the target is never empty nor half extracted.
+    fsync is one of the policies of the atomic_write module.
+    When the target is watched, the journal given to its AnyObserver drops the events caused by the swap."""
     if not changes:
         return
-    for e in target_root.iterdir():
-        if e.is_file():
-            e.unlink()
-        elif e.is_dir():
-            shutil.rmtree(e)
+    staging = Path(tempfile.mkdtemp(prefix=f'.{target_root.name}.', suffix='.staging', dir=target_root.parent))
+    try:
+        b = changes[0] if isinstance(changes[0], (bytes, memoryview)) else base64.b64decode(changes[0])
+        with BytesIO(b) as stream:
+            with zipfile.ZipFile(stream, "r") as zip_file:
+                extract(zip_file, staging)
+        if fsync != FSYNC_NONE:
+            fsync_tree(staging)
+        _swap(staging, target_root, journal)
+        if fsync != FSYNC_NONE:
+            fsync_directory(target_root)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
 
-    b = base64.b64decode(changes[0])
-    with BytesIO(b) as stream:
-        with zipfile.ZipFile(stream, "r") as zip_file:
-            zip_file.extractall(target_root)
+def _swap(staging: Path, target_root: Path, journal: WriteJournal | None = None):
+    """Move the entries of staging into target_root, replacing the existing ones and removing the others.
+    A directory that exists on both sides is renamed away first, so it is missing only between two renames."""
+    trash = staging / f'.{target_root.name}.trash'
+    trash.mkdir()
+    staged = set(e.name for e in staging.iterdir()) - {trash.name}
+    replaced = [e for e in target_root.iterdir()
+                if e.name not in staged or (e.is_dir() and not e.is_symlink()) or (staging / e.name).is_dir()]
+    if journal is not None:
+        _record(journal, staging, target_root, staged, replaced)
+    for e in replaced:
+        os.replace(e, trash / e.name)
+    for name in staged:
+        os.replace(staging / name, target_root / name)
 
 
-def sync_init(source: Path) -> List[Any]:
-    b = _zip_in_memory(source)
+def _record(journal: WriteJournal, staging: Path, target_root: Path, staged: Set[str], replaced: List[Path]):
+    """Record the swap in the journal; the entries moved in keep the stat they have in staging."""
+    journal.directory(str(target_root))
+    for e in replaced:
+        journal.deleted(str(e))
+    for dir_path, dir_names, file_names in os.walk(staging):
+        if dir_path == str(staging):
+            dir_names[:] = [name for name in dir_names if name in staged]  # not the trash
+        target_dir = os.path.normpath(os.path.join(target_root, os.path.relpath(dir_path, staging)))
+        for name in dir_names + file_names:
+            stat = os.lstat(os.path.join(dir_path, name))
+            if S_ISDIR(stat.st_mode):
+                journal.directory(os.path.join(target_dir, name))
+            else:
+                journal.written(os.path.join(target_dir, name), stat)
+
+
+def sync_init(source: Path, path_filter: PathFilter | None = None) -> List[Any]:
+    """The paths excluded by path_filter are not visited."""
+    b = _zip_in_memory(source, path_filter)
     s = base64.b64encode(b).decode('utf-8')
     return [s]
 
 
-def _zip_path(zip_file, path):
+def _zip_path(zip_file, path, path_filter: PathFilter | None = None):
     if os.path.isfile(path):
-        zip_file.write(path, os.path.basename(path))
+        zip_file.write(path, os.path.basename(path), zip_compress_type(Path(path)))
     elif os.path.isdir(path):
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, path)
-                zip_file.write(file_path, arcname)
+        root = Path(path)
+        inventory = scan(root, path_filter)
+        parents = {name.rsplit('/', 1)[0] for name in inventory if '/' in name}
+        for entry in inventory.entries():
+            if entry.is_dir():
+                if entry.name not in parents:
+                    zip_file.writestr(_zip_info(entry.name + '/', entry), b'')  # an empty directory
+                continue
+            entry = entry.followed(root)  # as zip_file.write, the content of the symlinked files
+            if entry is None or not entry.is_file():
+                continue
+            try:
+                _zip_file(zip_file, root / entry.name, entry)
+            except OSError:
+                pass  # removed after the scan
+
+
+def _zip_file(zip_file: zipfile.ZipFile, path: Path, entry: Entry) -> None:
+    """Like zip_file.write(path, entry.name), with the stat of the scan instead of another one;
+    the content is streamed, not read whole."""
+    info = _zip_info(entry.name, entry)
+    info.file_size = entry.st_size  # for open to write a zip64 header when needed
+    if hasattr(info, 'compress_level'):  # public since Python 3.13, before open compresses at the default level
+        info.compress_level = zip_file.compresslevel
+    with path.open('rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+        info.compress_type = zip_compress_type(path, sample=sample)
+        with zip_file.open(info, 'w') as dest:
+            dest.write(sample)
+            shutil.copyfileobj(f, dest, 1024 * 1024)
+
+
+def _zip_info(arcname: str, entry: Entry) -> zipfile.ZipInfo:
+    date_time = time.localtime(entry.st_mtime_ns // 1_000_000_000)[:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    info = zipfile.ZipInfo(arcname, date_time)
+    info.external_attr = (entry.st_mode & 0xFFFF) << 16
+    if entry.is_dir():
+        info.external_attr |= 0x10  # MS-DOS directory flag
+        info.file_size = info.compress_size = info.CRC = 0
+    return info
+
+
+def extract(zip_file: zipfile.ZipFile, root: Path):
+    """Like extractall, but the permissions (without setuid, setgid and sticky) and the modification times
+    (to the 2 seconds of zip) are restored. As extractall, the names escaping root are sanitized;
+    the metadata is applied to the path where the member was actually extracted."""
+    for info in zip_file.infolist():
+        path = zip_file.extract(info, root)
+        mode = S_IMODE(info.external_attr >> 16) & 0o777
+        if mode:
+            os.chmod(path, mode)
+        if not info.is_dir():
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(path, (mtime, mtime))
 
 
-def _zip_in_memory(path) -> bytes:
+def _zip_in_memory(path, path_filter: PathFilter | None = None) -> bytes:
     stream = BytesIO()
     with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
-        _zip_path(zip_file, path)
+        _zip_path(zip_file, path, path_filter)
 
     stream.seek(0)
     return stream.getbuffer().tobytes()
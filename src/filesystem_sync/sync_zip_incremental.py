@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import base64
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+from pathlib import Path
+from typing import List, Any, Dict, Iterable
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync import sync_delta, manifest, sync_zip
+from filesystem_sync.atomic_write import AtomicWriter, FSYNC_NONE
+from filesystem_sync.hash_cache import HashCache
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.scan import Inventory, Entry, scan
+from filesystem_sync.write_journal import WriteJournal
+from filesystem_sync.sync_zip import _zip_in_memory, _zip_file, extract
+
+
+def sync_source(source: Path, events: List[FileSystemEvent]) -> List[Any]:
+    state = sync_delta.events_state(source, events)
+    if not state:
+        return []
+    deleted = [name for name, status in state.items() if status == 'deleted']
+    modified = [name for name, status in state.items() if status == 'modified']
+    b = _zip_files_in_memory(source, modified)
+    return [{'zip': base64.b64encode(b).decode('utf-8'), 'deleted': deleted, 'reset': False}]
+
+
+def sync_target(target_root: Path, changes: List[Any], fsync: str = FSYNC_NONE,
+                journal: WriteJournal | None = None) -> None:
+    """A reset is applied as sync_zip does, swapping a staging directory in. Otherwise the archive is extracted
+    into a staging directory next to target_root, then every file replaces its target with os.replace
+    (see AtomicWriter); fsync is one of the policies of the atomic_write module, journal is as in sync_delta."""
+    for change in changes:
+        if change['reset']:
+            sync_zip.sync_target(target_root, [change['zip']], fsync, journal)
+            continue
+        with AtomicWriter(fsync, journal) as writer:
+            for name in change['deleted']:
+                writer.remove(target_root / name)
+            _extract_files(target_root, base64.b64decode(change['zip']), writer)
+
+
+def _extract_files(target_root: Path, b: bytes, writer: AtomicWriter):
+    staging = Path(tempfile.mkdtemp(prefix=f'.{target_root.name}.', suffix='.staging', dir=target_root.parent))
+    try:
+        with BytesIO(b) as stream:
+            with zipfile.ZipFile(stream, "r") as zip_file:
+                extract(zip_file, staging)
+        for dir_path, dir_names, file_names in os.walk(staging):
+            relative = Path(dir_path).relative_to(staging)
+            for dir_name in dir_names:
+                writer.mkdir(target_root / relative / dir_name)
+            for file_name in file_names:
+                writer.commit(Path(dir_path) / file_name, target_root / relative / file_name)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def sync_init(source: Path, target_manifest: Dict[str, str] | None = None,
+              cache: HashCache | None = None, path_filter: PathFilter | None = None) -> List[Any]:
+    """When the target_manifest is given (see the manifest module), only the differences with the target are sent.
+    The paths excluded by path_filter are not visited, and the tree is scanned once (see the scan module)."""
+    if target_manifest is None:
+        b = _zip_in_memory(source, path_filter)
+        return [{'zip': base64.b64encode(b).decode('utf-8'), 'deleted': [], 'reset': True}]
+    inventory = scan(source, path_filter)
+    to_send, to_delete = manifest.diff(manifest.manifest(source, cache, inventory=inventory), target_manifest)
+    b = _zip_files_in_memory(source, to_send, inventory)
+    return [{'zip': base64.b64encode(b).decode('utf-8'), 'deleted': to_delete, 'reset': False}]
+
+
+def _zip_files_in_memory(source: Path, names: Iterable[str], inventory: Inventory | None = None) -> bytes:
+    """The names are stat again, unless they are in inventory."""
+    stream = BytesIO()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
+        for name in names:
+            path = source / name
+            entry = inventory.get(name) if inventory is not None else None
+            try:
+                if entry is None:
+                    stat = path.stat()
+                    entry = Entry(name, stat.st_mode, stat.st_size, stat.st_mtime_ns)
+                else:
+                    entry = entry.followed(source)
+                if entry is not None and entry.is_file():
+                    _zip_file(zip_file, path, entry)
+            except OSError:
+                pass  # the file was removed after the event; its deletion will follow
+
+    return stream.getvalue()
@@ -0,0 +1,305 @@
+"""A socket transport for the changes: the Sender on the source machine, the Receiver on the target one.
+
+Both TCP (address is a (host, port) tuple) and Unix domain sockets (address is a path) are supported.
+The Sender keeps one connection open and pipelines the batches: it writes up to max_in_flight batches
+before waiting for their acknowledgements. The Receiver applies the batches in order with sync.sync_target
+and acknowledges each of them, or reports the error, so the source can resync.
+
+Every frame is a header (kind, sequence, payload size) followed by the payload;
+a batch payload is the changes encoded by `encode` (json by default, wire.encode for sync_delta).
+
+There is no authentication nor encryption: the address must be reachable only by trusted peers.
+The Receiver still confines the batches to target_root (see `confine`), so a peer cannot write outside of it.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import struct
+from pathlib import Path
+from threading import Thread, Condition, Lock
+from typing import Any, Callable, List, Tuple, Union, Dict, BinaryIO
+
+from filesystem_sync.sync import Sync
+
+Address = Union[Tuple[str, int], str, Path]
+
+BATCH = 0
+ACK = 1
+ERROR = 2
+
+_frame = struct.Struct('>BQQ')
+
+
+def json_encode(changes: List[Any]) -> bytes:
+    return json.dumps(changes).encode('utf-8')
+
+
+def json_decode(data: bytes) -> List[Any]:
+    return json.loads(data)
+
+
+class Sender:
+    """Sends the batches of changes over a persistent connection, without waiting for each acknowledgement.
+
+    When the receiver fails to apply a batch, or the connection is lost with batches not yet acknowledged,
+    the next call to send or flush raises (RuntimeError and ConnectionError respectively);
+    the target may then be out of sync and needs a sync_init. The connection is opened again on the next send."""
+
+    def __init__(self, address: Address, encode: Callable[[List[Any]], bytes] = json_encode,
+                 max_in_flight: int = 8, timeout: float | None = 30):
+        self.address = address
+        self._encode = encode
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._socket: socket.socket | None = None
+        self._reader: Thread | None = None
+        self._condition = Condition()
+        self._write_lock = Lock()
+        self._sequence = 0
+        self._in_flight: Dict[int, None] = {}
+        self._error: Exception | None = None
+
+    def __call__(self, changes: List[Any]) -> None:
+        self.send(changes)
+
+    def send(self, changes: List[Any]) -> int:
+        """Write the batch and return its sequence number, once there are less than max_in_flight batches
+        waiting to be acknowledged."""
+        payload = self._encode(changes)
+        with self._condition:
+            self._raise_error()
+            if not self._condition.wait_for(lambda: len(self._in_flight) < self.max_in_flight or self._error,
+                                            self.timeout):
+                raise TimeoutError(f'No acknowledgement from {self.address}')
+            self._raise_error()
+            if self._socket is None:
+                self._connect()
+            self._sequence += 1
+            sequence = self._sequence
+            self._in_flight[sequence] = None
+            sock = self._socket
+        with self._write_lock:
+            try:
+                sock.sendall(_frame.pack(BATCH, sequence, len(payload)))
+                sock.sendall(payload)
+            except OSError as e:
+                self._disconnected(sock, e)
+                raise
+        return sequence
+
+    def in_flight(self) -> int:
+        with self._condition:
+            return len(self._in_flight)
+
+    def flush(self) -> None:
+        """Wait for all the batches to be acknowledged."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: not self._in_flight or self._error, self.timeout):
+                raise TimeoutError(f'No acknowledgement from {self.address}')
+            self._raise_error()
+
+    def close(self) -> None:
+        """Close the connection; the batches not yet acknowledged are dropped, raising on the next send or flush."""
+        with self._condition:
+            sock, self._socket = self._socket, None
+            if self._in_flight:
+                self._error = ConnectionError(f'Connection to {self.address} closed with '
+                                              f'{len(self._in_flight)} batches not acknowledged')
+                self._in_flight.clear()
+            self._condition.notify_all()
+        if sock is not None:
+            _close(sock)
+        if self._reader is not None:
+            self._reader.join()
+            self._reader = None
+
+    def _connect(self):
+        sock = _socket(self.address)
+        sock.connect(_address(self.address))
+        if sock.family != _unix_family:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket = sock
+        self._reader = Thread(daemon=True, target=self._read_loop, args=(sock,), name='Sender-reader')
+        self._reader.start()
+
+    def _read_loop(self, sock: socket.socket):
+        stream = sock.makefile('rb')
+        try:
+            while True:
+                kind, sequence, payload = _read_frame(stream)
+                with self._condition:
+                    self._in_flight.pop(sequence, None)
+                    if kind == ERROR:
+                        self._error = RuntimeError(f'Batch {sequence} failed on the receiver: {payload.decode()}')
+                    self._condition.notify_all()
+        except (OSError, EOFError, ValueError) as e:
+            self._disconnected(sock, e)
+        finally:
+            stream.close()
+
+    def _disconnected(self, sock: socket.socket, cause: Exception):
+        with self._condition:
+            if self._socket is sock:
+                self._socket = None
+                if self._in_flight:
+                    self._error = ConnectionError(f'Connection to {self.address} lost with '
+                                                  f'{len(self._in_flight)} batches not acknowledged: {cause}')
+                    self._in_flight.clear()
+            self._condition.notify_all()
+        _close(sock)
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+
+class Receiver:
+    """Accepts the connections of the Senders and applies the received batches to target_root, in order."""
+
+    def __init__(self, target_root: Path, sync: Sync, address: Address = ('127.0.0.1', 0),
+                 decode: Callable[[bytes], List[Any]] = json_decode):
+        self.target_root = target_root
+        self.sync = sync
+        self._address = address
+        self._decode = decode
+        self._server: socket.socket | None = None
+        self._threads: List[Thread] = []
+        self._connections: List[socket.socket] = []
+        self._lock = Lock()
+
+    @property
+    def address(self) -> Address:
+        """The bound address, e.g., with the port chosen by the system when it was 0."""
+        if self._server is None or self._server.family == _unix_family:
+            return self._address
+        return self._server.getsockname()[:2]
+
+    def start(self):
+        if self._server is not None:
+            raise RuntimeError('Receiver already started')
+        server = _socket(self._address)
+        if server.family == _unix_family:
+            Path(self._address).unlink(missing_ok=True)
+        else:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(_address(self._address))
+        server.listen()
+        self._server = server
+        self._start_thread(self._accept_loop, server, name='Receiver-accept')
+
+    def stop(self):
+        server, self._server = self._server, None
+        if server is not None:
+            _close(server)
+            if server.family == _unix_family:
+                Path(self._address).unlink(missing_ok=True)
+        with self._lock:
+            for connection in self._connections:
+                _close(connection)
+
+    def join(self):
+        for t in list(self._threads):
+            t.join()
+        self._threads = []
+
+    def _start_thread(self, target, *args, name: str):
+        t = Thread(daemon=True, target=target, args=args, name=name)
+        with self._lock:
+            self._threads.append(t)
+        t.start()
+
+    def _accept_loop(self, server: socket.socket):
+        while True:
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return  # stopped
+            with self._lock:
+                self._connections.append(connection)
+            self._start_thread(self._connection_loop, connection, name='Receiver-connection')
+
+    def _connection_loop(self, connection: socket.socket):
+        stream = connection.makefile('rb')
+        try:
+            while True:
+                kind, sequence, payload = _read_frame(stream)
+                if kind != BATCH:
+                    raise ValueError(f'Unexpected frame kind {kind}')
+                try:
+                    self.sync.sync_target(self.target_root, confine(self.target_root, self._decode(payload)))
+                    reply, message = ACK, b''
+                except Exception as e:
+                    reply, message = ERROR, f'{type(e).__name__}: {e}'.encode('utf-8')
+                connection.sendall(_frame.pack(reply, sequence, len(message)) + message)
+        except (OSError, EOFError, ValueError):
+            pass  # the sender closed the connection, or the receiver was stopped
+        finally:
+            stream.close()
+            _close(connection)
+            with self._lock:
+                self._connections.remove(connection)
+
+
+def confine(target_root: Path, changes: List[Any]) -> List[Any]:
+    """Check that the names of the changes (name, moved_from, deleted and the symlink targets) stay below
+    target_root, and mask the modes to the permission bits; raise ValueError for the batches that do not."""
+    root = os.path.realpath(target_root)
+    for change in changes:
+        if not isinstance(change, dict):
+            continue  # e.g., a zip of sync_zip, whose extraction sanitizes the names
+        names = [change[key] for key in ('name', 'moved_from') if key in change]
+        names.extend(change.get('deleted', None) if isinstance(change.get('deleted', None), list) else ())
+        for name in names:
+            _inside(root, name)
+        if 'symlink' in change:
+            _inside(root, os.path.join(os.path.dirname(change['name']), change['symlink']), 'Symlink target')
+        if 'mode' in change:
+            change['mode'] &= 0o777
+    return changes
+
+
+def _inside(root: str, name: str, what: str = 'Name'):
+    if not isinstance(name, str) or os.path.isabs(name) or os.path.splitdrive(name)[0]:
+        raise ValueError(f'{what} {name!r} is not relative to the target root')
+    parent, base = os.path.split(os.path.normpath(name))
+    # the parent is resolved, not the name itself: a symlink there is replaced, not followed
+    path = os.path.normpath(os.path.join(os.path.realpath(os.path.join(root, parent)), base))
+    if os.path.commonpath([root, path]) != root or path == root and what == 'Name':
+        raise ValueError(f'{what} {name!r} is outside of the target root')
+
+
+_unix_family = getattr(socket, 'AF_UNIX', None)
+
+
+def _socket(address: Address) -> socket.socket:
+    if isinstance(address, tuple):
+        return socket.socket(socket.AF_INET6 if ':' in address[0] else socket.AF_INET, socket.SOCK_STREAM)
+    if _unix_family is None:
+        raise ValueError('Unix domain sockets are not supported on this platform')
+    return socket.socket(_unix_family, socket.SOCK_STREAM)
+
+
+def _address(address: Address):
+    return address if isinstance(address, tuple) else os.fspath(address)
+
+
+def _read_frame(stream: BinaryIO) -> Tuple[int, int, bytes]:
+    header = stream.read(_frame.size)
+    if len(header) < _frame.size:
+        raise EOFError('Connection closed')
+    kind, sequence, size = _frame.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise EOFError('Connection closed in the middle of a frame')
+    return kind, sequence, payload
+
+
+def _close(sock: socket.socket):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # not connected
+    sock.close()
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import tempfile
 import threading
 from datetime import timedelta
@@ -9,21 +11,29 @@ from watchdog.events import FileSystemEvent
 
 from filesystem_sync import new_tmp_path
 from filesystem_sync.any_observer import AnyObserver
+from filesystem_sync.coalescing_buffer import CoalescingBuffer
 from filesystem_sync.debouncer import Debouncer
 from filesystem_sync.debouncer_thread import DebouncerThread
+from filesystem_sync.emit_pipeline import BLOCK
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.write_journal import WriteJournal
 
 
 class WatchdogDebouncer(DebouncerThread):
 
-    def __init__(self, path: Path, window: timedelta, callback: Callable[[List[FileSystemEvent]], None]):
-        self._debouncer = Debouncer(window)
-        super().__init__(self._debouncer, callback)
+    def __init__(self, path: Path, window: timedelta, callback: Callable[[List[FileSystemEvent]], None],
+                 max_wait: timedelta | None = None, leading: bool = False, coalesce: bool = False,
+                 max_pending: int = 0, backpressure: str = BLOCK, resync: Callable[[], None] | None = None,
+                 path_filter: PathFilter | None = None, journal: WriteJournal | None = None):
+        events_buffer = CoalescingBuffer() if coalesce else None
+        self._debouncer = Debouncer(window, max_wait=max_wait, leading=leading, events_buffer=events_buffer)
+        super().__init__(self._debouncer, callback, max_pending, backpressure, resync)
 
         def skip_open(event: FileSystemEvent):
             if event.event_type != 'opened':
                 self._debouncer.add_event(event)
 
-        self._any_observer = AnyObserver(path, skip_open)
+        self._any_observer = AnyObserver(path, skip_open, path_filter=path_filter, journal=journal)
 
     def start(self):
         self._any_observer.watch_directory()
@@ -0,0 +1,162 @@
+"""Length-prefixed binary framing of the changes produced by sync_delta and sync_zip.
+
+A message is the magic followed by records; every record is a fixed header
+(op, flags, name length, mode, mtime_ns, payload size) followed by the utf-8 name and the raw payload;
+the flags tell whether mode and mtime_ns are present.
+The changes of the other engines (e.g., the deltas of SyncRsync, the recipes of SyncDedup) are not supported.
+Compared to json this avoids the base64 inflation of binary content and the escaping of text.
+"""
+from __future__ import annotations
+
+import base64
+import struct
+from typing import List, Any, Union, Tuple
+
+MAGIC = b'FSW2'
+
+OP_DELETE = 0
+OP_TEXT = 1
+OP_BYTES = 2
+OP_ARCHIVE = 3
+OP_MOVE = 4
+OP_COMPRESSED = 5
+OP_CHUNK = 6
+OP_METADATA = 7
+OP_SYMLINK = 8
+OP_DIRECTORY = 9
+
+_HAS_MODE = 1
+_HAS_MTIME = 2
+
+_KEYS = {'name', 'mode', 'mtime_ns', 'content', 'content_b64', 'codec', 'dictionary', 'compressed', 'compressed_b64',
+         'offset', 'size', 'digest', 'chunk_digest', 'chunk', 'chunk_b64', 'moved_from', 'symlink', 'directory'}
+"""The keys of the sync_delta changes"""
+
+_header = struct.Struct('>BBHIqQ')
+_short = struct.Struct('>B')
+_chunk = struct.Struct('>QQ')
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def encode(changes: List[Any]) -> bytes:
+    """Encode sync_delta changes (dicts) and sync_zip changes (base64 archives, str or bytes);
+    raise ValueError for the changes of the other engines."""
+    result = bytearray(MAGIC)
+    for change in changes:
+        flags = 0
+        if isinstance(change, dict):
+            unsupported = change.keys() - _KEYS
+            if unsupported:
+                raise ValueError(f'Unsupported keys {sorted(unsupported)} for `{change.get("name", None)}`')
+            op, payload = _file_payload(change)
+            name = change['name'].encode('utf-8')
+            flags = (_HAS_MODE if 'mode' in change else 0) | (_HAS_MTIME if 'mtime_ns' in change else 0)
+            mode = change.get('mode', 0)
+            mtime_ns = change.get('mtime_ns', 0)
+        else:
+            op, name, mode, mtime_ns = OP_ARCHIVE, b'', 0, 0
+            payload = base64.b64decode(change) if isinstance(change, str) else change
+        result += _header.pack(op, flags, len(name), mode, mtime_ns, len(payload))
+        result += name
+        result += payload
+    return bytes(result)
+
+
+def decode(data: Buffer) -> List[Any]:
+    """Decode a message produced by encode.
+    Binary payloads are memoryview slices of `data`, so no content is copied."""
+    view = memoryview(data)
+    if view[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a filesystem-sync wire message')
+    changes = []
+    offset = len(MAGIC)
+    while offset < len(view):
+        op, flags, name_size, mode, mtime_ns, size = _header.unpack_from(view, offset)
+        offset += _header.size
+        name = str(view[offset:offset + name_size], 'utf-8')
+        offset += name_size
+        payload = view[offset:offset + size]
+        if len(payload) != size:
+            raise ValueError(f'Truncated payload for `{name}`')
+        offset += size
+        if op == OP_ARCHIVE:
+            changes.append(payload)
+            continue
+        change = {'name': name}
+        if op == OP_DELETE:
+            change['content'] = None
+        elif op == OP_TEXT:
+            change['content'] = str(payload, 'utf-8')
+        elif op == OP_BYTES:
+            change['content'] = payload
+        elif op == OP_MOVE:
+            change['moved_from'] = str(payload, 'utf-8')
+        elif op == OP_COMPRESSED:
+            (codec, dictionary), payload = _split_fields(payload, 2)
+            change['codec'] = codec
+            if dictionary:
+                change['dictionary'] = dictionary
+            change['compressed'] = payload
+        elif op == OP_SYMLINK:
+            change['symlink'] = str(payload, 'utf-8')
+        elif op == OP_DIRECTORY:
+            change['directory'] = True
+        elif op == OP_CHUNK:
+            change['offset'], change['size'] = _chunk.unpack_from(payload)
+            (change['digest'], change['chunk_digest']), change['chunk'] = _split_fields(payload[_chunk.size:], 2)
+        elif op != OP_METADATA:
+            raise ValueError(f'Unknown op {op} for `{name}`')
+        if flags & _HAS_MODE:
+            change['mode'] = mode
+        if flags & _HAS_MTIME:
+            change['mtime_ns'] = mtime_ns
+        changes.append(change)
+    return changes
+
+
+def _file_payload(change: dict) -> Tuple[int, Buffer]:
+    if 'codec' in change:
+        data = change['compressed'] if 'compressed' in change else base64.b64decode(change['compressed_b64'])
+        return OP_COMPRESSED, _fields(change['codec'], change.get('dictionary', '')) + data
+    if 'chunk_digest' in change:
+        data = change['chunk'] if 'chunk' in change else base64.b64decode(change['chunk_b64'])
+        header = _chunk.pack(change['offset'], change['size']) + _fields(change['digest'], change['chunk_digest'])
+        return OP_CHUNK, header + data
+    if 'moved_from' in change:
+        return OP_MOVE, change['moved_from'].encode('utf-8')
+    if 'symlink' in change:
+        return OP_SYMLINK, change['symlink'].encode('utf-8')
+    if change.get('directory', False):
+        return OP_DIRECTORY, b''
+    if not any(key in change for key in ('content', 'content_b64')):
+        return OP_METADATA, b''
+    content = change.get('content', None)
+    if content is None and 'content_b64' in change:
+        return OP_BYTES, base64.b64decode(change['content_b64'])
+    if content is None:
+        return OP_DELETE, b''
+    if isinstance(content, str):
+        return OP_TEXT, content.encode('utf-8')
+    return OP_BYTES, content
+
+
+def _fields(*fields: str) -> bytes:
+    """Short strings, each prefixed by its length, in front of a payload"""
+    result = b''
+    for field in fields:
+        b = field.encode('utf-8')
+        result += _short.pack(len(b)) + b
+    return result
+
+
+def _split_fields(payload: memoryview, count: int) -> Tuple[List[str], memoryview]:
+    """The count fields written by _fields and the rest of the payload"""
+    offset = 0
+    fields = []
+    for _ in range(count):
+        size, = _short.unpack_from(payload, offset)
+        offset += _short.size
+        fields.append(str(payload[offset:offset + size], 'utf-8'))
+        offset += size
+    return fields, payload[offset:]
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+from typing import Callable, Tuple
+
+from watchdog.events import FileSystemEvent
+
+from filesystem_sync.debouncer import monotonic
+
+_WRITTEN = 'written'
+_DELETED = 'deleted'
+_TEMPORARY = 'temporary'
+_DIRECTORY = 'directory'
+
+
+class WriteJournal:
+    """Remembers the writes made by sync_target (see AtomicWriter), so that the events they cause on a watched
+    target are recognized as echoes and dropped by AnyObserver, instead of feeding another sync round.
+
+    A write is an echo only while the file is still as it was written (same inode, size and mtime_ns):
+    a later change made by someone else is not dropped. The entries are forgotten after ttl.
+    The writes are recorded before they are made, so the events cannot arrive before their entry.
+    The sync_target of every engine takes a journal."""
+
+    def __init__(self, ttl: timedelta = timedelta(seconds=5), time_func: Callable[[], timedelta] = monotonic):
+        self.ttl = ttl
+        self._time_func = time_func
+        self._entries: OrderedDict[str, Tuple[str, tuple, timedelta]] = OrderedDict()  # oldest first
+        self._lock = Lock()
+
+    def written(self, path: str, stat: os.stat_result, mtime_ns: int | None = None) -> None:
+        """path will have the content that has now the stat (e.g., of the temporary file that replaces it);
+        mtime_ns, when given, is the one it will have instead (e.g., set in place by a utime)."""
+        mtime_ns = stat.st_mtime_ns if mtime_ns is None else mtime_ns
+        self._record(path, _WRITTEN, (stat.st_ino, stat.st_size, mtime_ns))
+
+    def deleted(self, path: str) -> None:
+        """path, and everything below it, will be removed."""
+        self._record(path, _DELETED, ())
+
+    def temporary(self, path: str) -> None:
+        """All the events of path are echoes, e.g., of a temporary file."""
+        self._record(path, _TEMPORARY, ())
+
+    def directory(self, path: str) -> None:
+        """The directory path will be created or will have its entries changed."""
+        self._record(path, _DIRECTORY, ())
+
+    def is_echo(self, event: FileSystemEvent) -> bool:
+        with self._lock:
+            self._purge()
+            if event.event_type == 'moved':
+                if self._kind(event.src_path) == _TEMPORARY:
+                    return True  # the temporary names are unique, only the writer uses them
+                return self._is_gone(event.src_path) and self._is_written(event.dest_path, moved=True)
+            if event.event_type == 'deleted':
+                return self._is_gone(event.src_path) or self._is_replaced(event.src_path)
+            kind = self._kind(event.src_path)
+            if kind == _TEMPORARY:
+                return True
+            if event.is_directory:
+                return kind == _DIRECTORY and event.event_type in ('created', 'modified')
+            return self._is_written(event.src_path, moved=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge()
+            return len(self._entries)
+
+    def _record(self, path: str, kind: str, expected: tuple):
+        path = os.path.abspath(path)
+        with self._lock:
+            self._purge()
+            self._entries.pop(path, None)
+            self._entries[path] = (kind, expected, self._time_func() + self.ttl)
+
+    def _purge(self):
+        now = self._time_func()
+        while self._entries:
+            path, (_, _, deadline) = next(iter(self._entries.items()))
+            if deadline > now:
+                break
+            del self._entries[path]
+
+    def _kind(self, path: str) -> str | None:
+        entry = self._entries.get(os.path.abspath(path), None)
+        return entry[0] if entry is not None else None
+
+    def _is_written(self, path: str, moved: bool) -> bool:
+        """path is as written, or was removed by a later recorded write"""
+        entry = self._entries.get(os.path.abspath(path), None)
+        if entry is not None and entry[0] == _DELETED:
+            return not os.path.lexists(path)
+        if entry is None or entry[0] != _WRITTEN:
+            return False
+        try:
+            stat = os.lstat(path)
+        except OSError:
+            return False
+        if moved:  # a renamed directory keeps its inode, its mtime changes with the entries written inside
+            return stat.st_ino == entry[1][0]
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns) == entry[1]
+
+    def _is_replaced(self, path: str) -> bool:
+        """path was moved away and replaced by a recorded write, e.g., by the swap of sync_zip"""
+        kind = self._kind(path)
+        if kind == _DIRECTORY:
+            return os.path.isdir(path)
+        return kind == _WRITTEN and self._is_written(path, moved=False)
+
+    def _is_gone(self, path: str) -> bool:
+        """path was deleted or moved away by a recorded write, or is a temporary file"""
+        if os.path.lexists(path):
+            return False
+        path = os.path.abspath(path)
+        while True:
+            kind = self._kind(path)
+            if kind in (_DELETED, _TEMPORARY):
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from datetime import timedelta
+
+from watchdog.observers import Observer
+
+from filesystem_sync import sync_delta
+from filesystem_sync.async_debouncer import AsyncDebouncer, AsyncWatchdogDebouncer
+from filesystem_sync.async_sync import AsyncSync
+
+
+def test_batches_from_another_thread():
+    async def main():
+        debouncer = AsyncDebouncer(timedelta(milliseconds=50))
+
+        def produce():
+            for i in range(5):
+                debouncer.add_event(f'e{i}')
+
+        threading.Thread(target=produce).start()
+        return await asyncio.wait_for(debouncer.__anext__(), 5)
+
+    assert asyncio.run(main()) == [f'e{i}' for i in range(5)]
+
+
+def test_stop__should_end_the_iteration():
+    async def main():
+        debouncer = AsyncDebouncer(timedelta(milliseconds=50))
+        asyncio.get_running_loop().call_later(0.1, debouncer.stop)
+        return [events async for events in debouncer]
+
+    assert asyncio.run(main()) == []
+
+
+def test_watch_and_sync(tmp_path):
+    source = tmp_path / 'source'
+    target = tmp_path / 'target'
+    source.mkdir()
+    target.mkdir()
+
+    async def main():
+        watcher = AsyncWatchdogDebouncer(source, timedelta(milliseconds=50), coalesce=True)
+        sync = AsyncSync(sync_delta)
+        watcher.start()
+        try:
+            (source / 'foo.txt').write_text('foo')
+            events = await asyncio.wait_for(watcher.__anext__(), 5)
+            await sync.sync_target(target, await sync.sync_source(source, events))
+        finally:
+            watcher.stop()
+            await watcher.join()
+
+    asyncio.run(main())
+    assert (target / 'foo.txt').read_text() == 'foo'
+
+
+def test_idle__should_not_wake_up_every_window():
+    async def main():
+        debouncer = AsyncDebouncer(timedelta(milliseconds=10))
+        wakeups = 0
+        debouncer_events = debouncer._debouncer.events
+
+        def counted():
+            nonlocal wakeups
+            wakeups += 1
+            return debouncer_events()
+        debouncer._debouncer.events = counted
+        asyncio.get_running_loop().call_later(0.2, debouncer.stop)
+        batches = [events async for events in debouncer]
+        return batches, wakeups
+
+    assert asyncio.run(main()) == ([], 1)  # the stop
+
+
+def test_shared_observer(tmp_path):
+    roots = [tmp_path / 'a', tmp_path / 'b']
+    for root in roots:
+        root.mkdir()
+
+    async def main():
+        observer = Observer()
+        watchers = [AsyncWatchdogDebouncer(root, timedelta(milliseconds=50), observer=observer) for root in roots]
+        for watcher in watchers:
+            watcher.start()
+        try:
+            watchers[0].stop()
+            (roots[1] / 'foo.txt').write_text('foo')
+            events = await asyncio.wait_for(watchers[1].__anext__(), 5)
+            return observer.is_alive(), {e.src_path for e in events}
+        finally:
+            watchers[1].stop()
+            observer.stop()
+            observer.join()
+
+    alive, paths = asyncio.run(main())
+    assert alive
+    assert str(roots[1] / 'foo.txt') in paths
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from filesystem_sync import sync_delta, sync_zip, atomic_write
+from filesystem_sync.atomic_write import AtomicWriter, FSYNC_NONE, FSYNC_BATCH, FSYNC_FILE
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    fsync = os.fsync
+
+    def record(fd):
+        calls.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(atomic_write.os, 'fsync', record)
+    return calls
+
+
+def test_write__should_replace_and_leave_no_temporary_file(tmp_path):
+    target = tmp_path / 'sub/a.txt'
+    target.parent.mkdir()
+    target.write_text('old')
+    inode = target.stat().st_ino
+
+    with AtomicWriter() as writer:
+        writer.write(target, 'new')
+
+    assert target.read_text() == 'new'
+    assert target.stat().st_ino != inode
+    assert os.listdir(target.parent) == ['a.txt']
+
+
+def test_write__should_create_the_file_with_the_umask_mode(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        AtomicWriter().write(tmp_path / 'a.txt', 'a')
+    finally:
+        os.umask(umask)
+
+    assert (tmp_path / 'a.txt').stat().st_mode & 0o777 == 0o644
+
+
+def test_write__should_replace_a_directory(tmp_path):
+    (tmp_path / 'a/b').mkdir(parents=True)
+
+    AtomicWriter().write(tmp_path / 'a', b'content')
+
+    assert (tmp_path / 'a').read_bytes() == b'content'
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        AtomicWriter('always')
+
+
+@pytest.mark.parametrize('fsync, expected', [(FSYNC_NONE, 0), (FSYNC_BATCH, 3 + 1), (FSYNC_FILE, 3 + 3)])
+def test_fsync_policies(tmp_path, fsyncs, fsync, expected):
+    with AtomicWriter(fsync) as writer:
+        for name in ['a', 'b', 'c']:
+            writer.write(tmp_path / name, name)
+
+    assert len(fsyncs) == expected
+
+
+def test_sync_delta(tmp_path, fsyncs):
+    changes = [{'name': 'a/b.txt', 'content': 'b'}, {'name': 'a/c.txt', 'content': 'c'},
+               {'name': 'd.txt', 'moved_from': 'a/c.txt'}]
+
+    sync_delta.sync_target(tmp_path, changes, fsync=FSYNC_BATCH)
+
+    assert (tmp_path / 'a/b.txt').read_text() == 'b'
+    assert (tmp_path / 'd.txt').read_text() == 'c'
+    assert len(fsyncs) == 2 + 2  # the files, then the directories a and tmp_path once
+
+
+def test_sync_zip__should_swap_the_staged_entries(tmp_path):
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    (source / 'dir').mkdir(parents=True)
+    (source / 'dir/a.txt').write_text('a')
+    (source / 'file_then_dir').mkdir()
+    (source / 'file_then_dir/c.txt').write_text('c')
+    (source / 'b.txt').write_text('b')
+    (target / 'dir').mkdir(parents=True)
+    (target / 'dir/old.txt').write_text('old')
+    (target / 'file_then_dir').write_text('file')
+    (target / 'removed.txt').write_text('removed')
+    inode = target.stat().st_ino
+
+    sync_zip.sync_target(target, sync_zip.sync_init(source), fsync=FSYNC_FILE)
+
+    names = sorted(str(p.relative_to(target)) for p in target.rglob('*'))
+    assert names == ['b.txt', 'dir', 'dir/a.txt', 'file_then_dir', 'file_then_dir/c.txt']
+    assert target.stat().st_ino == inode
+    assert sorted(os.listdir(tmp_path)) == ['source', 'target']  # the staging directory was removed
@@ -0,0 +1,150 @@
+from pathlib import Path
+from time import sleep
+
+import pytest
+from watchdog.events import FileModifiedEvent, FileDeletedEvent, FileMovedEvent, FileCreatedEvent
+
+from filesystem_sync.bidirectional import BidirectionalSync, Conflict
+from filesystem_sync.hash_cache import content_hash
+
+
+class Fixture:
+    def __init__(self, tmp_path: Path):
+        self.left = tmp_path / 'left'
+        self.right = tmp_path / 'right'
+        self.left.mkdir()
+        self.right.mkdir()
+        self.sync = BidirectionalSync(self.left, self.right)
+
+    def write(self, root: Path, name: str, content: str):
+        path = root / name
+        existed = path.exists()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        event = FileModifiedEvent if existed else FileCreatedEvent
+        self.sync.apply_events(root, [event(str(path))])
+
+
+@pytest.fixture
+def target(tmp_path):
+    return Fixture(tmp_path)
+
+
+def test_reconcile(target):
+    (target.left / 'only_left.txt').write_text('l')
+    (target.right / 'only_right.txt').write_text('r')
+    (target.left / 'same.txt').write_text('s')
+    (target.right / 'same.txt').write_text('s')
+    (target.left / 'different.txt').write_text('l')
+    (target.right / 'different.txt').write_text('r')
+
+    target.sync.reconcile()
+
+    assert (target.right / 'only_left.txt').read_text() == 'l'
+    assert (target.left / 'only_right.txt').read_text() == 'r'
+    assert target.sync.conflicts == [Conflict('different.txt', content_hash(b'l'), content_hash(b'r'))]
+    assert (target.left / 'different.txt').read_text() == 'l'
+    assert (target.right / 'different.txt').read_text() == 'r'
+
+
+def test_both_directions(target):
+    target.write(target.left, 'a.txt', 'from left')
+    target.write(target.right, 'b.txt', 'from right')
+
+    assert (target.right / 'a.txt').read_text() == 'from left'
+    assert (target.left / 'b.txt').read_text() == 'from right'
+
+
+def test_echo__should_not_be_transferred_back(target):
+    target.write(target.left, 'a.txt', 'v1')
+    (target.left / 'a.txt').write_text('v2')  # meanwhile the left changes again
+
+    target.sync.apply_events(target.right, [FileCreatedEvent(str(target.right / 'a.txt'))])  # echo of the write
+
+    assert (target.left / 'a.txt').read_text() == 'v2'
+    assert target.sync.conflicts == []
+
+
+def test_concurrent_modifications__should_be_a_conflict(target):
+    target.write(target.left, 'a.txt', 'base')
+    (target.right / 'a.txt').write_text('right')
+
+    target.write(target.left, 'a.txt', 'left')
+
+    assert (target.right / 'a.txt').read_text() == 'right'
+    assert target.sync.conflicts == [Conflict('a.txt', content_hash(b'left'), content_hash(b'right'))]
+
+
+def test_conflict__should_be_reported_once_until_resolved(target):
+    target.write(target.left, 'a.txt', 'a')
+    (target.right / 'a.txt').write_text('right')
+    target.write(target.left, 'a.txt', 'left')
+    target.write(target.left, 'a.txt', 'left again')
+    target.write(target.right, 'a.txt', 'right again')
+    assert [c.name for c in target.sync.conflicts] == ['a.txt']
+
+    target.write(target.right, 'a.txt', 'left again')  # resolved by the user
+    (target.right / 'a.txt').write_text('right once more')
+    target.write(target.left, 'a.txt', 'left once more')
+
+    assert target.sync.conflicts[1:] == [Conflict('a.txt', content_hash(b'left once more'),
+                                                  content_hash(b'right once more'))]
+
+
+def test_same_modification__should_not_be_a_conflict(target):
+    target.write(target.left, 'a.txt', 'base')
+    (target.right / 'a.txt').write_text('same')
+
+    target.write(target.left, 'a.txt', 'same')
+
+    assert target.sync.conflicts == []
+
+
+def test_delete(target):
+    target.write(target.left, 'sub/a.txt', 'a')
+    (target.left / 'sub/a.txt').unlink()
+
+    target.sync.apply_events(target.left, [FileDeletedEvent(str(target.left / 'sub/a.txt'))])
+
+    assert not (target.right / 'sub/a.txt').exists()
+
+
+def test_delete_of_a_modified_file__should_be_a_conflict(target):
+    target.write(target.left, 'a.txt', 'a')
+    (target.right / 'a.txt').write_text('modified on the right')
+    (target.left / 'a.txt').unlink()
+
+    target.sync.apply_events(target.left, [FileDeletedEvent(str(target.left / 'a.txt'))])
+
+    assert (target.right / 'a.txt').exists()
+    assert target.sync.conflicts == [Conflict('a.txt', None, content_hash(b'modified on the right'))]
+
+
+def test_move__should_not_transfer_the_content(target, monkeypatch):
+    target.write(target.left, 'a.txt', 'a')
+    (target.left / 'a.txt').rename(target.left / 'b.txt')
+    monkeypatch.setattr(BidirectionalSync, '_copy', None)  # any transfer would fail
+
+    target.sync.apply_events(target.left, [FileMovedEvent(str(target.left / 'a.txt'), str(target.left / 'b.txt'))])
+
+    assert (target.right / 'b.txt').read_text() == 'a'
+    assert not (target.right / 'a.txt').exists()
+
+
+def test_watchers(target):
+    target.sync.start()
+    try:
+        (target.left / 'a.txt').write_text('from left')
+        (target.right / 'b.txt').write_text('from right')
+        for _ in range(100):
+            if (target.right / 'a.txt').exists() and (target.left / 'b.txt').exists():
+                break
+            sleep(0.05)
+        sleep(0.3)  # the echoes
+
+        assert (target.right / 'a.txt').read_text() == 'from left'
+        assert (target.left / 'b.txt').read_text() == 'from right'
+        assert target.sync.conflicts == []
+    finally:
+        target.sync.stop()
+        target.sync.join()
@@ -0,0 +1,151 @@
+import os
+
+import pytest
+from watchdog.events import FileModifiedEvent
+
+from filesystem_sync import sync_delta, chunking, wire, manifest
+from filesystem_sync.hash_cache import HashCache
+
+chunk_size = 1000
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / 'source'
+    (source / 'sub').mkdir(parents=True)
+    (source / 'sub/big.bin').write_bytes(os.urandom(chunk_size * 3 + 10))
+    (source / 'small.txt').write_text('small')
+    return source
+
+
+@pytest.fixture
+def target(tmp_path):
+    target = tmp_path / 'target'
+    target.mkdir()
+    return target
+
+
+def test_large_file__should_be_sent_in_chunks(source, target):
+    changes = sync_delta.sync_init(source, chunk_size=chunk_size)
+
+    assert [c['offset'] for c in changes if c['name'] == 'sub/big.bin'] == [0, 1000, 2000, 3000]
+    assert [c for c in changes if c['name'] == 'small.txt'] == [{'name': 'small.txt', 'content': 'small'}]
+    sync_delta.sync_target(target, wire.decode(wire.encode(changes)))
+
+    assert (target / 'sub/big.bin').read_bytes() == (source / 'sub/big.bin').read_bytes()
+    assert sorted(os.listdir(target / 'sub')) == ['big.bin']
+
+
+def test_iter_init__should_read_the_chunks_as_they_are_consumed(source):
+    large_chunk = 64 * 1024  # larger than the read buffer
+    (source / 'sub/big.bin').write_bytes(os.urandom(large_chunk * 3))
+    changes = sync_delta.iter_init(source, chunk_size=large_chunk)
+    first = next(c for c in changes if 'chunk_digest' in c)
+    with (source / 'sub/big.bin').open('r+b') as f:
+        f.truncate(large_chunk * 2)  # the chunks not consumed yet are read from the truncated file
+
+    assert first['offset'] == 0
+    assert [c['offset'] for c in changes if 'chunk_digest' in c] == [large_chunk]
+
+
+def _until_first_chunk(changes):
+    consumed = []
+    for change in changes:
+        consumed.append(change)
+        if 'chunk_digest' in change:
+            return consumed
+
+
+def test_appended_after_the_hash__should_send_the_hashed_content(source, target):
+    large_chunk = 64 * 1024  # larger than the read buffer
+    (source / 'sub/big.bin').write_bytes(os.urandom(large_chunk * 3))
+    content = (source / 'sub/big.bin').read_bytes()
+    changes = sync_delta.iter_init(source, chunk_size=large_chunk)
+    consumed = _until_first_chunk(changes)
+    with (source / 'sub/big.bin').open('ab') as f:
+        f.write(b'appended')  # e.g., a log; its modification event follows
+
+    sync_delta.sync_target(target, consumed + list(changes))
+
+    assert (target / 'sub/big.bin').read_bytes() == content
+    assert (target / 'small.txt').read_text() == 'small'
+
+
+def test_changed_after_the_hash__should_skip_the_file_only(source, target):
+    large_chunk = 64 * 1024
+    (source / 'sub/big.bin').write_bytes(os.urandom(large_chunk * 3))
+    (source / 'sub/other.txt').write_text('other')
+    changes = sync_delta.iter_init(source, chunk_size=large_chunk)
+    consumed = _until_first_chunk(changes)
+    with (source / 'sub/big.bin').open('r+b') as f:
+        f.seek(large_chunk * 2)
+        f.write(os.urandom(large_chunk))
+
+    sync_delta.sync_target(target, consumed + list(changes))
+
+    assert sorted(os.listdir(target / 'sub')) == ['other.txt']
+    assert (target / 'small.txt').read_text() == 'small'
+
+
+def test_resume__should_send_the_missing_chunks_only(source, target):
+    changes = sync_delta.sync_init(source, chunk_size=chunk_size)
+    chunks = [c for c in changes if 'chunk_digest' in c]
+    sync_delta.sync_target(target, chunks[:2])  # interrupted
+    resume = chunking.partials(target)
+
+    assert resume == {'sub/big.bin': (chunks[0]['digest'], 2000)}
+    assert manifest.manifest(target) == {}  # the partial file is not part of the target content
+
+    changes = sync_delta.sync_init(source, chunk_size=chunk_size, resume=resume)
+    sync_delta.sync_target(target, changes)
+
+    assert [c['offset'] for c in changes if 'chunk_digest' in c] == [2000, 3000]
+    assert (target / 'sub/big.bin').read_bytes() == (source / 'sub/big.bin').read_bytes()
+    assert chunking.partials(target) == {}
+
+
+def test_resume__of_a_different_version_should_restart(source, target):
+    changes = sync_delta.sync_init(source, chunk_size=chunk_size)
+    sync_delta.sync_target(target, changes[:2])
+    (source / 'sub/big.bin').write_bytes(os.urandom(chunk_size * 2))
+
+    changes = sync_delta.sync_init(source, chunk_size=chunk_size, resume=chunking.partials(target))
+    sync_delta.sync_target(target, changes)
+
+    assert [c['offset'] for c in changes if 'chunk_digest' in c] == [0, 1000]
+    assert (target / 'sub/big.bin').read_bytes() == (source / 'sub/big.bin').read_bytes()
+    assert sorted(os.listdir(target / 'sub')) == ['big.bin']
+
+
+def test_missing_chunk__should_raise(source, target):
+    chunks = [c for c in sync_delta.sync_init(source, chunk_size=chunk_size) if 'chunk_digest' in c]
+
+    with pytest.raises(ValueError):
+        sync_delta.sync_target(target, [chunks[0], chunks[2]])
+
+
+def test_corrupted_chunk__should_raise(source, target):
+    chunk = [c for c in sync_delta.sync_init(source, chunk_size=chunk_size) if 'chunk_digest' in c][0]
+    chunk['chunk_b64'] = 'AAAA'
+
+    with pytest.raises(ValueError):
+        sync_delta.sync_target(target, [chunk])
+
+
+def test_unchanged_large_file__should_be_skipped(source):
+    target_manifest = manifest.manifest(source)
+    (source / 'sub/big.bin').write_bytes((source / 'sub/big.bin').read_bytes())
+
+    assert sync_delta.sync_init(source, chunk_size=chunk_size, target_manifest=target_manifest) == []
+
+
+def test_cache__unchanged_large_file_should_be_skipped(source):
+    cache = HashCache()
+    sync_delta.sync_init(source, cache, chunk_size=chunk_size)
+    (source / 'sub/big.bin').write_bytes((source / 'sub/big.bin').read_bytes())
+    os.utime(source / 'sub/big.bin', ns=(0, 0))
+
+    changes = sync_delta.sync_source(source, [FileModifiedEvent(str(source / 'sub/big.bin'))], cache,
+                                     chunk_size=chunk_size)
+
+    assert changes == []
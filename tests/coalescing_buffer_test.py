@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pytest
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileDeletedEvent, FileMovedEvent, DirCreatedEvent, \
+    DirDeletedEvent, DirMovedEvent, DirModifiedEvent, FileClosedEvent
+
+from filesystem_sync import sync_delta
+from filesystem_sync.coalescing_buffer import CoalescingBuffer
+
+root = Path('/root')
+
+sequences = {
+    'created_modified': [FileCreatedEvent('/root/a'), FileModifiedEvent('/root/a'), FileClosedEvent('/root/a'),
+                         FileModifiedEvent('/root/a')],
+    'created_deleted': [FileCreatedEvent('/root/a'), FileModifiedEvent('/root/b'), FileDeletedEvent('/root/a')],
+    'modified_deleted': [FileModifiedEvent('/root/a'), FileDeletedEvent('/root/a')],
+    'deleted_created': [FileDeletedEvent('/root/a'), FileCreatedEvent('/root/a'), FileModifiedEvent('/root/a')],
+    'modified_moved_modified': [FileModifiedEvent('/root/a'), FileMovedEvent('/root/a', '/root/b'),
+                                FileCreatedEvent('/root/a'), FileModifiedEvent('/root/a')],
+    'moved_chain': [FileMovedEvent('/root/a', '/root/b'), FileMovedEvent('/root/b', '/root/c')],
+    'directory_deleted': [DirCreatedEvent('/root/d'), FileCreatedEvent('/root/d/a'), DirModifiedEvent('/root/d'),
+                          FileModifiedEvent('/root/d/b'), FileDeletedEvent('/root/d/a'), FileDeletedEvent('/root/d/b'),
+                          DirDeletedEvent('/root/d')],
+    'directory_recreated': [DirDeletedEvent('/root/d'), DirCreatedEvent('/root/d'), FileCreatedEvent('/root/d/a')],
+    'directory_moved': [FileModifiedEvent('/root/d/a'), DirMovedEvent('/root/d', '/root/e'),
+                        FileModifiedEvent('/root/e/a'), FileModifiedEvent('/root/d2/a')],
+    'moved_into_created_directory': [DirCreatedEvent('/root/d'), FileMovedEvent('/root/a', '/root/d/a'),
+                                     DirDeletedEvent('/root/d')],
+}
+
+
+@pytest.mark.parametrize('name', sequences.keys())
+def test_should_produce_the_same_ops(name):
+    # GIVEN
+    events = sequences[name]
+    buffer = CoalescingBuffer()
+
+    # WHEN
+    for e in events:
+        buffer.append(e)
+
+    # THEN
+    assert sync_delta.events_ops(root, list(buffer)) == sync_delta.events_ops(root, events)
+
+
+def test_directory_modifications__should_be_kept_once():
+    events = [FileCreatedEvent('/root/d/a'), DirModifiedEvent('/root/d'), FileDeletedEvent('/root/d/b'),
+              DirModifiedEvent('/root/d')]
+    buffer = CoalescingBuffer()
+
+    for e in events:
+        buffer.append(e)
+
+    assert [e for e in buffer if e.is_directory] == [DirModifiedEvent('/root/d')]
+    assert sync_delta._directories(root, list(buffer)) == sync_delta._directories(root, events) == ['d']
+
+
+def test_many_modifications__should_keep_one_entry():
+    buffer = CoalescingBuffer()
+
+    for _ in range(1000):
+        buffer.append(FileModifiedEvent('/root/a'))
+        buffer.append(FileClosedEvent('/root/a'))
+
+    assert len(buffer) == 1
+    assert list(buffer) == [FileModifiedEvent('/root/a')]
+
+
+def test_clear():
+    buffer = CoalescingBuffer()
+    buffer.append(FileModifiedEvent('/root/a'))
+
+    buffer.clear()
+    buffer.append(FileDeletedEvent('/root/a'))
+
+    assert list(buffer) == [FileDeletedEvent('/root/a')]
@@ -0,0 +1,99 @@
+import base64
+import os
+import zipfile
+import zlib
+
+import pytest
+
+from filesystem_sync import compression, sync_delta, wire
+from filesystem_sync.compression import Compressor
+
+text = b''.join(b'line %d of a compressible text file\n' % i for i in range(200))
+
+
+def test_choose__already_compressed_extension_should_be_stored():
+    assert Compressor().choose('photo.JPG', text) is None
+
+
+def test_choose__random_data_should_be_stored():
+    assert Compressor().choose('data.bin', os.urandom(10_000)) is None
+
+
+def test_choose__small_file_should_be_stored():
+    assert Compressor(min_size=256).choose('a.txt', b'small') is None
+
+
+def test_choose__by_extension():
+    target = Compressor(codec='zlib', by_extension={'.log': 'lzma'})
+
+    assert target.choose('a.log', text) == 'lzma'
+    assert target.choose('a.txt', text) == 'zlib'
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        Compressor(codec='brotli-xyz')
+
+
+@pytest.mark.parametrize('codec', sorted(compression.CODECS))
+def test_round_trip(codec):
+    change = Compressor(codec=codec).compressed_entry('a.txt', text)
+
+    assert change['codec'] == codec
+    assert len(change['compressed_b64']) < len(text)
+    assert compression.decompress(change) == text
+
+
+def test_compressed_entry__not_worth_it():
+    assert Compressor(min_saving=0.99).compressed_entry('a.txt', text) is None
+
+
+def test_dictionary__small_similar_files():
+    files = [b'{\n  "kind": "user",\n  "version": 1,\n  "enabled": true,\n  "name": "user%d"\n}\n' % i
+             for i in range(50)]
+    dictionary = compression.build_dictionary(files)
+    with_dictionary = Compressor(codec='zlib', dictionary=dictionary)
+
+    change = with_dictionary.compressed_entry('u.json', files[0])
+
+    assert change['dictionary']
+    assert len(base64.b64decode(change['compressed_b64'])) < len(zlib.compress(files[0]))
+    assert compression.decompress(change) == files[0]
+
+
+def test_decompress__unknown_dictionary():
+    change = {'name': 'a', 'codec': 'zlib', 'compressed_b64': '', 'dictionary': 'unknown'}
+
+    with pytest.raises(ValueError):
+        compression.decompress(change)
+
+
+def test_entropy():
+    assert compression.entropy(b'aaaa') == 0
+    assert compression.entropy(bytes(range(256))) == 8
+
+
+def test_zip_compress_type(tmp_path):
+    (tmp_path / 'a.txt').write_bytes(text)
+    (tmp_path / 'a.bin').write_bytes(os.urandom(10_000))
+    (tmp_path / 'a.png').write_bytes(text)
+
+    assert compression.zip_compress_type(tmp_path / 'a.txt') == zipfile.ZIP_DEFLATED
+    assert compression.zip_compress_type(tmp_path / 'a.bin') == zipfile.ZIP_STORED
+    assert compression.zip_compress_type(tmp_path / 'a.png') == zipfile.ZIP_STORED
+    assert compression.zip_compress_type(tmp_path / 'missing.txt', sample=os.urandom(4096)) == zipfile.ZIP_STORED
+
+
+def test_sync_delta(tmp_path):
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    source.mkdir()
+    target.mkdir()
+    (source / 'a.txt').write_bytes(text)
+    (source / 'b.bin').write_bytes(os.urandom(1000))
+
+    changes = sync_delta.sync_init(source, compressor=Compressor(codec='zlib'))
+    sync_delta.sync_target(target, wire.decode(wire.encode(changes)))
+
+    assert [c['name'] for c in changes if 'codec' in c] == ['a.txt']
+    assert (target / 'a.txt').read_bytes() == text
+    assert (target / 'b.bin').read_bytes() == (source / 'b.bin').read_bytes()
@@ -0,0 +1,102 @@
+import threading
+from datetime import timedelta
+from queue import Queue
+
+import pytest
+
+from filesystem_sync.debouncer import Debouncer
+from filesystem_sync.debouncer_scheduler import DebouncerScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = DebouncerScheduler()
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+    scheduler.join()
+
+
+def test_many_debouncers_on_one_thread(scheduler):
+    # GIVEN
+    emitted = Queue()
+    debouncers = [Debouncer(timedelta(milliseconds=20 + i * 10)) for i in range(5)]
+    for i, debouncer in enumerate(debouncers):
+        scheduler.add(debouncer, lambda events, i=i: emitted.put((i, events, threading.current_thread().name)))
+
+    # WHEN
+    for i, debouncer in reversed(list(enumerate(debouncers))):
+        debouncer.add_event(f'd{i}-e1')
+        debouncer.add_event(f'd{i}-e2')
+
+    # THEN
+    results = [emitted.get(timeout=5) for _ in debouncers]
+    assert [i for i, _, _ in results] == [0, 1, 2, 3, 4]
+    assert all(events == [f'd{i}-e1', f'd{i}-e2'] for i, events, _ in results)
+    assert {name for _, _, name in results} == {'DebouncerScheduler'}
+
+
+def test_remove__should_cancel_the_emission(scheduler):
+    # GIVEN
+    emitted = Queue()
+    removed = Debouncer(timedelta(milliseconds=20))
+    kept = Debouncer(timedelta(milliseconds=60))
+    scheduler.add(removed, lambda events: emitted.put(events))
+    scheduler.add(kept, lambda events: emitted.put(events))
+
+    # WHEN
+    removed.add_event('removed')
+    kept.add_event('kept')
+    scheduler.remove(removed)
+
+    # THEN
+    assert emitted.get(timeout=5) == ['kept']
+    assert emitted.empty()
+
+
+def test_failing_emit__should_not_stop_the_other_debouncers(scheduler, caplog):
+    # GIVEN
+    emitted = Queue()
+    failing = Debouncer(timedelta(milliseconds=20))
+    kept = Debouncer(timedelta(milliseconds=60))
+
+    def fail(events):
+        raise OSError('cannot sync')
+    scheduler.add(failing, fail)
+    scheduler.add(kept, lambda events: emitted.put(events))
+
+    # WHEN
+    failing.add_event('failing')
+    kept.add_event('kept')
+
+    # THEN
+    assert emitted.get(timeout=5) == ['kept']
+    assert 'cannot sync' in caplog.text
+
+
+def test_wakeups__should_keep_one_deadline_per_debouncer():
+    # GIVEN
+    target = DebouncerScheduler()
+    debouncer = Debouncer(timedelta(seconds=10))
+    target.add(debouncer, lambda events: None)
+
+    # WHEN
+    for _ in range(100):
+        target._wakeup(debouncer)
+    leading = Debouncer(timedelta(seconds=10), leading=True)
+    target.add(leading, lambda events: None)
+    target._wakeup(leading)
+    target._wakeup(leading)
+
+    # THEN
+    assert len(target._heap) == 2
+
+
+def test_leading(scheduler):
+    emitted = Queue()
+    debouncer = Debouncer(timedelta(seconds=10), leading=True)
+    scheduler.add(debouncer, lambda events: emitted.put(events))
+
+    debouncer.add_event('e1')
+
+    assert emitted.get(timeout=1) == ['e1']
@@ -1,7 +1,9 @@
 from datetime import timedelta
 
 import pytest
+from watchdog.events import FileModifiedEvent, FileCreatedEvent, FileDeletedEvent
 
+from filesystem_sync.coalescing_buffer import CoalescingBuffer
 from filesystem_sync.debouncer import Debouncer
 from tests.time_mock import TimeMock
 
@@ -147,3 +149,122 @@ def test_two_debounce_and_timeout__should_return_to_one_wakeup_on_new_event(deb)
     # THEN
     assert events == ["event3"]
     assert deb.wakeup_count == 2
+
+
+def test_max_wait__should_emit_during_sustained_activity():
+    # GIVEN
+    time_mock = TimeMock()
+    target = Debouncer(timedelta(milliseconds=100), lambda d: None, time_mock, max_wait=timedelta(milliseconds=250))
+
+    # WHEN
+    for i in range(20):
+        target.add_event(f"e{i}")
+        time_mock.advance(timedelta(milliseconds=50))
+        events = target.events()
+        if events:
+            break
+
+    # THEN
+    assert events == [f"e{i}" for i in range(5)]
+    assert target.time_until_next_emission() == target.window
+
+
+def test_max_wait__time_until_next_emission():
+    time_mock = TimeMock()
+    target = Debouncer(timedelta(milliseconds=100), lambda d: None, time_mock, max_wait=timedelta(milliseconds=120))
+    target.add_event("event1")
+    time_mock.advance(timedelta(milliseconds=90))
+    target.add_event("event2")
+
+    assert target.time_until_next_emission() == timedelta(milliseconds=30)
+
+
+def test_leading__first_event_should_be_emitted_immediately():
+    # GIVEN
+    time_mock = TimeMock()
+    target = Debouncer(timedelta(milliseconds=100), lambda d: None, time_mock, leading=True)
+
+    # WHEN
+    target.add_event("event1")
+
+    # THEN
+    assert target.events() == ["event1"]
+
+
+def test_leading__events_after_the_first_should_be_debounced():
+    # GIVEN
+    time_mock = TimeMock()
+    target = Debouncer(timedelta(milliseconds=100), lambda d: None, time_mock, leading=True)
+    target.add_event("event1")
+    target.events()
+
+    # WHEN
+    time_mock.advance(timedelta(milliseconds=10))
+    target.add_event("event2")
+
+    # THEN
+    assert target.events() == []
+    time_mock.advance(timedelta(milliseconds=101))
+    assert target.events() == ["event2"]
+
+    # WHEN quiet for a window
+    time_mock.advance(timedelta(milliseconds=101))
+    target.add_event("event3")
+
+    # THEN
+    assert target.events() == ["event3"]
+
+
+def test_events_buffer():
+    # GIVEN
+    time_mock = TimeMock()
+    target = Debouncer(timedelta(milliseconds=100), lambda d: None, time_mock, events_buffer=CoalescingBuffer())
+
+    # WHEN
+    for _ in range(10):
+        target.add_event(FileModifiedEvent('/root/a'))
+    time_mock.advance(timedelta(milliseconds=101))
+
+    # THEN
+    assert target.events() == [FileModifiedEvent('/root/a')]
+    assert target.time_until_next_emission() == target.window
+
+
+def test_events_buffer__repeated_events_should_wakeup_only_once():
+    # GIVEN
+    wakeups = []
+    target = Debouncer(timedelta(milliseconds=100), wakeups.append, TimeMock(), events_buffer=CoalescingBuffer())
+
+    # WHEN
+    for _ in range(1000):
+        target.add_event(FileModifiedEvent('/root/a'))
+
+    # THEN
+    assert wakeups == [target]
+
+
+def test_events_buffer__coalesced_to_empty__should_reset_the_window():
+    # GIVEN
+    time_mock = TimeMock()
+    wakeups = []
+    target = Debouncer(timedelta(milliseconds=100), wakeups.append, time_mock,
+                       max_wait=timedelta(milliseconds=150), events_buffer=CoalescingBuffer())
+    target.add_event(FileCreatedEvent('/root/a'))
+    target.add_event(FileDeletedEvent('/root/a'))
+    assert not target.has_events()
+
+    # WHEN
+    time_mock.advance(timedelta(milliseconds=120))
+    target.add_event(FileModifiedEvent('/root/b'))
+
+    # THEN the max_wait counts from the new first event
+    assert len(wakeups) == 2
+    assert target.time_until_next_emission() == timedelta(milliseconds=100)
+
+
+def test_default_clock__should_be_monotonic():
+    target = Debouncer(timedelta(seconds=10), lambda d: None)
+
+    target.add_event("event1")
+
+    assert timedelta(seconds=9) < target.time_until_next_emission() <= timedelta(seconds=10)
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from queue import Queue
+
+import pytest
+
+from filesystem_sync.debouncer import Debouncer
+from filesystem_sync.debouncer_thread import DebouncerThread
+
+
+@pytest.fixture
+def emitted():
+    return Queue()
+
+
+@pytest.fixture
+def target(emitted):
+    thread = DebouncerThread(Debouncer(timedelta(milliseconds=30)), emitted.put)
+    thread.start()
+    yield thread
+    thread.stop()
+    thread.join()
+
+
+def test_emit(target, emitted):
+    target._debouncer.add_event('e1')
+    target._debouncer.add_event('e2')
+
+    assert emitted.get(timeout=5) == ['e1', 'e2']
+
+
+def test_idle__should_not_wake_up(target):
+    assert target._scheduler._heap == []
+
+
+def test_start_twice(target):
+    with pytest.raises(RuntimeError):
+        target.start()
+
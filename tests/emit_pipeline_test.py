@@ -0,0 +1,112 @@
+from threading import Event
+
+import pytest
+
+from filesystem_sync.emit_pipeline import EmitPipeline, BLOCK, MERGE, DROP
+
+
+class EmitRecorder:
+    def __init__(self):
+        self.batches = []
+        self.resync_count = 0
+        self.release = Event()
+        self.started = Event()
+
+    def emit(self, events):
+        self.started.set()
+        self.release.wait(5)
+        self.batches.append(events)
+
+    def resync(self):
+        self.resync_count += 1
+
+
+@pytest.fixture
+def recorder():
+    return EmitRecorder()
+
+
+def _fill(recorder, backpressure):
+    """The worker is busy on the first batch and the second is pending"""
+    target = EmitPipeline(recorder.emit, max_pending=1, backpressure=backpressure, resync=recorder.resync)
+    target.start()
+    target(['e1'])
+    assert recorder.started.wait(5)
+    target(['e2'])
+    return target
+
+
+def _drain(recorder, target):
+    recorder.release.set()
+    target.stop()
+    target.join()
+
+
+def test_batches_are_emitted_in_order(recorder):
+    recorder.release.set()
+    target = EmitPipeline(recorder.emit, max_pending=10)
+    target.start()
+
+    for i in range(5):
+        target([f'e{i}'])
+    target.stop()
+    target.join()
+
+    assert recorder.batches == [[f'e{i}'] for i in range(5)]
+
+
+def test_merge(recorder):
+    target = _fill(recorder, MERGE)
+
+    target(['e3'])
+    target(['e4'])
+    _drain(recorder, target)
+
+    assert recorder.batches == [['e1'], ['e2', 'e3', 'e4']]
+
+
+def test_drop(recorder):
+    target = _fill(recorder, DROP)
+
+    target(['e3'])
+    target(['e4'])
+    _drain(recorder, target)
+
+    assert recorder.batches == [['e1']]
+    assert recorder.resync_count == 1
+
+
+def test_block(recorder):
+    target = _fill(recorder, BLOCK)
+    assert target.pending() == 1
+
+    recorder.release.set()
+    target(['e3'])
+    target.stop()
+    target.join()
+
+    assert recorder.batches == [['e1'], ['e2'], ['e3']]
+
+
+def test_drop_without_resync():
+    with pytest.raises(ValueError):
+        EmitPipeline(lambda events: None, backpressure=DROP)
+
+
+def test_failing_emit__should_not_stop_the_worker(recorder, caplog):
+    recorder.release.set()
+
+    def emit(events):
+        if events == ['bad']:
+            raise ValueError('cannot apply')
+        recorder.emit(events)
+    target = EmitPipeline(emit, max_pending=10)
+    target.start()
+
+    target(['bad'])
+    target(['good'])
+    target.stop()
+    target.join()
+
+    assert recorder.batches == [['good']]
+    assert 'cannot apply' in caplog.text
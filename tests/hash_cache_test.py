@@ -0,0 +1,92 @@
+import os
+
+from watchdog.events import FileModifiedEvent, FileDeletedEvent
+
+from filesystem_sync import sync_delta
+from filesystem_sync.hash_cache import HashCache, CacheEntry
+
+
+def test_lru_eviction():
+    # GIVEN
+    cache = HashCache(max_entries=2)
+    cache.put('a', CacheEntry(1, 1, 'ha'))
+    cache.put('b', CacheEntry(1, 1, 'hb'))
+
+    # WHEN
+    cache.get('a')
+    cache.put('c', CacheEntry(1, 1, 'hc'))
+
+    # THEN
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert len(cache) == 2
+
+
+def test_forget_directory():
+    cache = HashCache()
+    cache.put('sub1/foo.txt', CacheEntry(1, 1, 'h'))
+    cache.put('sub10/foo.txt', CacheEntry(1, 1, 'h'))
+
+    cache.forget('sub1')
+
+    assert cache.get('sub1/foo.txt') is None
+    assert cache.get('sub10/foo.txt') is not None
+
+
+def test_save_and_load(tmp_path):
+    cache = HashCache()
+    cache.put('a', CacheEntry(1, 2, 'ha'))
+    cache.put('b', CacheEntry(3, 4, 'hb'))
+
+    cache.save(tmp_path / 'cache.json')
+    loaded = HashCache.load(tmp_path / 'cache.json', max_entries=1)
+
+    assert len(loaded) == 1
+    assert loaded.get('b') == CacheEntry(3, 4, 'hb')
+
+
+def test_sync_source__same_content_should_be_skipped(tmp_path):
+    # GIVEN
+    cache = HashCache()
+    foo = tmp_path / 'foo.txt'
+    foo.write_text('content1')
+    sync_delta.sync_init(tmp_path, cache)
+
+    # WHEN
+    foo.write_text('content1')
+    os.utime(foo, ns=(1, 1))
+    changes = sync_delta.sync_source(tmp_path, [FileModifiedEvent(str(foo))], cache)
+
+    # THEN
+    assert changes == []
+
+
+def test_sync_source__changed_content_should_be_sent(tmp_path):
+    # GIVEN
+    cache = HashCache()
+    foo = tmp_path / 'foo.txt'
+    foo.write_text('content1')
+    sync_delta.sync_init(tmp_path, cache)
+
+    # WHEN
+    foo.write_text('content2')
+    os.utime(foo, ns=(1, 1))
+    changes = sync_delta.sync_source(tmp_path, [FileModifiedEvent(str(foo))], cache)
+
+    # THEN
+    assert changes == [{'name': 'foo.txt', 'content': 'content2'}]
+
+
+def test_sync_source__deleted_and_recreated_should_be_sent(tmp_path):
+    # GIVEN
+    cache = HashCache()
+    foo = tmp_path / 'foo.txt'
+    foo.write_text('content1')
+    sync_delta.sync_init(tmp_path, cache)
+    sync_delta.sync_source(tmp_path, [FileDeletedEvent(str(foo))], cache)
+
+    # WHEN
+    changes = sync_delta.sync_source(tmp_path, [FileModifiedEvent(str(foo))], cache)
+
+    # THEN
+    assert changes == [{'name': 'foo.txt', 'content': 'content1'}]
@@ -0,0 +1,72 @@
+import os
+
+from filesystem_sync import manifest, sync_delta, sync_zip_incremental
+from filesystem_sync.hash_cache import HashCache, content_hash
+
+
+def _build(source, target):
+    for root in (source, target):
+        (root / 'sub1').mkdir(parents=True)
+        (root / 'same.txt').write_text('same')
+        (root / 'sub1/different.txt').write_text(f'{root.name}')
+    (source / 'source_only.txt').write_text('source')
+    (target / 'target_only.txt').write_text('target')
+
+
+def test_manifest(tmp_path):
+    (tmp_path / 'sub1').mkdir()
+    (tmp_path / 'sub1/foo.txt').write_text('foo')
+
+    assert manifest.manifest(tmp_path) == {'sub1/foo.txt': content_hash(b'foo')}
+
+
+def test_manifest__cache_should_avoid_hashing_unchanged_files(tmp_path):
+    # GIVEN
+    foo = tmp_path / 'foo.txt'
+    foo.write_text('foo')
+    cache = HashCache()
+    manifest.manifest(tmp_path, cache)
+    stat = foo.stat()
+
+    # WHEN the content changes but size and mtime are the same
+    foo.write_text('bar')
+    os.utime(foo, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    # THEN
+    assert manifest.manifest(tmp_path, cache) == {'foo.txt': content_hash(b'foo')}
+    assert manifest.manifest(tmp_path) == {'foo.txt': content_hash(b'bar')}
+
+
+def test_diff():
+    to_send, to_delete = manifest.diff({'a': '1', 'b': '2', 'c': '3'}, {'a': '1', 'b': '0', 'd': '4'})
+
+    assert to_send == ['b', 'c']
+    assert to_delete == ['d']
+
+
+def test_sync_delta_init__should_send_only_the_differences(tmp_path):
+    # GIVEN
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    _build(source, target)
+
+    # WHEN
+    changes = sync_delta.sync_init(source, target_manifest=manifest.manifest(target))
+    sync_delta.sync_target(target, changes)
+
+    # THEN
+    assert sorted(c['name'] for c in changes) == ['source_only.txt', 'sub1/different.txt', 'target_only.txt']
+    assert manifest.manifest(target) == manifest.manifest(source)
+
+
+def test_sync_zip_incremental_init__should_send_only_the_differences(tmp_path):
+    # GIVEN
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    _build(source, target)
+
+    # WHEN
+    changes = sync_zip_incremental.sync_init(source, target_manifest=manifest.manifest(target))
+    sync_zip_incremental.sync_target(target, changes)
+
+    # THEN
+    assert changes[0]['deleted'] == ['target_only.txt']
+    assert manifest.manifest(target) == manifest.manifest(source)
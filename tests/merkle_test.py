@@ -0,0 +1,89 @@
+import shutil
+
+from watchdog.events import FileModifiedEvent, FileDeletedEvent, DirMovedEvent, DirDeletedEvent, FileCreatedEvent
+
+from filesystem_sync.merkle import MerkleTree
+
+
+def _build(root):
+    for d in ('a/b', 'a/c', 'd'):
+        (root / d).mkdir(parents=True)
+        for f in range(3):
+            (root / d / f'f{f}.txt').write_text(f'{d}/{f}')
+    (root / 'top.txt').write_text('top')
+
+
+class CountingTree:
+    def __init__(self, tree: MerkleTree):
+        self.tree = tree
+        self.visited = []
+
+    def hash(self, name=''):
+        return self.tree.hash(name)
+
+    def children(self, name=''):
+        self.visited.append(name)
+        return self.tree.children(name)
+
+
+def test_same_trees(tmp_path):
+    _build(tmp_path / 'source')
+    _build(tmp_path / 'target')
+
+    source = MerkleTree(tmp_path / 'source')
+    target = MerkleTree(tmp_path / 'target')
+
+    assert source.hash() == target.hash()
+    assert source.differences(target) == []
+
+
+def test_differences__should_visit_only_the_differing_subtrees(tmp_path):
+    # GIVEN
+    _build(tmp_path / 'source')
+    _build(tmp_path / 'target')
+    (tmp_path / 'target/a/b/f1.txt').write_text('changed')
+    (tmp_path / 'target/a/b/f2.txt').unlink()
+    (tmp_path / 'target/d/new.txt').write_text('new')
+
+    # WHEN
+    target = CountingTree(MerkleTree(tmp_path / 'target'))
+    differences = MerkleTree(tmp_path / 'source').differences(target)
+
+    # THEN
+    assert sorted(differences) == ['a/b/f1.txt', 'a/b/f2.txt', 'd/new.txt']
+    assert sorted(target.visited) == ['', 'a', 'a/b', 'd']
+
+
+def test_differences__file_replaced_by_directory(tmp_path):
+    (tmp_path / 'source/x').mkdir(parents=True)
+    (tmp_path / 'source/x/f.txt').write_text('f')
+    (tmp_path / 'target').mkdir()
+    (tmp_path / 'target/x').write_text('x')
+
+    differences = MerkleTree(tmp_path / 'source').differences(MerkleTree(tmp_path / 'target'))
+
+    assert differences == ['x']
+
+
+def test_update__should_match_a_fresh_tree(tmp_path):
+    # GIVEN
+    _build(tmp_path)
+    tree = MerkleTree(tmp_path)
+
+    # WHEN
+    (tmp_path / 'a/b/f0.txt').write_text('changed')
+    (tmp_path / 'a/c/f1.txt').unlink()
+    (tmp_path / 'a/new.txt').write_text('new')
+    (tmp_path / 'a').rename(tmp_path / 'z')
+    shutil.rmtree(tmp_path / 'd')
+    tree.update([FileModifiedEvent(str(tmp_path / 'a/b/f0.txt')),
+                 FileDeletedEvent(str(tmp_path / 'a/c/f1.txt')),
+                 FileCreatedEvent(str(tmp_path / 'a/new.txt')),
+                 DirMovedEvent(str(tmp_path / 'a'), str(tmp_path / 'z')),
+                 DirDeletedEvent(str(tmp_path / 'd'))])
+
+    # THEN
+    fresh = MerkleTree(tmp_path)
+    assert tree.differences(fresh) == []
+    assert tree.hash() == fresh.hash()
+    assert tree.children() == {'top.txt': fresh.hash('top.txt'), 'z/': fresh.hash('z')}
@@ -0,0 +1,110 @@
+import os
+import stat
+import zipfile
+
+import pytest
+from watchdog.events import FileModifiedEvent, DirCreatedEvent, FileCreatedEvent
+
+from filesystem_sync import sync_delta, sync_zip, wire
+from filesystem_sync.hash_cache import HashCache
+
+mtime_ns = 1_600_000_000_123_456_789
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / 'source'
+    (source / 'sub/empty').mkdir(parents=True)
+    (source / 'sub/run.sh').write_text('#!/bin/sh')
+    (source / 'sub/run.sh').chmod(0o750)
+    os.utime(source / 'sub/run.sh', ns=(mtime_ns, mtime_ns))
+    (source / 'link').symlink_to('sub/run.sh')
+    os.utime(source / 'sub', ns=(mtime_ns, mtime_ns))
+    return source
+
+
+@pytest.fixture
+def target(tmp_path):
+    target = tmp_path / 'target'
+    target.mkdir()
+    return target
+
+
+def test_sync_init(source, target):
+    changes = sync_delta.sync_init(source, metadata=True)
+    sync_delta.sync_target(target, wire.decode(wire.encode(changes)))
+
+    assert stat.S_IMODE((target / 'sub/run.sh').stat().st_mode) == 0o750
+    assert (target / 'sub/run.sh').stat().st_mtime_ns == mtime_ns
+    assert os.readlink(target / 'link') == 'sub/run.sh'
+    assert (target / 'sub/empty').is_dir()
+    assert (target / 'sub').stat().st_mtime_ns == mtime_ns
+
+
+def test_without_metadata__symlinks_should_be_dereferenced(source, target):
+    sync_delta.sync_target(target, sync_delta.sync_init(source))
+
+    assert not (target / 'link').is_symlink()
+    assert (target / 'link').read_text() == '#!/bin/sh'
+    assert not (target / 'sub/empty').exists()
+
+
+def test_attributes_only__should_not_send_the_content(source):
+    cache = HashCache()
+    sync_delta.sync_init(source, cache, metadata=True)
+    (source / 'sub/run.sh').chmod(0o700)
+
+    changes = sync_delta.sync_source(source, [FileModifiedEvent(str(source / 'sub/run.sh'))], cache, metadata=True)
+
+    assert changes == [{'name': 'sub/run.sh', 'mode': 0o700, 'mtime_ns': mtime_ns}]
+
+
+def test_touch__should_not_send_the_content(source):
+    cache = HashCache()
+    sync_delta.sync_init(source, cache, metadata=True)
+    os.utime(source / 'sub/run.sh', ns=(mtime_ns + 1, mtime_ns + 1))
+
+    changes = sync_delta.sync_source(source, [FileModifiedEvent(str(source / 'sub/run.sh'))], cache, metadata=True)
+
+    assert changes == [{'name': 'sub/run.sh', 'mode': 0o750, 'mtime_ns': mtime_ns + 1}]
+
+
+def test_sync_source__new_empty_directory_and_symlink(source):
+    (source / 'new').mkdir()
+    (source / 'new_link').symlink_to('new')
+
+    changes = sync_delta.sync_source(source, [DirCreatedEvent(str(source / 'new')),
+                                              FileCreatedEvent(str(source / 'new_link'))], metadata=True)
+
+    assert [{k: v for k, v in c.items() if k not in ('mode', 'mtime_ns')} for c in changes] == [
+        {'name': 'new_link', 'symlink': 'new'}, {'name': 'new', 'directory': True}]
+
+
+def test_sync_zip__should_keep_modes_and_empty_directories(source, target):
+    sync_zip.sync_target(target, sync_zip.sync_init(source))
+
+    assert stat.S_IMODE((target / 'sub/run.sh').stat().st_mode) == 0o750
+    assert abs((target / 'sub/run.sh').stat().st_mtime_ns - mtime_ns) <= 2_000_000_000
+    assert (target / 'sub/empty').is_dir()
+
+
+def test_extract__should_stay_below_the_root_and_drop_setuid(tmp_path):
+    stream = tmp_path / 'evil.zip'
+    with zipfile.ZipFile(stream, 'w') as zip_file:
+        for name in ('../outside/victim', '/absolute'):
+            info = zipfile.ZipInfo(name, (2020, 1, 1, 0, 0, 0))
+            info.external_attr = (stat.S_IFREG | stat.S_ISUID | 0o755) << 16
+            zip_file.writestr(info, b'content')
+    (tmp_path / 'outside').mkdir()
+    (tmp_path / 'outside/victim').write_text('victim')
+    root = tmp_path / 'root'
+    root.mkdir()
+
+    with zipfile.ZipFile(stream) as zip_file:
+        sync_zip.extract(zip_file, root)
+
+    assert (tmp_path / 'outside/victim').read_text() == 'victim'
+    assert not (tmp_path / 'outside/victim').stat().st_mode & stat.S_ISUID
+    assert (root / 'outside/victim').read_bytes() == b'content'
+    assert (root / 'absolute').read_bytes() == b'content'
+    assert stat.S_IMODE((root / 'absolute').stat().st_mode) == 0o755
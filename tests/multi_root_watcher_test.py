@@ -0,0 +1,42 @@
+import threading
+from datetime import timedelta
+from queue import Queue
+
+from filesystem_sync.multi_root_watcher import MultiRootWatcher
+
+
+def test_roots_share_the_threads(tmp_path):
+    # GIVEN
+    roots = [tmp_path / f'root{i}' for i in range(10)]
+    emitted = Queue()
+    target = MultiRootWatcher(timedelta(milliseconds=50), coalesce=True)
+    for i, root in enumerate(roots):
+        root.mkdir()
+        target.add_root(root, lambda events, i=i: emitted.put((i, events, threading.current_thread().name)))
+    threads_before = threading.active_count()
+    target.start()
+
+    try:
+        # WHEN
+        for root in roots:
+            (root / 'foo.txt').write_text('foo')
+
+        # THEN
+        results = [emitted.get(timeout=5) for _ in roots]
+        assert sorted(i for i, _, _ in results) == list(range(10))
+        assert all(events[0].src_path == str(roots[i] / 'foo.txt') for i, events, _ in results)
+        assert {name for _, _, name in results} == {'DebouncerScheduler'}
+        # watchdog creates the emitter threads for each watch (two with inotify), plus the observer and scheduler
+        assert threading.active_count() - threads_before <= 2 * len(roots) + 2
+
+        # WHEN
+        target.remove_root(roots[0])
+        (roots[0] / 'bar.txt').write_text('bar')
+        (roots[1] / 'bar.txt').write_text('bar')
+
+        # THEN
+        i, events, _ = emitted.get(timeout=5)
+        assert i == 1
+    finally:
+        target.stop()
+        target.join()
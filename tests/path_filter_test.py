@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import pytest
+from watchdog.events import FileModifiedEvent, FileMovedEvent, FileCreatedEvent, FileDeletedEvent, DirModifiedEvent
+
+from filesystem_sync import sync_delta, sync_zip, sync_stream
+from filesystem_sync.sync_rsync import SyncRsync
+from filesystem_sync.any_observer import AnyObserver
+from filesystem_sync.path_filter import PathFilter
+
+gitignore = '''
+# comment
+node_modules/
+__pycache__
+*.swp
+/build
+docs/**/*.tmp
+*.log
+!keep.log
+'''
+
+
+@pytest.fixture
+def target():
+    return PathFilter(gitignore.splitlines())
+
+
+@pytest.mark.parametrize('name, is_directory, excluded', [
+    ('node_modules', True, True),
+    ('node_modules', False, False),
+    ('a/node_modules/x/y.js', False, True),
+    ('a/__pycache__/m.pyc', False, True),
+    ('a/.m.py.swp', False, True),
+    ('build/out.o', False, True),
+    ('a/build/out.o', False, False),
+    ('docs/a/b/c.tmp', False, True),
+    ('docs/c.tmp', False, True),
+    ('c.tmp', False, False),
+    ('a/x.log', False, True),
+    ('a/keep.log', False, False),
+    ('a/b.txt', False, False),
+])
+def test_excluded(target, name, is_directory, excluded):
+    assert target.excluded(name, is_directory) == excluded
+
+
+def test_parent_excluded__cannot_be_reincluded():
+    target = PathFilter(['logs/', '!logs/keep.log'])
+
+    assert target.excluded('logs/keep.log', False)
+
+
+def test_walk__should_not_visit_excluded_directories(tmp_path, target):
+    (tmp_path / 'node_modules/pkg').mkdir(parents=True)
+    (tmp_path / 'node_modules/pkg/index.js').write_text('x')
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src/main.py').write_text('x')
+    (tmp_path / 'src/main.py.swp').write_text('x')
+
+    assert sorted(target.walk(tmp_path)) == ['src', 'src/main.py']
+
+
+def test_sync_init(tmp_path, target):
+    (tmp_path / 'node_modules').mkdir()
+    (tmp_path / 'node_modules/index.js').write_text('x')
+    (tmp_path / 'main.py').write_text('main')
+
+    changes = sync_delta.sync_init(tmp_path, path_filter=target)
+
+    assert changes == [{'name': 'main.py', 'content': 'main'}]
+
+
+def test_sync_init__of_the_other_engines(tmp_path, target):
+    source = tmp_path / 'source'
+    (source / 'node_modules').mkdir(parents=True)
+    (source / 'node_modules/index.js').write_text('x')
+    (source / 'main.py').write_text('main')
+    for name in ('zip', 'stream', 'rsync'):
+        (tmp_path / name).mkdir()
+
+    sync_zip.sync_target(tmp_path / 'zip', sync_zip.sync_init(source, target))
+    sync_stream.sync_target(tmp_path / 'stream', sync_stream.sync_init(source, path_filter=target))
+    rsync = SyncRsync(path_filter=target)
+    rsync.sync_target(tmp_path / 'rsync', rsync.sync_init(source))
+
+    for name in ('zip', 'stream', 'rsync'):
+        assert sorted(p.name for p in (tmp_path / name).iterdir()) == ['main.py'], name
+
+
+def test_sync_zip__excluded_events_should_not_send_the_tree(tmp_path, target):
+    (tmp_path / 'node_modules').mkdir()
+    events = [FileCreatedEvent(str(tmp_path / 'node_modules/index.js'))]
+
+    assert sync_zip.sync_source(tmp_path, events, target) == []
+
+
+def test_any_observer(target):
+    root = Path('/root')
+    received = []
+    any_observer = AnyObserver(root, received.append, path_filter=target)
+
+    any_observer.on_any_event(FileModifiedEvent('/root/a.swp'))
+    any_observer.on_any_event(DirModifiedEvent('/root/node_modules'))
+    any_observer.on_any_event(FileModifiedEvent('/root/a.txt'))
+    any_observer.on_any_event(FileMovedEvent('/root/a.txt.swp', '/root/a.txt'))
+    any_observer.on_any_event(FileMovedEvent('/root/b.txt', '/root/b.txt.swp'))
+    any_observer.on_any_event(FileMovedEvent('/root/c.swp', '/root/d.swp'))
+
+    assert received == [FileModifiedEvent('/root/a.txt'), FileCreatedEvent('/root/a.txt'),
+                        FileDeletedEvent('/root/b.txt')]
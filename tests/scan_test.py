@@ -0,0 +1,100 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from filesystem_sync import sync_delta
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.scan import scan
+from filesystem_sync.sync_zip import _zip_in_memory
+
+
+def _tree(root):
+    for d in ('a/b/c', 'a/empty', 'd', 'node_modules/x'):
+        (root / d).mkdir(parents=True)
+    for f in ('top.txt', 'a/a.txt', 'a/b/b.txt', 'a/b/c/c.txt', 'd/d.txt', 'node_modules/x/x.js'):
+        (root / f).write_text(f)
+
+
+def test_scan__should_list_every_entry_with_its_stat(tmp_path):
+    _tree(tmp_path)
+
+    target = scan(tmp_path)
+
+    assert set(target) == {str(p.relative_to(tmp_path).as_posix()) for p in tmp_path.rglob('*')}
+    for entry in target.entries():
+        stat = (tmp_path / entry.name).lstat()
+        assert (entry.st_mode, entry.st_size, entry.st_mtime_ns) == (stat.st_mode, stat.st_size, stat.st_mtime_ns)
+    assert {e.name for e in target.files()} == {'top.txt', 'a/a.txt', 'a/b/b.txt', 'a/b/c/c.txt', 'd/d.txt',
+                                                 'node_modules/x/x.js'}
+    assert target.get('a/b').is_dir() and target.get('missing') is None
+
+
+def test_scan__directories_should_come_before_their_entries(tmp_path):
+    _tree(tmp_path)
+
+    names = scan(tmp_path).names
+
+    for i, name in enumerate(names):
+        if '/' in name:
+            assert names.index(name.rsplit('/', 1)[0]) < i
+
+
+def test_scan__executor_should_give_the_same_inventory(tmp_path):
+    _tree(tmp_path)
+
+    with ThreadPoolExecutor(4) as executor:
+        target = scan(tmp_path, executor=executor)
+
+    assert list(target.entries()) == list(scan(tmp_path).entries())
+
+
+def test_scan__should_not_visit_excluded_directories(tmp_path):
+    _tree(tmp_path)
+    visited = []
+
+    class RecordingFilter(PathFilter):
+        def excluded(self, name, is_directory):
+            visited.append(name)
+            return super().excluded(name, is_directory)
+
+    target = scan(tmp_path, RecordingFilter(['node_modules/', 'b.txt']))
+
+    assert 'node_modules' not in target and 'a/b/b.txt' not in target and 'a/b/c/c.txt' in target
+    assert not [name for name in visited if name.startswith('node_modules/')]
+
+
+def test_scan__should_not_follow_symlinks(tmp_path):
+    _tree(tmp_path)
+    os.symlink(tmp_path / 'a', tmp_path / 'link')
+    os.symlink(tmp_path / 'top.txt', tmp_path / 'file_link')
+
+    target = scan(tmp_path)
+
+    assert target.get('link').is_symlink() and 'link/a.txt' not in target
+    assert target.get('file_link').followed(tmp_path).st_size == len('top.txt')
+
+
+def test_sync_init__should_stat_each_entry_once(tmp_path, monkeypatch):
+    _tree(tmp_path)
+    calls = []
+    stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda *args, **kwargs: calls.append(args[0]) or stat(*args, **kwargs))
+
+    changes = sync_delta.sync_init(tmp_path)
+
+    assert len(changes) == 6
+    assert not [path for path in calls if str(tmp_path) in str(path)]
+
+
+def test_zip__should_use_the_scanned_stats(tmp_path):
+    _tree(tmp_path)
+    os.chmod(tmp_path / 'd/d.txt', 0o640)
+
+    with zipfile.ZipFile(BytesIO(_zip_in_memory(tmp_path, PathFilter(['node_modules/'])))) as zip_file:
+        infos = {info.filename: info for info in zip_file.infolist()}
+
+    assert set(infos) == {'top.txt', 'a/a.txt', 'a/b/b.txt', 'a/b/c/c.txt', 'd/d.txt', 'a/empty/'}
+    assert (infos['d/d.txt'].external_attr >> 16) & 0o777 == 0o640
+    assert infos['a/b/c/c.txt'].file_size == len('a/b/c/c.txt')
+    assert infos['a/empty/'].is_dir()
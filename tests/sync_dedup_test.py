@@ -0,0 +1,156 @@
+import io
+import os
+import random
+
+import pytest
+from watchdog.events import FileCreatedEvent
+
+from filesystem_sync import chunking
+from filesystem_sync.chunk_store import ChunkStore
+from filesystem_sync.chunking import cdc_boundaries, cdc_chunks
+from filesystem_sync.path_filter import PathFilter
+from filesystem_sync.sync_dedup import SyncDedup
+
+
+def _random(size: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def test_cdc_boundaries__should_cover_the_data():
+    data = _random(200_000)
+
+    chunks = list(cdc_boundaries(data, 1024, 4096, 16384))
+
+    assert sum(length for _, length in chunks) == len(data)
+    assert all(1024 <= length <= 16384 for _, length in chunks[:-1])
+    assert [offset for offset, _ in chunks] == [sum(length for _, length in chunks[:i]) for i in range(len(chunks))]
+
+
+def test_cdc_boundaries__insertion_should_change_only_the_chunks_around_it():
+    data = _random(200_000)
+    modified = data[:100_000] + b'inserted' + data[100_000:]
+
+    chunks = set(data[o:o + n] for o, n in cdc_boundaries(data, 1024, 4096, 16384))
+    chunks_m = set(modified[o:o + n] for o, n in cdc_boundaries(modified, 1024, 4096, 16384))
+
+    assert len(chunks - chunks_m) <= 2
+
+
+@pytest.mark.parametrize('with_numpy', [True, False])
+def test_cdc_chunks__should_split_as_cdc_boundaries(monkeypatch, with_numpy):
+    if not with_numpy:
+        monkeypatch.setattr(chunking, 'numpy', None)
+    data = _random(300_000)
+
+    chunks = list(cdc_chunks(io.BytesIO(data), 1024, 4096, 16384, block_size=50_000))
+
+    assert chunks == [data[o:o + n] for o, n in cdc_boundaries(data, 1024, 4096, 16384)]
+
+
+def _sent(changes) -> int:
+    return sum(len(b64) for c in changes for b64 in c.get('chunks', {}).values())
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / 'source'
+    source.mkdir()
+    return source
+
+
+@pytest.fixture
+def target(tmp_path):
+    target = tmp_path / 'target'
+    target.mkdir()
+    return target
+
+
+def test_copies__should_be_sent_once(source, target):
+    content = _random(100_000)
+    for name in ['a.bin', 'b.bin', 'c.bin']:
+        (source / name).write_bytes(content)
+    sync = SyncDedup()
+
+    changes = sync.sync_init(source)
+    sync.sync_target(target, changes)
+
+    assert _sent(changes) < len(content) * 1.4
+    for name in ['a.bin', 'b.bin', 'c.bin']:
+        assert (target / name).read_bytes() == content
+
+
+def test_chunks_already_in_the_store__should_not_be_sent(source, target):
+    content = _random(100_000)
+    (source / 'a.bin').write_bytes(content)
+    sync = SyncDedup()
+    sync.sync_target(target, sync.sync_init(source))
+    (source / 'b.bin').write_bytes(content[:50_000] + b'changed' + content[50_000:])
+
+    changes = sync.sync_source(source, [FileCreatedEvent(str(source / 'b.bin'))])
+    sync.sync_target(target, changes)
+
+    assert _sent(changes) < 40_000
+    assert (target / 'b.bin').read_bytes() == (source / 'b.bin').read_bytes()
+
+
+def test_evicted_chunk__should_raise(source, target):
+    (source / 'a.bin').write_bytes(_random(10_000))
+    store = ChunkStore()
+    sync = SyncDedup(store)
+    sync.sync_target(target, sync.sync_init(source))
+    changes = sync.sync_init(source)  # the chunks are in the store, only the recipe is sent
+    store.max_bytes = 0
+    store.evict()  # e.g., by another batch, between the query and the apply
+
+    (target / 'a.bin').write_bytes(b'previous')
+
+    with pytest.raises(ValueError):
+        sync.sync_target(target, changes)
+    assert (target / 'a.bin').read_bytes() == b'previous'
+    assert os.listdir(target) == ['a.bin']  # no temporary file left
+
+
+def test_chunk_store__lru_eviction(tmp_path):
+    store = ChunkStore(tmp_path, max_bytes=10)
+    a = store.put(b'aaaa')
+    b = store.put(b'bbbb')
+    store.get(a)
+    c = store.put(b'cccc')
+
+    assert store.size <= 10
+    assert a in store and c in store and b not in store
+    assert store.missing([a, b, c]) == [b]
+    assert not (tmp_path / b[:2] / b).exists()
+
+
+def test_chunk_store__pinned_chunks_should_not_be_evicted(tmp_path):
+    store = ChunkStore(tmp_path, max_bytes=10)
+    a = store.put(b'aaaa')
+    b = store.put(b'bbbb')
+
+    with store.pinned([a]):
+        c = store.put(b'cccc')
+        assert a in store and b not in store and c in store
+
+    assert store.size <= 10
+
+
+def test_path_filter__should_skip_the_excluded_files(source, target):
+    (source / 'a.txt').write_bytes(b'a')
+    (source / 'a.log').write_bytes(b'log')
+    sync = SyncDedup(path_filter=PathFilter(['*.log']))
+
+    sync.sync_target(target, sync.sync_init(source))
+    changes = sync.sync_source(source, [FileCreatedEvent(str(source / 'a.log'))])
+
+    assert sorted(os.listdir(target)) == ['a.txt']
+    assert changes == []
+
+
+def test_chunk_store__should_reload(tmp_path):
+    digest = ChunkStore(tmp_path).put(b'content')
+
+    store = ChunkStore(tmp_path)
+
+    assert store.get(digest) == b'content'
+    assert store.size == len(b'content')
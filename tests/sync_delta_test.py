@@ -0,0 +1,174 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+from watchdog.events import FileMovedEvent, DirMovedEvent, FileCreatedEvent, FileModifiedEvent, FileDeletedEvent, \
+    DirCreatedEvent
+
+from filesystem_sync import sync_delta
+from tests.sync_fixture import SyncFixture
+
+root = Path('/root')
+
+
+def _ops(*events):
+    return sync_delta.events_ops(root, list(events))
+
+
+def test_move_chain__should_collapse():
+    ops = _ops(FileMovedEvent('/root/a', '/root/b'), FileMovedEvent('/root/b', '/root/c'))
+
+    assert ops == [('deleted', 'b'), ('moved', 'c', 'a')]
+
+
+def test_move_and_back__should_only_delete_the_intermediate_name():
+    ops = _ops(FileMovedEvent('/root/a', '/root/b'), FileMovedEvent('/root/b', '/root/a'))
+
+    assert ops == [('deleted', 'b')]
+
+
+@pytest.mark.parametrize('last', ['c', 'a'])
+def test_move_chain__should_remove_the_overwritten_intermediate_file(tmp_path, last):
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    for root_ in (source, target):
+        root_.mkdir()
+        (root_ / 'a').write_text('a')
+        (root_ / 'b').write_text('b')
+    events = [FileMovedEvent(str(source / 'a'), str(source / 'b')),
+              FileMovedEvent(str(source / 'b'), str(source / last))]
+    os.replace(source / 'a', source / 'b')
+    os.replace(source / 'b', source / last)
+
+    sync_delta.sync_target(target, sync_delta.sync_source(source, events))
+
+    assert sorted(os.listdir(target)) == [last]
+    assert (target / last).read_text() == 'a'
+
+
+def test_swap__should_keep_the_order():
+    ops = _ops(FileMovedEvent('/root/a', '/root/tmp'),
+               FileMovedEvent('/root/b', '/root/a'),
+               FileMovedEvent('/root/tmp', '/root/b'))
+
+    assert ops == [('moved', 'tmp', 'a'), ('moved', 'a', 'b'), ('moved', 'b', 'tmp')]
+
+
+def test_created_then_moved__should_be_a_modification():
+    ops = _ops(FileCreatedEvent('/root/a'), FileMovedEvent('/root/a', '/root/b'))
+
+    assert ops == [('modified', 'b')]
+
+
+def test_modified_then_moved__should_move_and_modify():
+    ops = _ops(FileModifiedEvent('/root/a'), FileMovedEvent('/root/a', '/root/b'))
+
+    assert ops == [('moved', 'b', 'a'), ('modified', 'b')]
+
+
+def test_directory_move__synthetic_children_should_be_ignored():
+    synthetic = FileMovedEvent('/root/sub1/foo.txt', '/root/sub2/foo.txt', is_synthetic=True)
+
+    ops = _ops(FileModifiedEvent('/root/sub1/foo.txt'), DirMovedEvent('/root/sub1', '/root/sub2'), synthetic)
+
+    assert ops == [('moved', 'sub2', 'sub1'), ('modified', 'sub2/foo.txt')]
+
+
+def test_moved_into_a_created_directory_then_renamed__should_follow_the_directory(tmp_path):
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    for root_ in (source, target):
+        root_.mkdir()
+        (root_ / 'x').write_text('x')
+    (source / 'staging').mkdir()
+    os.replace(source / 'x', source / 'staging/x')
+    os.replace(source / 'staging', source / 'final')
+    events = [DirCreatedEvent(str(source / 'staging')),
+              FileMovedEvent(str(source / 'x'), str(source / 'staging/x')),
+              DirMovedEvent(str(source / 'staging'), str(source / 'final'))]
+
+    assert sync_delta.events_ops(source, events) == [('moved', 'final/x', 'x')]
+    sync_delta.sync_target(target, sync_delta.sync_source(source, events))
+
+    assert sorted(os.listdir(target)) == ['final']
+    assert (target / 'final/x').read_text() == 'x'
+
+
+def test_modified_then_deleted__should_be_deleted():
+    ops = _ops(FileModifiedEvent('/root/a'), FileDeletedEvent('/root/a'))
+
+    assert ops == [('deleted', 'a')]
+
+
+@pytest.fixture
+def target(tmp_path):
+    fixture = SyncFixture(tmp_path, sync=sync_delta)
+    yield fixture
+    fixture.debounced_watcher.stop()
+    fixture.debounced_watcher.join()
+
+
+def test_rename_folder__should_not_send_content(target):
+    # GIVEN
+    (target.source / 'sub1').mkdir()
+    (target.source / 'sub1/foo.txt').write_text('content1')
+    target.copy_source_to_target()
+    target.start()
+
+    # WHEN
+    (target.source / 'sub1').rename(target.source / 'sub2')
+    target.wait_at_rest()
+    changes = target.do_sync()
+
+    # THEN
+    assert changes == [{'name': 'sub2', 'moved_from': 'sub1'}]
+    assert target.synchronized(), target.sync_error()
+
+
+def _make_tree(source: Path):
+    for i in range(20):
+        (source / f'sub{i % 3}').mkdir(exist_ok=True)
+        (source / f'sub{i % 3}/foo{i}.txt').write_text(f'content{i}' * i)
+    (source / 'foo.bin').write_bytes(b'\x80\x81\x82')
+
+
+def test_init__with_thread_pool__should_keep_the_order(tmp_path):
+    _make_tree(tmp_path)
+
+    with ThreadPoolExecutor(4) as executor:
+        changes = sync_delta.sync_init(tmp_path, executor=executor, max_in_flight=100)
+
+    assert changes == sync_delta.sync_init(tmp_path)
+
+
+def test_init__with_process_pool(tmp_path):
+    _make_tree(tmp_path)
+
+    with ProcessPoolExecutor(2) as executor:
+        changes = sync_delta.sync_init(tmp_path, executor=executor)
+
+    assert changes == sync_delta.sync_init(tmp_path)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(4)
+        self.max_not_done = 0
+        self._futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        self._futures = [f for f in self._futures if not f.done()]
+        future = super().submit(fn, *args, **kwargs)
+        self._futures.append(future)
+        self.max_not_done = max(self.max_not_done, len(self._futures))
+        return future
+
+
+def test_init__in_flight_budget(tmp_path):
+    for i in range(10):
+        (tmp_path / f'foo{i}.txt').write_text('x' * 100)
+
+    with CountingExecutor() as executor:
+        changes = sync_delta.sync_init(tmp_path, executor=executor, max_in_flight=250)
+
+    assert len(changes) == 10
+    assert executor.max_not_done <= 2
@@ -5,8 +5,7 @@ import sys
 import tempfile
 from datetime import timedelta
 from pathlib import Path
-from threading import Lock
-from time import sleep
+from threading import Lock, Event
 from typing import List
 
 import pytest
@@ -16,7 +15,9 @@ from filesystem_sync import sync_delta, sync_zip, filesystemevents_print
 from filesystem_sync.sync import Sync
 from filesystem_sync.watchdog_debouncer import WatchdogDebouncer
 from tests import new_tmp_path
-from tests.activity_monitor import ActivityMonitor
+
+
+_MARKER = '.sync_fixture_marker'
 
 
 class SyncFixture:
@@ -30,28 +31,41 @@ class SyncFixture:
         self.target.mkdir(exist_ok=exist_ok)
         self.all_events = []
         self.window = timedelta(milliseconds=100)
-        self.activities = ActivityMonitor(self.window + timedelta(milliseconds=10))
         self.dircmp = None
         self._lock = Lock()
         self.callback_count = 0
+        self._marker_deleted = Event()
 
         def callback(events: List[FileSystemEvent]):
-            self.callback_count += 1
-            filesystemevents_print(events)
-            self.activities.touch()
-            with self._lock:
-                self.all_events.extend(events)
+            marker_deleted = any(e.event_type == 'deleted' and self._is_marker(e) for e in events)
+            events = [e for e in events if not self._is_marker(e)]
+            if events:
+                self.callback_count += 1
+                filesystemevents_print(events)
+                with self._lock:
+                    self.all_events.extend(events)
+            if marker_deleted:
+                self._marker_deleted.set()
 
         self.debounced_watcher = WatchdogDebouncer(self.source, self.window, callback)
 
-        self.activities.touch()
-
     def start(self):
         self.debounced_watcher.start()
 
     def wait_at_rest(self):
-        [sleep(0.1) for _ in range(40) if not self.activities.at_rest()]
-        assert self.activities.at_rest(), self.activities.rest_delta()
+        """Wait for the events of what was done so far to be emitted: a marker file is created and deleted,
+        and its events come after the others, in the same batch or in a later one.
+        The marker events, and the source directory modifications they cause, are not passed on."""
+        self._marker_deleted.clear()
+        marker = self.source / _MARKER
+        marker.touch()
+        marker.unlink()
+        assert self._marker_deleted.wait(5), 'The events of the marker were not emitted'
+
+    def _is_marker(self, event: FileSystemEvent) -> bool:
+        if event.is_directory and event.event_type == 'modified' and Path(event.src_path) == self.source:
+            return True
+        return _MARKER in (Path(event.src_path).name, Path(getattr(event, 'dest_path', '') or '').name)
 
     def do_sync(self):
         changes = self.get_changes()
@@ -59,14 +73,14 @@ class SyncFixture:
         return changes
 
     def apply_changes(self, changes):
-        self.sync.sync_target(self.target, json.loads(json.dumps(changes)))
+        self.sync.sync_target(self.target, json.loads(json.dumps(list(changes))))
 
     def get_changes(self):
         with self._lock:
             all_events = self.all_events.copy()
             self.all_events.clear()
 
-        changes = self.sync.sync_source(self.source, all_events)
+        changes = list(self.sync.sync_source(self.source, all_events))
         dumps = json.dumps(changes)
         if self.print_changes and len(changes) > 0:
             print(f'\ndumps=```{dumps}```')
@@ -96,7 +110,7 @@ class SyncFixture:
         shutil.copytree(self.source, self.target, dirs_exist_ok=True)
 
     def skip_for(self, sync, reason):
-        if self.sync == sync:
+        if self.sync == sync or type(self.sync) == sync:
             pytest.skip(f'Skipped for {sync} {reason}')
 
 
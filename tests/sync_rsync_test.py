@@ -0,0 +1,130 @@
+import os
+import zlib
+
+import pytest
+from watchdog.events import FileModifiedEvent
+
+from filesystem_sync import sync_rsync
+from filesystem_sync.sync_rsync import SyncRsync, signature, delta, patch, _roll
+from tests.sync_fixture import SyncFixture
+
+
+def test_roll__should_match_adler32():
+    data = os.urandom(100)
+    weak = zlib.adler32(data[0:16])
+    for offset in range(1, 100 - 16):
+        weak = _roll(weak, data[offset - 1], data[offset + 15], 16)
+        assert weak == zlib.adler32(data[offset:offset + 16])
+
+
+def test_delta__unchanged():
+    data = os.urandom(64)
+
+    instructions = delta(data, signature(data, 16).blocks, 16)
+
+    assert instructions == [[0, 4]]
+
+
+def test_delta__insertion():
+    base = os.urandom(64)
+    data = base[:20] + b'inserted' + base[20:] + b'tail'
+
+    instructions = delta(data, signature(base, 16).blocks, 16)
+
+    assert patch(base, instructions, 16) == data
+    assert [i for i in instructions if isinstance(i, list)] == [[0, 1], [2, 2]]
+
+
+def test_delta__no_match():
+    base = os.urandom(64)
+    data = os.urandom(70)
+
+    instructions = delta(data, signature(base, 16).blocks, 16)
+
+    assert patch(base, instructions, 16) == data
+    assert len(instructions) == 1
+
+
+def test_delta__without_numpy__should_find_the_same_blocks(monkeypatch):
+    base = os.urandom(2000)
+    data = base[:300] + b'inserted' + base[300:1200] + base[1500:] + base[:100]
+    blocks = signature(base, 16).blocks
+    instructions = delta(data, blocks, 16)
+
+    monkeypatch.setattr(sync_rsync, 'numpy', None)
+
+    assert delta(data, blocks, 16) == instructions
+    assert patch(base, instructions, 16) == data
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_delta__too_much_literal__should_give_up(monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(sync_rsync, 'numpy', None)
+    base = os.urandom(64)
+    data = base + os.urandom(100)
+
+    assert delta(data, signature(base, 16).blocks, 16, max_literal=99) is None
+    assert patch(base, delta(data, signature(base, 16).blocks, 16, max_literal=100), 16) == data
+
+
+@pytest.fixture
+def target(tmp_path):
+    fixture = SyncFixture(tmp_path, sync=SyncRsync(block_size=16))
+    yield fixture
+    fixture.debounced_watcher.stop()
+    fixture.debounced_watcher.join()
+
+
+def test_modified_file__should_send_delta(target):
+    # GIVEN
+    base = os.urandom(1000)
+    (target.source / 'foo.bin').write_bytes(base)
+    target.do_init()
+    target.start()
+
+    # WHEN
+    (target.source / 'foo.bin').write_bytes(base[:500] + b'x' + base[501:])
+    target.wait_at_rest()
+    changes = target.do_sync()
+
+    # THEN
+    assert len(changes) == 1
+    assert 'delta' in changes[0]
+    assert target.synchronized(), target.sync_error()
+
+
+def test_mostly_new_file__should_send_content(target):
+    # GIVEN
+    base = os.urandom(1000)
+    (target.source / 'foo.bin').write_bytes(base)
+    target.do_init()
+    target.start()
+
+    # WHEN
+    (target.source / 'foo.bin').write_bytes(base[:100] + os.urandom(900))
+    target.wait_at_rest()
+    changes = target.do_sync()
+
+    # THEN
+    assert len(changes) == 1
+    assert 'delta' not in changes[0]
+    assert target.synchronized(), target.sync_error()
+
+
+def test_signatures__should_be_bounded(tmp_path):
+    sync = SyncRsync(block_size=16, max_blocks=10)
+    for name in ['a', 'b', 'c']:
+        (tmp_path / name).write_bytes(os.urandom(64))
+    sync.sync_init(tmp_path)
+    assert len(sync._signatures) == 2  # 4 blocks each
+    dropped = ({'a', 'b', 'c'} - set(sync._signatures)).pop()
+    kept = next(iter(sync._signatures))  # the least recently sent
+
+    events = []
+    for name in [kept, dropped]:
+        (tmp_path / name).write_bytes((tmp_path / name).read_bytes() + b'x')
+        events.append(FileModifiedEvent(str(tmp_path / name)))
+    changes = sync.sync_source(tmp_path, events)
+
+    assert {change['name']: 'delta' in change for change in changes} == {dropped: False, kept: True}
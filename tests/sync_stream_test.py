@@ -0,0 +1,77 @@
+import os
+
+from filesystem_sync import sync_stream
+
+
+def test_init__should_split_files_in_frames(tmp_path):
+    # GIVEN
+    source = tmp_path / 'source'
+    (source / 'sub1').mkdir(parents=True)
+    content = os.urandom(25)
+    (source / 'sub1/foo.bin').write_bytes(content)
+    (source / 'empty.txt').touch()
+    target = tmp_path / 'target'
+    target.mkdir()
+
+    # WHEN
+    frames = list(sync_stream.sync_init(source, chunk_size=10))
+    sync_stream.sync_target(target, iter(frames))
+
+    # THEN
+    assert [(f['name'], f['offset']) for f in frames if f['name'] != 'empty.txt'] == \
+           [('sub1/foo.bin', 0), ('sub1/foo.bin', 10), ('sub1/foo.bin', 20)]
+    assert (target / 'sub1/foo.bin').read_bytes() == content
+    assert (target / 'empty.txt').read_bytes() == b''
+
+
+def test_init__should_be_lazy(tmp_path):
+    # GIVEN
+    (tmp_path / 'foo.txt').write_text('foo')
+
+    # WHEN
+    frames = sync_stream.sync_init(tmp_path)
+    (tmp_path / 'foo.txt').write_text('bar')
+
+    # THEN
+    assert next(frames)['b64'] == 'YmFy'
+
+
+def test_target__should_be_replaced_after_the_last_frame(tmp_path):
+    # GIVEN
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'foo.bin').write_bytes(b'n' * 25)
+    target = tmp_path / 'target'
+    target.mkdir()
+    (target / 'foo.bin').write_bytes(b'old')
+    seen = []
+
+    def frames():
+        for frame in sync_stream.sync_init(source, chunk_size=10):
+            yield frame
+            seen.append((target / 'foo.bin').read_bytes())
+
+    # WHEN
+    sync_stream.sync_target(target, frames())
+
+    # THEN
+    assert seen == [b'old', b'old', b'old']
+    assert (target / 'foo.bin').read_bytes() == b'n' * 25
+    assert os.listdir(target) == ['foo.bin']
+
+
+def test_frames_continued_in_another_batch(tmp_path):
+    # GIVEN
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'foo.bin').write_bytes(b'0123456789abcde')
+    target = tmp_path / 'target'
+    target.mkdir()
+    frames = list(sync_stream.sync_init(source, chunk_size=10))
+
+    # WHEN
+    sync_stream.sync_target(target, frames[:1])
+    sync_stream.sync_target(target, frames[1:])
+
+    # THEN
+    assert (target / 'foo.bin').read_bytes() == b'0123456789abcde'
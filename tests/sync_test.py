@@ -2,16 +2,19 @@ import shutil
 
 import pytest
 
-from filesystem_sync import sync_delta, sync_zip
+from filesystem_sync import sync_delta, sync_zip, sync_zip_incremental, sync_stream
+from filesystem_sync.sync_dedup import SyncDedup
+from filesystem_sync.sync_rsync import SyncRsync
 from tests.sync_fixture import SyncFixture
 
 invalid_utf8 = b'\x80\x81\x82'
 
 
-@pytest.fixture(params=[sync_delta, sync_zip])
+@pytest.fixture(params=[sync_delta, sync_zip, sync_zip_incremental, sync_stream, SyncRsync, SyncDedup])
 def target(tmp_path, request):
     print(f'\ntmp_path file://{tmp_path}')
-    fixture = SyncFixture(tmp_path, sync=request.param)
+    sync = request.param() if isinstance(request.param, type) else request.param
+    fixture = SyncFixture(tmp_path, sync=sync)
     yield fixture
     fixture.debounced_watcher.stop()
     fixture.debounced_watcher.join()
@@ -214,7 +217,6 @@ def test_invalid_text(target):
 
 
 def test_rename_file(target):
-    target.skip_for(sync_delta, 'not implemented')
     # GIVEN
     (target.source / 'foo.txt').write_text('content1')
     target.copy_source_to_target()
@@ -232,7 +234,6 @@ def test_rename_file(target):
 
 
 def test_rename_folder(target):
-    target.skip_for(sync_delta, 'not implemented')
     # GIVEN
     (target.source / 'sub1').mkdir()
     (target.source / 'sub1/foo.txt').write_text('content1')
@@ -249,7 +250,6 @@ def test_rename_folder(target):
 
 
 def test_move_folder_in_subfolder(target):
-    target.skip_for(sync_delta, 'not implemented')
     # GIVEN
     (target.source / 'sub1').mkdir()
     (target.source / 'sub1/foo.txt').write_text('content1')
@@ -0,0 +1,60 @@
+import base64
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from filesystem_sync import sync_zip_incremental
+from tests.sync_fixture import SyncFixture
+
+
+@pytest.fixture
+def target(tmp_path):
+    fixture = SyncFixture(tmp_path, sync=sync_zip_incremental)
+    yield fixture
+    fixture.debounced_watcher.stop()
+    fixture.debounced_watcher.join()
+
+
+def test_only_touched_files_are_sent(target):
+    # GIVEN
+    (target.source / 'untouched.txt').write_text('untouched')
+    (target.source / 'deleted.txt').write_text('deleted')
+    target.copy_source_to_target()
+    (target.target / 'target_only.txt').write_text('not wiped')
+    target.start()
+
+    # WHEN
+    (target.source / 'foo.txt').write_text('foo')
+    (target.source / 'deleted.txt').unlink()
+    target.wait_at_rest()
+    changes = target.do_sync()
+
+    # THEN
+    with zipfile.ZipFile(BytesIO(base64.b64decode(changes[0]['zip']))) as zip_file:
+        assert zip_file.namelist() == ['foo.txt']
+    assert changes[0]['deleted'] == ['deleted.txt']
+    assert (target.target / 'foo.txt').read_text() == 'foo'
+    assert not (target.target / 'deleted.txt').exists()
+    assert (target.target / 'target_only.txt').read_text() == 'not wiped'
+
+
+def test_sync_target__should_replace_the_files_and_leave_no_staging(tmp_path):
+    source = tmp_path / 'source'
+    (source / 'sub').mkdir(parents=True)
+    (source / 'sub/foo.txt').write_text('new')
+    target_root = tmp_path / 'target'
+    (target_root / 'sub').mkdir(parents=True)
+    (target_root / 'sub/foo.txt').write_text('old')
+    (target_root / 'kept.txt').write_text('kept')
+    (target_root / 'deleted.txt').write_text('deleted')
+    inode = (target_root / 'sub').stat().st_ino
+
+    changes = sync_zip_incremental.sync_init(source, target_manifest={})
+    changes[0]['deleted'] = ['deleted.txt']
+    sync_zip_incremental.sync_target(target_root, changes)
+
+    assert (target_root / 'sub/foo.txt').read_text() == 'new'
+    assert (target_root / 'sub').stat().st_ino == inode  # not swapped
+    assert sorted(p.name for p in target_root.iterdir()) == ['kept.txt', 'sub']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['source', 'target']
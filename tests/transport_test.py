@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+from filesystem_sync import sync_delta, wire
+from filesystem_sync.transport import Sender, Receiver
+
+
+class SlowSync:
+    """Blocks the receiver until released, to observe the pipelining"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def sync_target(self, target_root, changes):
+        self.release.wait(5)
+        sync_delta.sync_target(target_root, changes)
+
+
+class FailingSync:
+    @staticmethod
+    def sync_target(target_root, changes):
+        raise ValueError('cannot apply')
+
+
+@pytest.fixture(params=['tcp', 'unix'])
+def address(request, tmp_path):
+    return ('127.0.0.1', 0) if request.param == 'tcp' else tmp_path / 'sync.sock'
+
+
+def _start(tmp_path, sync, address, **kwargs):
+    target = tmp_path / 'target'
+    target.mkdir(exist_ok=True)
+    receiver = Receiver(target, sync, address, **kwargs)
+    receiver.start()
+    return receiver, target
+
+
+def _stop(sender, receiver):
+    sender.close()
+    receiver.stop()
+    receiver.join()
+
+
+def test_send(tmp_path, address):
+    receiver, target = _start(tmp_path, sync_delta, address)
+    sender = Sender(receiver.address)
+
+    sender.send([{'name': 'a.txt', 'content': 'a'}])
+    sender.send([{'name': 'b.txt', 'moved_from': 'a.txt'}])
+    sender.flush()
+
+    assert (target / 'b.txt').read_text() == 'a'
+    assert not (target / 'a.txt').exists()
+    _stop(sender, receiver)
+
+
+def test_wire_encoding(tmp_path, address):
+    receiver, target = _start(tmp_path, sync_delta, address, decode=wire.decode)
+    sender = Sender(receiver.address, encode=wire.encode)
+
+    sender.send([{'name': 'a.bin', 'content': b'\x80\x81'}])
+    sender.flush()
+
+    assert (target / 'a.bin').read_bytes() == b'\x80\x81'
+    _stop(sender, receiver)
+
+
+def test_pipelining__should_not_wait_for_each_ack(tmp_path):
+    sync = SlowSync()
+    receiver, target = _start(tmp_path, sync, ('127.0.0.1', 0))
+    sender = Sender(receiver.address, max_in_flight=3)
+
+    for i in range(3):
+        sender.send([{'name': f'{i}.txt', 'content': str(i)}])
+
+    assert sender.in_flight() == 3
+    sync.release.set()
+    sender.flush()
+    assert sender.in_flight() == 0
+    assert sorted(p.name for p in target.iterdir()) == ['0.txt', '1.txt', '2.txt']
+    _stop(sender, receiver)
+
+
+def test_max_in_flight__should_block_the_sender(tmp_path):
+    sync = SlowSync()
+    receiver, target = _start(tmp_path, sync, ('127.0.0.1', 0))
+    sender = Sender(receiver.address, max_in_flight=1)
+    sender.send([{'name': 'a.txt', 'content': 'a'}])
+
+    threading.Timer(0.2, sync.release.set).start()
+    start = time.monotonic()
+    sender.send([{'name': 'b.txt', 'content': 'b'}])
+
+    assert time.monotonic() - start >= 0.15
+    sender.flush()
+    _stop(sender, receiver)
+
+
+def test_close_with_batches_in_flight__should_raise_on_the_next_send(tmp_path):
+    sync = SlowSync()
+    receiver, target = _start(tmp_path, sync, ('127.0.0.1', 0))
+    sender = Sender(receiver.address, max_in_flight=1, timeout=1)
+    sender.send([{'name': 'a.txt', 'content': 'a'}])
+
+    sender.close()
+    sync.release.set()
+
+    with pytest.raises(ConnectionError, match='1 batches not acknowledged'):
+        sender.send([{'name': 'b.txt', 'content': 'b'}])
+    sender.send([{'name': 'b.txt', 'content': 'b'}])
+    sender.flush()
+    assert (target / 'b.txt').read_text() == 'b'
+    _stop(sender, receiver)
+
+
+def test_receiver_error__should_be_raised_by_the_sender(tmp_path):
+    receiver, target = _start(tmp_path, FailingSync, ('127.0.0.1', 0))
+    sender = Sender(receiver.address)
+    sender.send([{'name': 'a.txt', 'content': 'a'}])
+
+    with pytest.raises(RuntimeError, match='cannot apply'):
+        sender.flush()
+    _stop(sender, receiver)
+
+
+def test_connection_lost__should_reconnect(tmp_path):
+    receiver, target = _start(tmp_path, sync_delta, ('127.0.0.1', 0))
+    sender = Sender(receiver.address)
+    sender.send([{'name': 'a.txt', 'content': 'a'}])
+    sender.flush()
+    address = receiver.address
+    receiver.stop()
+    receiver.join()
+
+    receiver, target = _start(tmp_path, sync_delta, address)
+    for _ in range(50):  # the old connection may not be noticed as closed yet
+        try:
+            sender.send([{'name': 'b.txt', 'content': 'b'}])
+            sender.flush()
+            break
+        except (ConnectionError, OSError):
+            time.sleep(0.01)
+
+    assert (target / 'b.txt').read_text() == 'b'
+    _stop(sender, receiver)
+
+
+@pytest.mark.parametrize('change', [{'name': '../escaped.txt', 'content': 'x'},
+                                    {'name': '/tmp/abs.txt', 'content': 'x'},
+                                    {'name': 'b.txt', 'moved_from': '../outside.txt'},
+                                    {'name': 'link', 'symlink': '../../outside'},
+                                    {'name': 'link/escaped.txt', 'content': 'x'}])
+def test_names_outside_of_the_target__should_be_rejected(tmp_path, change):
+    receiver, target = _start(tmp_path, sync_delta, ('127.0.0.1', 0))
+    (target / 'link').symlink_to(tmp_path)
+    sender = Sender(receiver.address)
+    sender.send([change])
+
+    with pytest.raises(RuntimeError, match='target root'):
+        sender.flush()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['target']
+    _stop(sender, receiver)
+
+
+def test_received_modes__should_be_masked(tmp_path):
+    receiver, target = _start(tmp_path, sync_delta, ('127.0.0.1', 0))
+    sender = Sender(receiver.address)
+    sender.send([{'name': 'sub/a.txt', 'content': 'a', 'mode': 0o4755},
+                 {'name': 'sub/link', 'symlink': '../sub/a.txt'}])
+    sender.flush()
+
+    assert (target / 'sub/a.txt').stat().st_mode & 0o7777 == 0o755
+    assert (target / 'sub/link').read_text() == 'a'
+    _stop(sender, receiver)
@@ -0,0 +1,88 @@
+import filecmp
+
+import pytest
+
+from filesystem_sync import wire, sync_delta, sync_zip
+
+invalid_utf8 = b'\x80\x81\x82'
+
+
+def test_round_trip():
+    # GIVEN
+    changes = [{'name': 'foo.txt', 'content': 'c1 "quoted"\n'},
+               {'name': 'foo.bin', 'content_b64': 'gIGC'},
+               {'name': 'sub1', 'content': None},
+               {'name': 'sub2', 'moved_from': 'sub1'},
+               {'name': 'bar.bin', 'content': invalid_utf8, 'mode': 0o100644, 'mtime_ns': 123}]
+
+    # WHEN
+    decoded = wire.decode(wire.encode(changes))
+
+    # THEN
+    assert decoded == [{'name': 'foo.txt', 'content': 'c1 "quoted"\n'},
+                       {'name': 'foo.bin', 'content': invalid_utf8},
+                       {'name': 'sub1', 'content': None},
+                       {'name': 'sub2', 'moved_from': 'sub1'},
+                       {'name': 'bar.bin', 'content': invalid_utf8, 'mode': 0o100644, 'mtime_ns': 123}]
+
+
+def test_round_trip__zero_mode_and_epoch_mtime_should_be_kept():
+    changes = [{'name': 'a.txt', 'mode': 0, 'mtime_ns': 0}, {'name': 'b.txt'}]
+
+    assert wire.decode(wire.encode(changes)) == changes
+
+
+@pytest.mark.parametrize('change', [{'name': 'a', 'delta': [], 'base': 'digest', 'block_size': 4096},
+                                    {'name': 'a', 'digest': 'digest', 'recipe': ['chunk'], 'chunks': {}}])
+def test_encode__changes_of_other_engines_should_raise(change):
+    with pytest.raises(ValueError):
+        wire.encode([change])
+
+
+def test_decode__binary_content_should_not_be_copied():
+    data = wire.encode([{'name': 'foo.bin', 'content': invalid_utf8}])
+
+    change = wire.decode(data)[0]
+
+    assert isinstance(change['content'], memoryview)
+    assert change['content'].obj is data
+
+
+def test_decode__invalid_message():
+    with pytest.raises(ValueError):
+        wire.decode(b'{"name": "foo.txt"}')
+
+
+def _init_through_wire(sync, tmp_path):
+    source = tmp_path / 'source'
+    (source / 'sub1').mkdir(parents=True)
+    (source / 'sub1/foo.txt').write_text('c1')
+    (source / 'foo.bin').write_bytes(invalid_utf8)
+    target = tmp_path / 'target'
+    target.mkdir()
+
+    sync.sync_target(target, wire.decode(wire.encode(sync.sync_init(source))))
+
+    dircmp = filecmp.dircmp(source, target)
+    assert not dircmp.left_only and not dircmp.right_only and not dircmp.diff_files
+    assert (target / 'sub1/foo.txt').read_text() == 'c1'
+
+
+def test_sync_delta(tmp_path):
+    _init_through_wire(sync_delta, tmp_path)
+
+
+def test_sync_zip(tmp_path):
+    _init_through_wire(sync_zip, tmp_path)
+
+
+def test_round_trip__chunk_and_compressed():
+    changes = [{'name': 'big', 'offset': 4096, 'size': 10_000, 'digest': 'd' * 32, 'chunk_digest': 'c' * 32,
+                'chunk_b64': 'gIGC'},
+               {'name': 'a.txt', 'codec': 'zlib', 'dictionary': 'x' * 32, 'compressed_b64': 'gIGC'}]
+
+    decoded = wire.decode(wire.encode(changes))
+
+    assert decoded == [{'name': 'big', 'offset': 4096, 'size': 10_000, 'digest': 'd' * 32, 'chunk_digest': 'c' * 32,
+                        'chunk': invalid_utf8},
+                       {'name': 'a.txt', 'codec': 'zlib', 'dictionary': 'x' * 32, 'compressed': invalid_utf8}]
@@ -0,0 +1,137 @@
+import os
+import threading
+from datetime import timedelta
+
+import pytest
+from watchdog.events import FileModifiedEvent, FileCreatedEvent, FileDeletedEvent, FileMovedEvent, DirModifiedEvent
+
+from filesystem_sync import sync_delta, sync_zip, sync_zip_incremental, sync_stream
+from filesystem_sync.watchdog_debouncer import WatchdogDebouncer
+from filesystem_sync.write_journal import WriteJournal
+from tests.time_mock import TimeMock
+
+
+def test_written__should_be_an_echo_until_changed(tmp_path):
+    target = WriteJournal()
+    sync_delta.sync_target(tmp_path, [{'name': 'a.txt', 'content': 'a'}], journal=target)
+    path = str(tmp_path / 'a.txt')
+
+    assert target.is_echo(FileModifiedEvent(path))
+    assert target.is_echo(DirModifiedEvent(str(tmp_path)))
+
+    (tmp_path / 'a.txt').write_text('changed by someone else')
+
+    assert not target.is_echo(FileModifiedEvent(path))
+
+
+def test_written_with_metadata__should_be_an_echo(tmp_path):
+    target = WriteJournal()
+    (tmp_path / 'b.txt').write_text('b')
+    mtime_ns = 1_600_000_000_000_000_000
+    sync_delta.sync_target(tmp_path, [{'name': 'a.txt', 'content': 'a', 'mode': 0o640, 'mtime_ns': mtime_ns},
+                                      {'name': 'b.txt', 'mode': 0o600, 'mtime_ns': mtime_ns}], journal=target)
+
+    assert (tmp_path / 'a.txt').stat().st_mtime_ns == mtime_ns
+    assert target.is_echo(FileModifiedEvent(str(tmp_path / 'a.txt')))
+    assert target.is_echo(FileModifiedEvent(str(tmp_path / 'b.txt')))  # the metadata-only change
+
+    os.utime(tmp_path / 'b.txt')
+
+    assert not target.is_echo(FileModifiedEvent(str(tmp_path / 'b.txt')))
+
+
+def test_temporary_file__should_be_an_echo(tmp_path):
+    target = WriteJournal()
+    sync_delta.sync_target(tmp_path, [{'name': 'a.txt', 'content': 'a'}], journal=target)
+    temporary = [p for p in target._entries if p.endswith('.tmp')][0]
+
+    assert target.is_echo(FileCreatedEvent(temporary))
+    assert target.is_echo(FileMovedEvent(temporary, str(tmp_path / 'a.txt')))
+
+
+def test_deleted_directory__children_should_be_echoes(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub/a.txt').write_text('a')
+    target = WriteJournal()
+
+    sync_delta.sync_target(tmp_path, [{'name': 'sub', 'content': None}], journal=target)
+
+    assert target.is_echo(FileDeletedEvent(str(tmp_path / 'sub/a.txt')))
+    assert not target.is_echo(FileDeletedEvent(str(tmp_path / 'other.txt')))
+
+
+def test_moved(tmp_path):
+    (tmp_path / 'a.txt').write_text('a')
+    target = WriteJournal()
+
+    sync_delta.sync_target(tmp_path, [{'name': 'b.txt', 'moved_from': 'a.txt'}], journal=target)
+
+    assert target.is_echo(FileMovedEvent(str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')))
+
+
+def test_ttl(tmp_path):
+    time_mock = TimeMock()
+    target = WriteJournal(timedelta(seconds=5), time_func=time_mock)
+    sync_delta.sync_target(tmp_path, [{'name': 'a.txt', 'content': 'a'}], journal=target)
+
+    time_mock.advance(timedelta(seconds=6))
+
+    assert not target.is_echo(FileModifiedEvent(str(tmp_path / 'a.txt')))
+    assert len(target) == 0
+
+
+def test_watched_target__should_not_see_its_own_writes(tmp_path):
+    target = WriteJournal()
+    batches = []
+    received = threading.Event()
+
+    def callback(events):
+        batches.append(events)
+        received.set()
+
+    watcher = WatchdogDebouncer(tmp_path, timedelta(milliseconds=50), callback, journal=target)
+    watcher.start()
+    try:
+        sync_delta.sync_target(tmp_path, [{'name': 'sub/a.txt', 'content': 'a'}, {'name': 'b.txt', 'content': 'b'},
+                                          {'name': 'c.txt', 'moved_from': 'b.txt'}], journal=target)
+        assert not received.wait(0.5)
+
+        (tmp_path / 'external.txt').write_text('external')
+
+        assert received.wait(5)
+        assert {os.path.basename(e.src_path) for e in batches[0]} == {'external.txt'}
+    finally:
+        watcher.stop()
+        watcher.join()
+
+
+@pytest.mark.parametrize('sync', [sync_zip, sync_zip_incremental, sync_stream])
+def test_watched_target__other_engines_should_not_see_their_own_writes(tmp_path, sync):
+    source, target_root = tmp_path / 'source', tmp_path / 'target'
+    (source / 'sub').mkdir(parents=True)
+    (source / 'sub/a.txt').write_text('a')
+    (source / 'b.txt').write_text('b')
+    (target_root / 'sub').mkdir(parents=True)
+    (target_root / 'sub/a.txt').write_text('old')
+    (target_root / 'removed.txt').write_text('removed')
+    journal = WriteJournal()
+    batches = []
+    received = threading.Event()
+
+    def callback(events):
+        batches.append(events)
+        received.set()
+
+    watcher = WatchdogDebouncer(target_root, timedelta(milliseconds=50), callback, journal=journal)
+    watcher.start()
+    try:
+        sync.sync_target(target_root, sync.sync_init(source), journal=journal)
+        assert not received.wait(0.5), batches
+
+        (target_root / 'external.txt').write_text('external')
+
+        assert received.wait(5)
+        assert {os.path.basename(e.src_path) for e in batches[0]} == {'external.txt'}
+    finally:
+        watcher.stop()
+        watcher.join()